@@ -2,11 +2,14 @@ from langchain_openai import ChatOpenAI
 from langgraph.graph import END, StateGraph
 
 from backend.agent.edges import GraphEdges
-from backend.agent.generate_chain import create_recommendation_chain
 from backend.agent.grader import GraderUtils
 from backend.agent.graph import GraphState
+from backend.agent.memory import ConversationMemory
 from backend.agent.nodes import GraphNodes
-from backend.agent.vector_store import get_pinecone_vector_store, Retriever
+from backend.agent.reranker import LocalReranker
+from backend.agent.semantic_cache import SemanticCache
+from backend.agent.vector_store import get_vector_store, Retriever, get_embeddings, get_keyword_indexes, \
+    get_vector_store_distance_metric
 from backend.config import settings
 from backend.utils import get_tavily_web_search_tool
 
@@ -14,30 +17,44 @@ from backend.utils import get_tavily_web_search_tool
 def compile_graph():
 
     # Vector Store
-    _vector_store = get_pinecone_vector_store()
-    retriever = Retriever(vector_store=_vector_store)
+    _vector_store = get_vector_store()
+    retriever = Retriever(
+        vector_store=_vector_store, embeddings=get_embeddings(), keyword_indexes=get_keyword_indexes(_vector_store),
+        retrieval_mode=settings.RETRIEVAL_MODE, hybrid_candidates=settings.RETRIEVAL_HYBRID_CANDIDATES,
+        rrf_k=settings.RETRIEVAL_RRF_K, distance_metric=get_vector_store_distance_metric())
 
     # LLM
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.5, openai_api_key=settings.OPENAI_API_KEY)
+    # Streamed generations only report their token usage with stream_usage
+    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.5, openai_api_key=settings.OPENAI_API_KEY, stream_usage=True)
 
     # Evaluation - Grader
     grader = GraderUtils(llm=llm)
     retrieval_grader = grader.create_retrieval_grader()
+    batch_retrieval_grader = grader.create_batch_retrieval_grader()
+
+    reranker = LocalReranker(
+        accept_threshold=settings.LOCAL_RERANKER_ACCEPT_THRESHOLD,
+        reject_threshold=settings.LOCAL_RERANKER_REJECT_THRESHOLD,
+        similarity_weight=settings.LOCAL_RERANKER_SIMILARITY_WEIGHT,
+    ) if settings.LOCAL_RERANKER_ENABLED else None
 
     # Tools
     web_search_tool = get_tavily_web_search_tool()
 
     graph_nodes = GraphNodes(
-        llm=llm, retriever=retriever, retrieval_grader=retrieval_grader, web_search_tool=web_search_tool)
+        llm=llm, retriever=retriever, retrieval_grader=retrieval_grader, web_search_tool=web_search_tool,
+        batch_retrieval_grader=batch_retrieval_grader, grading_mode=settings.RETRIEVAL_GRADER_MODE,
+        grading_max_concurrency=settings.RETRIEVAL_GRADER_MAX_CONCURRENCY,
+        speculative_web_search=settings.SPECULATIVE_WEB_SEARCH, reranker=reranker)
     graph_edges = GraphEdges(None, None)
 
     # Build workflow
     workflow = StateGraph(GraphState)
 
-    workflow.add_node("vector_search", graph_nodes.vector_store_retrieve)
-    workflow.add_node("vector_search_evaluate", graph_nodes.grade_vector_store_documents)
-    workflow.add_node("web_search", graph_nodes.web_search)
-    workflow.add_node("generate", graph_nodes.generate)
+    workflow.add_node("vector_search", graph_nodes.avector_store_retrieve)
+    workflow.add_node("vector_search_evaluate", graph_nodes.agrade_vector_store_documents)
+    workflow.add_node("web_search", graph_nodes.aweb_search)
+    workflow.add_node("generate", graph_nodes.agenerate)
 
     workflow.set_entry_point("vector_search")
     workflow.add_edge("vector_search", "vector_search_evaluate")
@@ -57,3 +74,13 @@ def compile_graph():
 
 
 agent_workflow = compile_graph()
+semantic_cache = SemanticCache(
+    similarity_threshold=settings.SEMANTIC_CACHE_SIMILARITY_THRESHOLD,
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+)
+conversation_memory = ConversationMemory(
+    llm=ChatOpenAI(model="gpt-4o-mini", temperature=0, openai_api_key=settings.OPENAI_API_KEY),
+    max_recent_turns=settings.CONVERSATION_MEMORY_RECENT_TURNS,
+    max_sessions=settings.CONVERSATION_MEMORY_MAX_SESSIONS,
+) if settings.CONVERSATION_MEMORY_ENABLED else None
@@ -1,5 +1,9 @@
+import logging
+
 from backend.agent.graph import GraphState
 
+logger = logging.getLogger(__name__)
+
 
 class GraphEdges:
     def __init__(self, hallucination_grader, code_evaluator):
@@ -32,18 +36,18 @@ class GraphEdges:
         Returns:
             str: Binary decision for next node to call
         """
-        print("---ASSESS GRADED DOCUMENTS---")
+        logger.debug("---ASSESS GRADED DOCUMENTS---")
         question = state["input"]
         filtered_documents = state["documents"]
 
         if not filtered_documents:
             # All documents have been filtered check_relevance
             # We will re-generate a new query
-            print("---DECISION: ALL DOCUMENTS ARE NOT RELEVANT TO QUESTION, TRANSFORM QUERY---")
+            logger.debug("---DECISION: ALL DOCUMENTS ARE NOT RELEVANT TO QUESTION, TRANSFORM QUERY---")
             return "transform_query"  # "retrieve_from_community_page", "transform_query"
         else:
             # We have relevant documents, so generate answer
-            print("---DECISION: GENERATE---")
+            logger.debug("---DECISION: GENERATE---")
             return "generate"
 
     def grade_generation_v_documents_and_question(self, state):
@@ -56,7 +60,7 @@ class GraphEdges:
         Returns:
             str: Decision for next node to call
         """
-        print("---CHECK HALLUCINATIONS---")
+        logger.debug("---CHECK HALLUCINATIONS---")
         question = state["input"]
         documents = state["documents"]
         generation = state["generation"]
@@ -66,17 +70,17 @@ class GraphEdges:
 
         # Check hallucination
         if grade == "yes":
-            print("---DECISION: GENERATION IS GROUNDED IN DOCUMENTS---")
+            logger.debug("---DECISION: GENERATION IS GROUNDED IN DOCUMENTS---")
             # Check question-answering
-            print("---GRADE GENERATION vs QUESTION---")
+            logger.debug("---GRADE GENERATION vs QUESTION---")
             score = self.code_evaluator.invoke({"input": question, "generation": generation, "documents": documents})
             grade = score["score"]
             if grade == "yes":
-                print("---DECISION: GENERATION ADDRESSES QUESTION---")
+                logger.debug("---DECISION: GENERATION ADDRESSES QUESTION---")
                 return "useful"
             else:
-                print("---DECISION: GENERATION DOES NOT ADDRESS QUESTION---")
+                logger.debug("---DECISION: GENERATION DOES NOT ADDRESS QUESTION---")
                 return "not useful"
         else:
-            print("---DECISION: GENERATIONS ARE HALLUCINATED, RE-TRY---")
+            logger.debug("---DECISION: GENERATIONS ARE HALLUCINATED, RE-TRY---")
             return "not supported"
\ No newline at end of file
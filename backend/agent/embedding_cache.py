@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from threading import Lock
+
+from langchain_core.callbacks import adispatch_custom_event, dispatch_custom_event
+from langchain_core.embeddings import Embeddings
+
+from backend.agent.usage import EMBEDDING_USAGE_EVENT, count_tokens
+from backend.metrics import time_external_call
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings keyed by (model, normalized text). The cache can be saved to and loaded
+    from a local pickle file so that it survives restarts.
+    """
+
+    def __init__(self, max_entries: int = 4096, path: str | None = None):
+        self.max_entries = max_entries
+        self.path = path
+        self._entries: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+        self._lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split()).casefold()
+
+    def get(self, model: str, text: str) -> list[float] | None:
+        key = (model, self.normalize(text))
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return embedding
+
+    def put(self, model: str, text: str, embedding: list[float]):
+        key = (model, self.normalize(text))
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                entries = OrderedDict(list(pickle.load(f).items())[-self.max_entries:])
+        except Exception as e:
+            # Unpickling a corrupt file can raise about anything; start with a cold cache instead
+            logger.warning(f"Could not load the embedding cache from {self.path}: {e}")
+            return
+
+        with self._lock:
+            self._entries = entries
+        logger.info(f"Loaded {len(self._entries)} cached embeddings from {self.path}")
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            entries = OrderedDict(self._entries)
+        # Write to a temporary file first so that a crash never leaves a truncated cache behind. The name is unique,
+        # so that workers saving at the same time never write to the same file.
+        with tempfile.NamedTemporaryFile(dir=directory, prefix=".embedding-cache-", delete=False) as f:
+            tmp_path = f.name
+            try:
+                pickle.dump(entries, f)
+            except BaseException:
+                f.close()
+                os.remove(tmp_path)
+                raise
+        os.replace(tmp_path, self.path)
+        logger.info(f"Saved {len(entries)} cached embeddings to {self.path}")
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves query embeddings from an EmbeddingCache. Document embeddings are passed through.
+    Query embeddings requested from the model are reported to the callbacks of the enclosing run with an
+    EMBEDDING_USAGE_EVENT custom event. Only calls that reach the model are timed as external calls.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        with time_external_call("openai", "embed_documents"):
+            return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        with time_external_call("openai", "embed_documents"):
+            return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        if (embedding := self.cache.get(self.model, text)) is None:
+            with time_external_call("openai", "embed_query"):
+                embedding = self.embeddings.embed_query(text)
+            self.cache.put(self.model, text, embedding)
+            try:
+                dispatch_custom_event(EMBEDDING_USAGE_EVENT,
+                                      {"model": self.model, "tokens": count_tokens(self.model, [text])})
+            except RuntimeError:
+                pass  # Not called from a runnable, nobody is tracking the usage
+        return embedding
+
+    async def aembed_query(self, text: str) -> list[float]:
+        if (embedding := self.cache.get(self.model, text)) is None:
+            with time_external_call("openai", "embed_query"):
+                embedding = await self.embeddings.aembed_query(text)
+            self.cache.put(self.model, text, embedding)
+            try:
+                # Tokenizing is CPU work; keep it off the event loop
+                tokens = await asyncio.to_thread(count_tokens, self.model, [text])
+                await adispatch_custom_event(EMBEDDING_USAGE_EVENT, {"model": self.model, "tokens": tokens})
+            except RuntimeError:
+                pass  # Not called from a runnable, nobody is tracking the usage
+        return embedding
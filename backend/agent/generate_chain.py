@@ -1,20 +1,11 @@
 from langchain_core.language_models import BaseChatModel
-from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.output_parsers import JsonOutputParser, PydanticOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 
 from backend.schemas.chain import SearchResult
 
 
-def create_recommendation_chain(llm: BaseChatModel):
-    """
-    Creates a generate chain for answering code-related questions.
-
-    Args:
-        llm (LLM): The language model to use for generating responses.
-
-    Returns:
-        A callable function that takes a context and a question as input and returns a string response.
-    """
+def _create_recommendation_prompt(parser: PydanticOutputParser) -> ChatPromptTemplate:
     system_prompt = """You are a product recommendation assistant that uses both user requirements and community discussions to identify and recommend products. You have just received several Reddit comment chunks discussing various products. Your job is to:
 
 - Analyze the user's initial query and the retrieved Reddit documents to identify relevant products, brands, or categories that match the user's needs.
@@ -39,15 +30,44 @@ Using the above Reddit content and the user query, please identify the products
     # generate_prompt = PromptTemplate(template=system_prompt, input_variables=["prompt", "resources"])
     # generate_chain = generate_prompt | llm | StrOutputParser()
 
-    parser = PydanticOutputParser(pydantic_object=SearchResult)
-
     prompt = ChatPromptTemplate.from_messages([
         ("system", system_prompt),
         ("human", users_query),
     ]).partial(format_instructions=parser.get_format_instructions())
     prompt.input_variables = ["prompt", "resources"]
+    return prompt
+
+
+def create_recommendation_chain(llm: BaseChatModel):
+    """
+    Creates a generate chain for answering code-related questions.
+
+    Args:
+        llm (LLM): The language model to use for generating responses.
+
+    Returns:
+        A callable function that takes a context and a question as input and returns a string response.
+    """
+    parser = PydanticOutputParser(pydantic_object=SearchResult)
+
+    chain = _create_recommendation_prompt(parser) | llm | parser
+    return chain
+
+
+def create_recommendation_stream_chain(llm: BaseChatModel):
+    """
+    Creates the recommendation chain with a JSON parser, so that streaming it yields the partially generated
+    SearchResult as a dict after every token.
+
+    Args:
+        llm (LLM): The language model to use for generating responses.
+
+    Returns:
+        A runnable whose stream yields progressively more complete SearchResult dicts.
+    """
+    parser = PydanticOutputParser(pydantic_object=SearchResult)
 
-    chain = prompt | llm | parser
+    chain = _create_recommendation_prompt(parser) | llm | JsonOutputParser()
     return chain
 
 
@@ -2,6 +2,8 @@ from langchain import hub
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 
+from backend.schemas.chain import RetrievalGrades
+
 
 class GraderUtils:
     def __init__(self, llm):
@@ -35,6 +37,36 @@ class GraderUtils:
 
         return retriever_grader
 
+    def create_batch_retrieval_grader(self):
+        """
+        Creates a retrieval grader that assesses the relevance of a numbered list of retrieved documents in a single
+        LLM call.
+
+        Returns:
+            A callable function that takes the numbered documents and a question as input and returns a
+            RetrievalGrades object with one binary score per document, in document order.
+        """
+        grade_prompt = PromptTemplate(
+            template="""You are an evaluator tasked with determining whether each of the retrieved documents below matches the user prompt. Your role is to analyze every document for keywords relevant to the user prompt, and grade it as relevant.
+            For every document return a binary score of "yes" if it matches the user prompt and "no" if it does not match. Return exactly {count} scores, in the same order as the documents are numbered.
+
+            Context:
+            Retrieved Documents:
+            {resources}
+            User Prompt: {prompt}
+
+            Question:
+            Does each retrieved document match the user prompt?
+
+            Answer:
+            """,
+            input_variables=["resources", "prompt", "count"],
+        )
+
+        batch_retriever_grader = grade_prompt | self.llm.with_structured_output(RetrievalGrades)
+
+        return batch_retriever_grader
+
     def create_hallucination_grader(self):
         """
         Creates a hallucination grader that assesses whether an answer is grounded in/supported by a set of facts.
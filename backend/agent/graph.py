@@ -1,3 +1,4 @@
+import asyncio
 from enum import StrEnum
 
 from typing_extensions import TypedDict
@@ -13,17 +14,22 @@ class GraphState(TypedDict):
 
     Attributes:
         prompt: The prompt that was used to generate the response.
+        query: The prompt rewritten as a standalone query using the conversation, used for retrieval, grading and
+            generation. Falls back to the prompt.
         generation: LLM generation
         resources: A list of resources that were used to generate the response.
         steps: A list of steps that were taken to generate the response.
+        web_search_task: The speculative web search started with the retrieval, if any.
     """
     prompt: str
+    query: str
     generation: str
     resources: list
     steps: list[str]
     perform_web_search: bool
     category: str
     chat_session_id: int
+    web_search_task: asyncio.Task | None
 
 
 class Steps(StrEnum):
@@ -33,3 +39,12 @@ class Steps(StrEnum):
     PAPER_SEARCH_EVALUATION: str = "paper_search_evaluation"
     WEB_SEARCH_RETRIEVAL: str = "web_search_retrieval"
     LLM_GENERATION: str = "llm_generation"
+    SEMANTIC_CACHE_HIT: str = "semantic_cache_hit"
+
+
+class StreamEvents(StrEnum):
+    STEP: str = "step"
+    PRODUCT: str = "product"
+    LISTINGS: str = "listings"
+    RESULT: str = "result"
+    ERROR: str = "error"
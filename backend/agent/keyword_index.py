@@ -0,0 +1,115 @@
+import logging
+import math
+import re
+import time
+from collections import Counter, defaultdict
+from threading import Lock
+from typing import Callable
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# Words joined by hyphens, dots or slashes are kept together so that model names like "WH-1000XM5" stay one term
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lowercase the text and split it into terms. Compound terms such as "wh-1000xm5" are also indexed without their
+    separators ("wh1000xm5") and by their parts ("wh", "1000xm5"), so both spellings of a model name match.
+    """
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        parts = re.split(r"[-./]", token)
+        if len(parts) > 1:
+            tokens.append("".join(parts))
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over a fixed list of documents. Search results are copies, so callers can annotate their
+    metadata without affecting other searches.
+    """
+
+    def __init__(self, documents: list[Document], k1: float = 1.5, b: float = 0.75):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+
+        # Inverted index of term -> [(document position, term frequency)]
+        self._postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        self._lengths = []
+        for position, doc in enumerate(documents):
+            term_frequencies = Counter(tokenize(doc.page_content))
+            self._lengths.append(sum(term_frequencies.values()))
+            for term, frequency in term_frequencies.items():
+                self._postings[term].append((position, frequency))
+
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0
+        self._idf = {
+            term: math.log(1 + (len(documents) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def __len__(self):
+        return len(self.documents)
+
+    def search(self, query: str, k: int = 6) -> list[tuple[Document, float]]:
+        scores: dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for position, frequency in self._postings[term]:
+                length_norm = 1 - self.b + self.b * self._lengths[position] / self._average_length
+                scores[position] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+        top_k = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self._copy(self.documents[position]), score) for position, score in top_k]
+
+    @staticmethod
+    def _copy(doc: Document) -> Document:
+        return Document(id=doc.id, page_content=doc.page_content, metadata=dict(doc.metadata))
+
+
+class KeywordIndexes:
+    """
+    Per-namespace BM25 indexes built lazily from `loader` and rebuilt after `refresh_seconds`, so posts added by the
+    Reddit processing DAG become searchable without a restart. Every namespace is built under its own lock, so a
+    rebuild only holds up searches in that namespace.
+    """
+
+    def __init__(self, loader: Callable[[str], list[Document]], refresh_seconds: float = 900,
+                 clock: Callable[[], float] = time.monotonic):
+        self.loader = loader
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._indexes: dict[str, tuple[BM25Index, float]] = {}
+        self._namespace_locks: dict[str, Lock] = {}
+        self._lock = Lock()
+
+    def _fresh_index(self, namespace: str) -> BM25Index | None:
+        cached = self._indexes.get(namespace)
+        return cached[0] if cached is not None and cached[1] > self._clock() else None
+
+    def get(self, namespace: str) -> BM25Index:
+        if (index := self._fresh_index(namespace)) is not None:
+            return index
+
+        with self._lock:
+            namespace_lock = self._namespace_locks.setdefault(namespace, Lock())
+        with namespace_lock:
+            # Another thread may have built it while this one waited
+            if (index := self._fresh_index(namespace)) is not None:
+                return index
+            index = BM25Index(self.loader(namespace))
+            self._indexes[namespace] = (index, self._clock() + self.refresh_seconds)
+            logger.info(f"Built keyword index for namespace '{namespace}' with {len(index)} documents")
+            return index
+
+    def search(self, query: str, namespace: str, k: int = 6) -> list[tuple[Document, float]]:
+        return self.get(namespace).search(query, k=k)
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableConfig
+
+from backend.database.messages import MessageSenderEnum, fetch_messages_page
+
+logger = logging.getLogger(__name__)
+
+CONDENSE_PROMPT = PromptTemplate(
+    template="""You help a product recommendation assistant keep track of a conversation. Rewrite the user's latest message as a single standalone search query that contains every product requirement (category, features, budget, brands to include or avoid) needed to answer it without the conversation. Return only the query.
+
+Conversation summary:
+{summary}
+
+Recent turns:
+{turns}
+
+Latest message: {prompt}
+
+Standalone query:""",
+    input_variables=["summary", "turns", "prompt"],
+)
+
+SUMMARY_PROMPT = PromptTemplate(
+    template="""Update the summary of a shopping conversation with the turns below. Keep the user's requirements and preferences and the products that were already recommended, in at most five sentences. Return only the summary.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}
+
+Updated summary:""",
+    input_variables=["summary", "turns"],
+)
+
+
+@dataclass
+class ConversationTurn:
+    prompt: str
+    response: str
+    message_id: int = 0  # Id of the stored response
+
+
+@dataclass
+class Conversation:
+    summary: str = ""
+    turns: list[ConversationTurn] = field(default_factory=list)
+
+
+@dataclass
+class ConversationSummary:
+    text: str = ""
+    folded_through: int = 0  # Message id of the last turn folded into the summary
+
+
+def summarize_generation(generation: str) -> str:
+    """
+    Compact a stored generation (SearchResult JSON) to the recommended product names and the reasoning summary.
+    """
+    try:
+        result = json.loads(generation)
+    except (TypeError, json.JSONDecodeError):
+        return generation
+    products = ", ".join(product.get("product_name", "") for product in result.get("products", []))
+    return f"Recommended: {products}. {result.get('reasoning_summary', '')}".strip()
+
+
+class ConversationMemory:
+    """
+    Conversation state per chat session: the last `max_recent_turns` turns plus a rolling summary of the older
+    ones. Follow-up prompts are condensed into a standalone query used for retrieval, grading and generation, so the
+    work per turn does not grow with the conversation.
+
+    The turns are always read from the `messages` table, which every backend worker writes to, so no worker serves
+    stale turns (with MESSAGE_WRITE_BEHIND_ENABLED a turn is visible once its batch has been flushed). Turns that
+    fall out of the recent window are folded into the summary in the background. Summaries are kept per process
+    for up to `max_sessions` chat sessions; a worker without a summary condenses with the recent turns only.
+    """
+
+    def __init__(self, llm: BaseChatModel, max_recent_turns: int = 4, max_sessions: int = 1024):
+        self.max_recent_turns = max_recent_turns
+        self.max_sessions = max_sessions
+        self.condense_chain = CONDENSE_PROMPT | llm | StrOutputParser()
+        self.summary_chain = SUMMARY_PROMPT | llm | StrOutputParser()
+
+        self._summaries: OrderedDict[int, ConversationSummary] = OrderedDict()
+        self._summary_tasks: set[asyncio.Task] = set()
+
+    @staticmethod
+    def _format_turns(turns: list[ConversationTurn]) -> str:
+        return "\n".join(f"User: {turn.prompt}\nAssistant: {turn.response}" for turn in turns)
+
+    async def _load_turns(self, chat_session_id: int) -> list[ConversationTurn]:
+        # One turn more than the window, so that the turn that just fell out of it can be summarized
+        messages, _ = await fetch_messages_page(chat_session_id, limit=(self.max_recent_turns + 1) * 2)
+        turns, prompt = [], None
+        for message in messages:
+            if message.sender == MessageSenderEnum.USER.value:
+                prompt = message.content
+            elif prompt is not None:
+                turns.append(ConversationTurn(prompt=prompt, response=summarize_generation(message.content),
+                                              message_id=message.id))
+                prompt = None
+        return turns
+
+    def _summary(self, chat_session_id: int) -> ConversationSummary:
+        if (summary := self._summaries.get(chat_session_id)) is None:
+            summary = self._summaries[chat_session_id] = ConversationSummary()
+            while len(self._summaries) > self.max_sessions:
+                self._summaries.popitem(last=False)
+        self._summaries.move_to_end(chat_session_id)
+        return summary
+
+    async def load(self, chat_session_id: int | None) -> Conversation:
+        if chat_session_id is None:
+            return Conversation()
+        turns = await self._load_turns(chat_session_id)
+        summary = self._summary(chat_session_id)
+
+        overflow = [turn for turn in turns[:-self.max_recent_turns] if turn.message_id > summary.folded_through]
+        if overflow:
+            summary.folded_through = overflow[-1].message_id
+            task = asyncio.create_task(self._fold_into_summary(summary, overflow))
+            self._summary_tasks.add(task)
+            task.add_done_callback(self._on_summary_done)
+        return Conversation(summary=summary.text, turns=turns[-self.max_recent_turns:])
+
+    async def condense(self, conversation: Conversation, prompt: str, config: RunnableConfig | None = None) -> str:
+        """
+        Return the standalone query for the prompt. The first prompt of a conversation is used as is. `config` is
+        passed to the LLM call, e.g. to track its token usage.
+        """
+        if not conversation.summary and not conversation.turns:
+            return prompt
+        try:
+            query = await self.condense_chain.ainvoke({
+                "summary": conversation.summary or "(none)",
+                "turns": self._format_turns(conversation.turns),
+                "prompt": prompt,
+            }, config=config)
+        except Exception as e:
+            logger.warning(f"Could not condense the prompt, using it as is: {e}")
+            return prompt
+        return query.strip() or prompt
+
+    async def _fold_into_summary(self, summary: ConversationSummary, turns: list[ConversationTurn]):
+        summary.text = (await self.summary_chain.ainvoke({
+            "summary": summary.text or "(none)",
+            "turns": self._format_turns(turns),
+        })).strip()
+
+    def _on_summary_done(self, task: asyncio.Task):
+        self._summary_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Could not update the conversation summary: {task.exception()}")
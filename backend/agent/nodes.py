@@ -1,97 +1,202 @@
+import asyncio
 import json
 import logging
 
 from langchain_community.tools import TavilySearchResults
+from langchain_core.callbacks import adispatch_custom_event
 from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import RunnableConfig
 from langgraph.errors import create_error_message
+from pydantic import ValidationError
 
-from backend.agent.generate_chain import create_recommendation_chain
-from backend.agent.graph import Steps, GraphState
+from backend.agent.generate_chain import create_recommendation_stream_chain
+from backend.agent.graph import Steps, GraphState, StreamEvents
+from backend.agent.reranker import LocalReranker
 from backend.agent.vector_store import Retriever
-from backend.database.messages import create_message, MessageSenderEnum
+from backend.database.write_behind import persist_chat_turn
+from backend.schemas.chain import ExtractedProduct, SearchResult
 
 logger = logging.getLogger(__name__)
 
 
 class GraphNodes:
-    def __init__(self, llm: BaseChatModel, retriever: Retriever, retrieval_grader, web_search_tool: TavilySearchResults):
+    def __init__(self, llm: BaseChatModel, retriever: Retriever, retrieval_grader, web_search_tool: TavilySearchResults,
+                 batch_retrieval_grader=None, grading_mode: str = "sequential", grading_max_concurrency: int = 6,
+                 speculative_web_search: bool = False, reranker: LocalReranker | None = None):
         self.llm = llm
         self.retriever = retriever
         self.retrieval_grader = retrieval_grader
+        self.batch_retrieval_grader = batch_retrieval_grader
+        self.grading_mode = grading_mode
+        self.grading_max_concurrency = grading_max_concurrency
         self.web_search_tool = web_search_tool
+        self.speculative_web_search = speculative_web_search
+        self.reranker = reranker
 
-        self.generate_chain = create_recommendation_chain(llm)
+        self.generate_stream_chain = create_recommendation_stream_chain(llm)
 
-    def vector_store_retrieve(self, state):
+    async def avector_store_retrieve(self, state):
         """
-        Retrieve documents
-
-        Args:
-            state (dict): The current graph state
-
-        Returns:
-            state (dict): New key added to state, documents, that contains retrieved documents
+        Retrieve the documents of the category matching the query. With speculative web search enabled, the web
+        search is started here so that it runs while the vector store results are retrieved and graded.
         """
-        print("---RETRIEVE---")
-        prompt = state["prompt"]
+        logger.debug("---RETRIEVE---")
+        prompt = self._query(state)
         namespace = state["category"]
 
+        if self.speculative_web_search:
+            state["web_search_task"] = self._start_speculative_web_search(prompt)
+
         # Retrieval
-        documents = self.retriever.sim_search(prompt, namespace)
+        documents = await self.retriever.asim_search(prompt, namespace)
         state["resources"] = documents
         state["steps"] = [Steps.VECTOR_STORE_RETRIEVAL.value]
 
         return state
 
-    def generate(self, state):
-        """
-        Generate answer
-
-        Args:
-            state (dict): The current graph state
+    @staticmethod
+    def _query(state) -> str:
+        # Standalone query condensed from the conversation; the raw prompt is what gets stored in the chat
+        return state.get("query") or state["prompt"]
 
-        Returns:
-            state (dict): New key added to state, generation, that contains LLM generation
-        """
-        print("---GENERATE---")
-        prompt = state["prompt"]
+    @staticmethod
+    def _generation_inputs(state) -> tuple[dict, list[str]]:
         # TODO: Handle Tavily web results by converting to Document
         resources = [r.page_content if hasattr(r, "page_content") else r for r in state["resources"]]
+        inputs = {"resources": '\n'.join(f"{index + 1}. {item}" for index, item in enumerate(resources)),
+                  "prompt": GraphNodes._query(state)}
+        return inputs, resources
 
-        # RAG generation
-        generation = self.generate_chain.invoke({"resources": '\n'.join(f"{index + 1}. {item}" for index, item in enumerate(resources)), "prompt": prompt})
-
-
+    @staticmethod
+    def _tools_used(state) -> list[str]:
         tools_used = ["vector_search"]
         if state.get("perform_web_search", False):
             tools_used.append("web_search")
+        return tools_used
+
+    @staticmethod
+    async def _save_messages(state, generation, resources: list[str], tools_used: list[str]):
+        await persist_chat_turn(chat_session_id=state["chat_session_id"], prompt=state["prompt"],
+                                generation=json.dumps(generation.model_dump(mode="json")),
+                                references=[r for r in resources], tools_used=tools_used)
+
+    async def agenerate(self, state, config: RunnableConfig | None = None):
+        """
+        Generate the recommendation and store the chat turn. The generation is streamed, and every product is
+        dispatched as a StreamEvents.PRODUCT custom event as soon as it has been completely generated.
+        """
+        logger.debug("---GENERATE---")
+        inputs, resources = self._generation_inputs(state)
 
-        create_message(content=prompt, chat_session_id=state["chat_session_id"], references=[], sender=MessageSenderEnum.USER,
-                       tools_used=tools_used)
-        create_message(content=json.dumps(generation.model_dump(mode="json")), chat_session_id=state["chat_session_id"], references=[r for r in resources],
-                       sender=MessageSenderEnum.SYSTEM, tools_used=tools_used)
+        self._discard_speculative_web_search(state)
+
+        # RAG generation
+        generation = await self._astream_generation(inputs, config)
+
+        await self._save_messages(state, generation, resources, self._tools_used(state))
 
         state["generation"] = generation
         state["steps"].append(Steps.LLM_GENERATION.value)
         return state
 
-    def _base_grade_documents(self, state: GraphState, previous_state: str):
-        prompt = state["prompt"]
-        resources = state["resources"]
+    async def _astream_generation(self, inputs: dict, config: RunnableConfig | None) -> SearchResult:
+        partial_result = {}
+        emitted_products = 0
+
+        async for partial_result in self.generate_stream_chain.astream(inputs, config=config):
+            # A product is complete once the model has moved on to the next one
+            products = partial_result.get("products") or []
+            for product in products[emitted_products:len(products) - 1]:
+                await self._dispatch_product(product, config)
+                emitted_products += 1
+
+        for product in (partial_result.get("products") or [])[emitted_products:]:
+            await self._dispatch_product(product, config)
+
+        try:
+            return SearchResult.model_validate(partial_result)
+        except ValidationError as e:
+            raise ValueError(f"Failed to parse the recommendation generation: {e}")
+
+    @staticmethod
+    async def _dispatch_product(product: dict, config: RunnableConfig | None):
+        try:
+            extracted_product = ExtractedProduct.model_validate(product)
+        except ValidationError:
+            return
+        if config is not None:
+            await adispatch_custom_event(StreamEvents.PRODUCT.value, extracted_product.model_dump(), config=config)
+
+    @staticmethod
+    def _grade_inputs(prompt: str, resources: list) -> list[dict]:
+        return [{"prompt": prompt, "resources": resource} for resource in resources]
+
+    @staticmethod
+    def _batch_grade_inputs(prompt: str, resources: list) -> dict:
+        numbered_resources = '\n'.join(
+            f"{index + 1}. {r.page_content if hasattr(r, 'page_content') else r}" for index, r in enumerate(resources)
+        )
+        return {"prompt": prompt, "resources": numbered_resources, "count": len(resources)}
+
+    @staticmethod
+    def _batch_grade_verdicts(grades, resources: list) -> list[bool] | None:
+        if len(grades.scores) != len(resources):
+            logger.warning(f"Batched retrieval grader returned {len(grades.scores)} scores for {len(resources)} "
+                           f"documents, grading documents one by one")
+            return None
+        return [score.strip().lower() == "yes" for score in grades.scores]
+
+    @staticmethod
+    def _verdicts(scores: list[dict]) -> list[bool]:
+        return [score["score"].lower() == "yes" for score in scores]
+
+    def _use_batched_grading(self, resources: list) -> bool:
+        return self.grading_mode == "batched" and self.batch_retrieval_grader is not None and bool(resources)
+
+    async def _agrade_each_resource(self, prompt: str, resources: list) -> list[bool]:
+        if self.grading_mode == "sequential":
+            scores = [await self.retrieval_grader.ainvoke(grade_input)
+                      for grade_input in self._grade_inputs(prompt, resources)]
+        else:
+            # Independent per-document verdicts fanned out concurrently; abatch keeps the input order
+            scores = await self.retrieval_grader.abatch(
+                self._grade_inputs(prompt, resources),
+                config={"max_concurrency": self.grading_max_concurrency},
+            )
+        return self._verdicts(scores)
+
+    async def _agrade_resources_batched(self, prompt: str, resources: list) -> list[bool] | None:
+        """
+        Grade every resource with a single LLM call.
 
+        Returns:
+            One verdict per resource, or None when the batched grade could not be used and the caller should fall
+            back to grading each resource on its own.
+        """
+        try:
+            grades = await self.batch_retrieval_grader.ainvoke(self._batch_grade_inputs(prompt, resources))
+        except Exception as e:
+            logger.warning(f"Batched retrieval grading failed, grading documents one by one: {e}")
+            return None
+        return self._batch_grade_verdicts(grades, resources)
+
+    async def _agrade_resources(self, prompt: str, resources: list) -> list[bool]:
+        if self._use_batched_grading(resources):
+            verdicts = await self._agrade_resources_batched(prompt, resources)
+            if verdicts is not None:
+                return verdicts
+        return await self._agrade_each_resource(prompt, resources)
+
+    @staticmethod
+    def _apply_grades(state: GraphState, previous_state: str, verdicts: list[bool]):
         filtered_resources = []
         next_search = False
 
-        for resource in resources:
-            score = self.retrieval_grader.invoke({
-                "prompt": prompt, "resources": resource
-            })
-            # print(f"{resource} || {score}")
-            if score["score"].lower() == "yes":
+        for resource, relevant in zip(state["resources"], verdicts):
+            if relevant:
                 filtered_resources.append(resource)
             else:
                 next_search = True
-                continue
 
         if next_search:
             match previous_state:
@@ -102,37 +207,70 @@ class GraphNodes:
 
         return state
 
-    def grade_vector_store_documents(self, state: GraphState):
-        print("---GRADE VECTOR STORE DOCUMENTS---")
-        return self._base_grade_documents(state, "vector_store")
-
-    def web_search(self, state: GraphState):
-        print("---WEB SEARCH - TAVILY---")
-
-        prompt = state["prompt"]
-        web_results = self.web_search_tool.invoke({"query": prompt})
+    def _local_verdicts(self, prompt: str, resources: list) -> list[bool | None]:
+        if self.reranker is None:
+            return [None] * len(resources)
+        return self.reranker.verdicts(prompt, resources)
+
+    @staticmethod
+    def _merge_verdicts(local_verdicts: list[bool | None], grader_verdicts: list[bool]) -> list[bool]:
+        # Grader verdicts fill in the resources the local reranker left undecided, in order
+        grader_verdicts = iter(grader_verdicts)
+        return [verdict if verdict is not None else next(grader_verdicts) for verdict in local_verdicts]
+
+    async def _abase_grade_documents(self, state: GraphState, previous_state: str):
+        local_verdicts = self._local_verdicts(self._query(state), state["resources"])
+        ambiguous = [r for r, verdict in zip(state["resources"], local_verdicts) if verdict is None]
+        grader_verdicts = await self._agrade_resources(self._query(state), ambiguous) if ambiguous else []
+        return self._apply_grades(state, previous_state, self._merge_verdicts(local_verdicts, grader_verdicts))
+
+    async def agrade_vector_store_documents(self, state: GraphState):
+        logger.debug("---GRADE VECTOR STORE DOCUMENTS---")
+        return await self._abase_grade_documents(state, "vector_store")
+
+    @staticmethod
+    def _apply_web_results(state: GraphState, web_results: list[dict]):
         state["resources"] = [
            result["content"] for result in web_results
         ]
         state["steps"].append(Steps.WEB_SEARCH_RETRIEVAL.value)
 
-        print(state["resources"])
+        logger.debug(f"Web search results: {state['resources']}")
         return state
 
-    def transform_query(self, state):
-        """
-        Transform the query to produce a better question.
-
-        Args:
-            state (dict): The current graph state
-
-        Returns:
-            state (dict): Updates question key with a re-phrased question
-        """
-        print("---TRANSFORM QUERY---")
-        question = state["input"]
-        documents = state["documents"]
-
-        # Re-write question
-        better_question = self.question_rewriter.invoke({"input": question})
-        return {"documents": documents, "input": better_question}
+    async def aweb_search(self, state: GraphState):
+        logger.debug("---WEB SEARCH - TAVILY---")
+
+        prompt = self._query(state)
+        web_results = await self._await_speculative_web_search(state)
+        if web_results is None:
+            web_results = await self.web_search_tool.ainvoke({"query": prompt})
+        return self._apply_web_results(state, web_results)
+
+    def _start_speculative_web_search(self, prompt: str) -> asyncio.Task:
+        task = asyncio.create_task(self.web_search_tool.ainvoke({"query": prompt}))
+        # Results of a discarded search are never awaited; retrieve the exception so it is not reported as unhandled
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    @staticmethod
+    async def _await_speculative_web_search(state: GraphState) -> list[dict] | None:
+        task = state.get("web_search_task")
+        if task is None:
+            return None
+
+        state["web_search_task"] = None
+        try:
+            return await task
+        except Exception as e:
+            logger.warning(f"Speculative web search failed, searching again: {e}")
+            return None
+
+    @staticmethod
+    def _discard_speculative_web_search(state: GraphState):
+        task = state.get("web_search_task")
+        if task is not None:
+            if not task.done():
+                logger.debug("---DISCARD SPECULATIVE WEB SEARCH---")
+                task.cancel()
+            state["web_search_task"] = None
@@ -0,0 +1,64 @@
+import logging
+
+from langchain_core.documents import Document
+
+from backend.agent.keyword_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+_STOPWORDS = {
+    "a", "an", "and", "any", "are", "as", "at", "be", "best", "but", "by", "can", "do", "for", "from", "good", "have",
+    "i", "in", "is", "it", "me", "my", "of", "on", "or", "some", "that", "the", "to", "under", "what", "which",
+    "with", "you",
+}
+
+
+class LocalReranker:
+    """
+    Scores retrieved documents against the prompt without an LLM call. The score blends the share of prompt terms
+    found in the document with the vector store similarity (when the retriever reported one). Documents scoring at
+    or above `accept_threshold` are relevant, documents at or below `reject_threshold` are irrelevant and everything
+    in between is left to the LLM retrieval grader.
+    """
+
+    def __init__(self, accept_threshold: float = 0.7, reject_threshold: float = 0.25, similarity_weight: float = 0.6):
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+        self.similarity_weight = similarity_weight
+
+    @staticmethod
+    def _terms(text: str) -> set[str]:
+        return {term for term in tokenize(text) if term not in _STOPWORDS}
+
+    def score(self, prompt: str, resource: Document | str) -> float:
+        text = resource.page_content if isinstance(resource, Document) else str(resource)
+        prompt_terms = self._terms(prompt)
+        coverage = len(prompt_terms & self._terms(text)) / len(prompt_terms) if prompt_terms else 0.0
+
+        similarity = resource.metadata.get("similarity") if isinstance(resource, Document) else None
+        if similarity is None:
+            return coverage
+        return self.similarity_weight * similarity + (1 - self.similarity_weight) * coverage
+
+    def verdicts(self, prompt: str, resources: list) -> list[bool | None]:
+        """
+        Decide each resource locally.
+
+        Returns:
+            True or False for resources that were decided, None for ambiguous ones. The resources are not modified;
+            use `score` for the scores.
+        """
+        verdicts = []
+        for resource in resources:
+            score = self.score(prompt, resource)
+            if score >= self.accept_threshold:
+                verdicts.append(True)
+            elif score <= self.reject_threshold:
+                verdicts.append(False)
+            else:
+                verdicts.append(None)
+
+        ambiguous = verdicts.count(None)
+        logger.info(f"Local reranker decided {len(verdicts) - ambiguous} of {len(verdicts)} documents, "
+                    f"{ambiguous} left for the retrieval grader")
+        return verdicts
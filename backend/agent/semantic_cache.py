@@ -0,0 +1,121 @@
+import logging
+import time
+from collections import OrderedDict
+from itertools import count
+from threading import Lock
+from typing import Any, Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _CacheEntry:
+    __slots__ = ("namespace", "embedding", "value", "expires_at")
+
+    def __init__(self, namespace: str, embedding: np.ndarray, value: Any, expires_at: float):
+        self.namespace = namespace
+        self.embedding = embedding
+        self.value = value
+        self.expires_at = expires_at
+
+
+class SemanticCache:
+    """
+    In-process semantic cache. Values are stored under a namespace (the product category) and the embedding of the
+    prompt that produced them; a lookup returns the value of the most similar cached prompt in the same namespace if
+    its cosine similarity reaches the threshold. Entries expire after `ttl_seconds` and the least recently used
+    entry is evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, max_entries: int = 1024, ttl_seconds: float = 3600,
+                 clock: Callable[[], float] = time.monotonic):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+
+        self._entries: OrderedDict[int, _CacheEntry] = OrderedDict()
+        self._ids = count()
+        # Per namespace (entry ids, stacked normalized embeddings), rebuilt lazily after the namespace changes
+        self._matrices: dict[str, tuple[list[int], np.ndarray]] = {}
+        self._lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _namespace_matrix(self, namespace: str) -> tuple[list[int], np.ndarray] | None:
+        if namespace not in self._matrices:
+            entry_ids = [entry_id for entry_id, entry in self._entries.items() if entry.namespace == namespace]
+            if not entry_ids:
+                return None
+            self._matrices[namespace] = (entry_ids, np.stack([self._entries[i].embedding for i in entry_ids]))
+        return self._matrices[namespace]
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        self._matrices.pop(entry.namespace, None)
+
+    def _remove_expired(self):
+        now = self._clock()
+        for entry_id in [entry_id for entry_id, entry in self._entries.items() if entry.expires_at <= now]:
+            self._remove(entry_id)
+            self.expirations += 1
+
+    def lookup(self, namespace: str, embedding) -> Any | None:
+        """
+        Return the value cached for the most similar prompt in the namespace, or None on a miss.
+        """
+        query = self._normalize(embedding)
+        with self._lock:
+            self._remove_expired()
+            index = self._namespace_matrix(namespace)
+            if index is not None:
+                entry_ids, matrix = index
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    self.hits += 1
+                    self._entries.move_to_end(entry_ids[best])
+                    logger.info(f"Semantic cache hit in '{namespace}' (similarity {similarities[best]:.3f})")
+                    return self._entries[entry_ids[best]].value
+            self.misses += 1
+            return None
+
+    def store(self, namespace: str, embedding, value: Any):
+        with self._lock:
+            self._entries[next(self._ids)] = _CacheEntry(
+                namespace=namespace,
+                embedding=self._normalize(embedding),
+                value=value,
+                expires_at=self._clock() + self.ttl_seconds,
+            )
+            self._matrices.pop(namespace, None)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrices.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
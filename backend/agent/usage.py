@@ -0,0 +1,184 @@
+import logging
+import math
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from threading import Lock
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+logger = logging.getLogger(__name__)
+
+# Custom event dispatched by CachedEmbeddings for every query embedding requested from the API, with the model and
+# the number of tokens embedded
+EMBEDDING_USAGE_EVENT = "embedding_usage"
+# Run metadata naming the step that calls made outside the graph are attributed to
+USAGE_NODE_METADATA_KEY = "usage_node"
+
+# USD per million input and output tokens
+MODEL_PRICES_PER_MILLION_TOKENS = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+# USD per call, for tools billed by request
+TOOL_PRICES_PER_CALL = {
+    "tavily_search_results_json": 0.008,
+}
+
+
+def _price(prices: dict, model: str):
+    # Models reported by the API carry a snapshot suffix (gpt-4o-mini-2024-07-18); match the longest known prefix
+    for name in sorted(prices, key=len, reverse=True):
+        if model.startswith(name):
+            return prices[name]
+    return None
+
+
+def token_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    if (prices := _price(MODEL_PRICES_PER_MILLION_TOKENS, model)) is None:
+        return 0.0
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:
+        logger.warning(f"No tokenizer for {model}, estimating embedding tokens from the text length: {e}")
+        return None
+
+
+def preload_encoding(model: str):
+    """
+    Load the tokenizer of the model (tiktoken downloads it on first use), so that counting never waits for it.
+    """
+    _encoding(model)
+
+
+def count_tokens(model: str, texts: list[str]) -> int:
+    if (encoding := _encoding(model)) is None:
+        # About four characters per token for English text
+        return sum(math.ceil(len(text) / 4) for text in texts)
+    return sum(len(encoding.encode(text)) for text in texts)
+
+
+def _llm_token_usage(response: LLMResult) -> tuple[int, int]:
+    prompt_tokens = completion_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+    if not prompt_tokens and not completion_tokens:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens, completion_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return prompt_tokens, completion_tokens
+
+
+@dataclass
+class UsageRecord:
+    node: str
+    model: str
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+    seconds: float = 0.0
+
+
+class TokenUsageTracker(BaseCallbackHandler):
+    """
+    LangChain callback collecting the token usage and cost of one graph run, per graph node and model: LLM calls
+    (completion tokens included, which requires `stream_usage` for streamed chat models), query embeddings requested
+    from the API (reported by CachedEmbeddings, cache hits cost nothing) and billed tool calls. Calls made outside
+    the graph are attributed to the step named by `usage_config`, or to "other".
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._records: dict[tuple[str, str], UsageRecord] = {}
+        self._started: dict[UUID, tuple[str, str, float]] = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def _node(metadata: dict[str, Any] | None) -> str:
+        metadata = metadata or {}
+        return metadata.get("langgraph_node") or metadata.get(USAGE_NODE_METADATA_KEY) or "other"
+
+    def record(self, node: str, model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+               seconds: float = 0.0, cost_usd: float | None = None):
+        if cost_usd is None:
+            cost_usd = token_cost(model, prompt_tokens, completion_tokens)
+        with self._lock:
+            record = self._records.setdefault((node, model), UsageRecord(node=node, model=model))
+            record.calls += 1
+            record.prompt_tokens += prompt_tokens
+            record.completion_tokens += completion_tokens
+            record.cost_usd += cost_usd
+            record.seconds += seconds
+
+    def records(self) -> list[UsageRecord]:
+        with self._lock:
+            return sorted(self._records.values(), key=lambda record: (record.node, record.model))
+
+    def _start(self, run_id: UUID, metadata: dict[str, Any] | None, model: str):
+        self._started[run_id] = (self._node(metadata), model, time.perf_counter())
+
+    def on_chat_model_start(self, serialized: dict[str, Any], messages: Any, *, run_id: UUID,
+                            metadata: dict[str, Any] | None = None, **kwargs: Any):
+        self._start(run_id, metadata, (metadata or {}).get("ls_model_name") or "chat_model")
+
+    def on_llm_start(self, serialized: dict[str, Any], prompts: list[str], *, run_id: UUID,
+                     metadata: dict[str, Any] | None = None, **kwargs: Any):
+        self._start(run_id, metadata, (metadata or {}).get("ls_model_name") or "llm")
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        if (started := self._started.pop(run_id, None)) is None:
+            return
+        node, model, start = started
+        model = (response.llm_output or {}).get("model_name") or model
+        prompt_tokens, completion_tokens = _llm_token_usage(response)
+        self.record(node, model, prompt_tokens, completion_tokens, seconds=time.perf_counter() - start)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        if (started := self._started.pop(run_id, None)) is not None:
+            node, model, start = started
+            self.record(node, model, seconds=time.perf_counter() - start)
+
+    def on_tool_start(self, serialized: dict[str, Any], input_str: str, *, run_id: UUID,
+                      metadata: dict[str, Any] | None = None, **kwargs: Any):
+        self._start(run_id, metadata, (serialized or {}).get("name") or kwargs.get("name") or "tool")
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any):
+        if (started := self._started.pop(run_id, None)) is not None:
+            node, tool, start = started
+            self.record(node, tool, seconds=time.perf_counter() - start,
+                        cost_usd=_price(TOOL_PRICES_PER_CALL, tool) or 0.0)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._started.pop(run_id, None)
+
+    def on_custom_event(self, name: str, data: Any, *, run_id: UUID, metadata: dict[str, Any] | None = None,
+                        **kwargs: Any):
+        if name == EMBEDDING_USAGE_EVENT:
+            # Counted by the caller: this callback runs inline on the event loop
+            self.record(self._node(metadata), data["model"], data["tokens"])
+
+
+def usage_config(tracker: TokenUsageTracker | None, node: str) -> dict:
+    """
+    Run config reporting the usage of a call made outside the graph (e.g. condensing the prompt) to `tracker`, under
+    the step name `node`.
+    """
+    if tracker is None:
+        return {}
+    return {"callbacks": [tracker], "metadata": {USAGE_NODE_METADATA_KEY: node}}
@@ -1,9 +1,36 @@
+import asyncio
+import json
+import logging
+from functools import lru_cache
+
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
 from langchain_openai import OpenAIEmbeddings
 from langchain_pinecone import PineconeVectorStore
 from pinecone import Pinecone
 
+from backend.agent.embedding_cache import CachedEmbeddings, EmbeddingCache
+from backend.agent.keyword_index import KeywordIndexes
+from backend.local_index import LocalVectorStore
 from backend.config import settings
+from backend.database.reddit_posts import RedditPostModel, fetch_reddit_posts_by_namespace
+from backend.metrics import time_external_call
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache
+def get_embedding_cache() -> EmbeddingCache:
+    cache = EmbeddingCache(max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES, path=settings.EMBEDDING_CACHE_PATH)
+    cache.load()
+    return cache
+
+
+@lru_cache
+def get_embeddings() -> CachedEmbeddings:
+    embeddings = OpenAIEmbeddings(model=settings.OPENAI_EMBEDDINGS_MODEL, api_key=settings.OPENAI_API_KEY)
+    return CachedEmbeddings(embeddings, model=settings.OPENAI_EMBEDDINGS_MODEL, cache=get_embedding_cache())
 
 
 def get_pinecone_vector_store():
@@ -11,7 +38,7 @@ def get_pinecone_vector_store():
     Create pinecone vector store using langchain tooling
     :return:
     """
-    embeddings = OpenAIEmbeddings(model=settings.OPENAI_EMBEDDINGS_MODEL, api_key=settings.OPENAI_API_KEY)
+    embeddings = get_embeddings()
     pinecone_client = Pinecone(api_key=settings.PINECONE_API_KEY)
     pinecone_index = pinecone_client.Index(settings.PINECONE_INDEX_NAME)
     vector_store = PineconeVectorStore(index=pinecone_index, embedding=embeddings)
@@ -19,15 +46,145 @@ def get_pinecone_vector_store():
     return vector_store
 
 
+def get_local_vector_store():
+    """
+    Create the in-process vector store that reads the index written by the Reddit processing DAG
+    :return:
+    """
+    return LocalVectorStore(path=settings.LOCAL_VECTOR_INDEX_PATH, embedding=get_embeddings())
+
+
+def get_vector_store_distance_metric() -> str:
+    return "cosine" if settings.VECTOR_STORE_BACKEND == "local" else settings.PINECONE_METRIC
+
+
+def get_vector_store() -> VectorStore:
+    """
+    Create the vector store selected by `VECTOR_STORE_BACKEND`
+    :return:
+    """
+    if settings.VECTOR_STORE_BACKEND == "local":
+        return get_local_vector_store()
+    return get_pinecone_vector_store()
+
+
+def _reddit_post_document(post: RedditPostModel) -> Document:
+    # Rebuild the text and metadata the Reddit processing DAG indexes in the vector store
+    comments = post.comments or []
+    comments_text = " ".join(
+        f"Comment by {comment.get('author', 'Unknown')}: {comment.get('text', '')}" for comment in comments)
+    return Document(
+        id=post.id,
+        page_content=f"{post.title} {post.body or ''} {comments_text}",
+        metadata={
+            "id": post.id,
+            "title": post.title,
+            "body": post.body or "",
+            "author": post.author,
+            "subreddit": post.subreddit,
+            "score": post.score or 0,  # Nullable; reranking sorts on it
+            "created": str(post.created_at),
+            "s3_url": post.s3_url,
+            "namespace": post.namespace,
+            "comments": json.dumps(comments),
+        },
+    )
+
+
+def load_reddit_post_documents(namespace: str) -> list[Document]:
+    return [_reddit_post_document(post) for post in fetch_reddit_posts_by_namespace(namespace)]
+
+
+def get_keyword_indexes(vector_store: VectorStore) -> KeywordIndexes:
+    """
+    Create the BM25 indexes used by hybrid retrieval. The local vector index already holds the post texts; with
+    Pinecone they are read back from the `reddit_posts` table.
+    :return:
+    """
+    loader = vector_store.documents if isinstance(vector_store, LocalVectorStore) else load_reddit_post_documents
+    return KeywordIndexes(loader=loader, refresh_seconds=settings.KEYWORD_INDEX_REFRESH_SECONDS)
+
 
 class Retriever:
-    def __init__(self, vector_store: PineconeVectorStore):
+    def __init__(self, vector_store: VectorStore, embeddings: Embeddings | None = None,
+                 keyword_indexes: KeywordIndexes | None = None, retrieval_mode: str = "dense", k: int = 6,
+                 hybrid_candidates: int = 12, rrf_k: int = 60, distance_metric: str = "cosine"):
         self.vector_store = vector_store
+        self.embeddings = embeddings or vector_store.embeddings
+        self.keyword_indexes = keyword_indexes
+        self.retrieval_mode = retrieval_mode
+        self.k = k
+        self.hybrid_candidates = hybrid_candidates
+        self.rrf_k = rrf_k
+        self.distance_metric = distance_metric
+
+    @property
+    def _use_hybrid(self) -> bool:
+        return self.retrieval_mode == "hybrid" and self.keyword_indexes is not None
+
+    @property
+    def _vector_store_service(self) -> str:
+        return "local_index" if isinstance(self.vector_store, LocalVectorStore) else "pinecone"
+
+    def _dense_search(self, embedding: list[float], k: int, namespace: str | None) -> list[tuple[Document, float]]:
+        with time_external_call(self._vector_store_service, "similarity_search"):
+            return self.vector_store.similarity_search_by_vector_with_score(
+                embedding, k=k, namespace=namespace if namespace else "")
+
+    async def asim_search(self, prompt: str, namespace: str | None):
+        embedding = await self.embeddings.aembed_query(prompt)
+        if not self._use_hybrid:
+            top_matched_docs = await asyncio.to_thread(self._dense_search, embedding, self.k, namespace)
+            return self._rerank_docs(self._with_similarity(top_matched_docs))
+
+        dense_docs, keyword_docs = await asyncio.gather(
+            asyncio.to_thread(self._dense_search, embedding, self.hybrid_candidates, namespace),
+            asyncio.to_thread(self._keyword_search, prompt, namespace),
+        )
+        return self._rerank_docs(self._fuse(self._with_similarity(dense_docs), keyword_docs))
+
+    def _keyword_search(self, prompt: str, namespace: str | None) -> list[Document]:
+        try:
+            results = self.keyword_indexes.search(prompt, namespace=namespace if namespace else "",
+                                                  k=self.hybrid_candidates)
+        except Exception as e:
+            # The keyword side is best effort; retrieval falls back to the dense results only
+            logger.warning(f"Keyword search failed, using dense results only: {e}")
+            return []
+        return [doc for doc, _ in results]
+
+    @staticmethod
+    def _doc_key(doc: Document) -> str:
+        return str(doc.metadata.get("id") or doc.id or doc.page_content)
+
+    def _fuse(self, *rankings: list[Document]) -> list[Document]:
+        """
+        Reciprocal-rank fusion of the ranked lists, keeping the top `k` documents.
+        """
+        fused: dict[str, tuple[Document, float]] = {}
+        for ranking in rankings:
+            for rank, doc in enumerate(ranking):
+                key = self._doc_key(doc)
+                first_seen, score = fused.get(key, (doc, 0.0))
+                fused[key] = (first_seen, score + 1 / (self.rrf_k + rank + 1))
+
+        top_docs = sorted(fused.values(), key=lambda item: item[1], reverse=True)[:self.k]
+        for doc, score in top_docs:
+            doc.metadata["rrf_score"] = score
+        return [doc for doc, _ in top_docs]
+
+    def _with_similarity(self, docs_with_scores: list[tuple[Document, float]]) -> list[Document]:
+        # The vector store score is kept apart from the Reddit `score` metadata used for reranking
+        for doc, score in docs_with_scores:
+            doc.metadata["similarity"] = self._cosine_similarity(score)
+        return [doc for doc, _ in docs_with_scores]
 
-    def sim_search(self, prompt: str, namespace: str | None):
-        top_matched_docs = self.vector_store.similarity_search(prompt, k=6, namespace=namespace if namespace else "")
-        return self._rerank_docs(top_matched_docs)
+    def _cosine_similarity(self, score: float) -> float:
+        if self.distance_metric == "euclidean":
+            # Pinecone reports the squared distance; OpenAI embeddings are unit length, so |a - b|² = 2 - 2·cos
+            return 1 - score / 2
+        return score
 
     @staticmethod
     def _rerank_docs(docs: list[Document]):
-        return sorted(docs, key=lambda d: d.metadata["score"], reverse=True)
\ No newline at end of file
+        return sorted(docs, key=lambda d: d.metadata["score"], reverse=True)
@@ -2,6 +2,17 @@ from functools import lru_cache
 
 from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from sqlalchemy.engine import make_url
+
+
+def to_async_postgres_uri(uri: str) -> str:
+    """
+    Rewrite a Postgres connection string to use the asyncpg driver. asyncpg takes `ssl` instead of libpq's `sslmode`.
+    """
+    url = make_url(uri).set(drivername="postgresql+asyncpg")
+    if "sslmode" in url.query:
+        url = url.difference_update_query(["sslmode"]).update_query_dict({"ssl": url.query["sslmode"]})
+    return url.render_as_string(hide_password=False)
 
 
 class Settings(BaseSettings, extra="ignore"):
@@ -16,6 +27,10 @@ class Settings(BaseSettings, extra="ignore"):
     JWT_ACCESS_TOKEN_EXPIRATION_SECONDS: int = 60 * 60 * 3  # 3 hours
     JWT_REFRESH_TOKEN_EXPIRATION_SECONDS: int = 60 * 60 * 24 * 1  # 1 day
     JWT_ALGORITHM: str = "HS256"
+    AUTH_CHECK_USER_STATUS: bool = True  # Reject access tokens of deactivated users and of changed passwords
+    AUTH_USER_STATUS_CACHE_TTL_SECONDS: int = 60
+    BCRYPT_ROUNDS: int = 12  # Cost factor of new password hashes; existing hashes keep theirs
+    PASSWORD_HASHING_WORKERS: int = 4  # Threads hashing and verifying passwords
 
     # Postgres
     POSTGRES_CONN_STRING: str
@@ -25,22 +40,105 @@ class Settings(BaseSettings, extra="ignore"):
     POSTGRES_PORT: int = 6543
     POSTGRES_DB: str
     POSTGRES_URI: str | None = None
+    POSTGRES_ASYNC_URI: str | None = None  # Derived from POSTGRES_CONN_STRING with the asyncpg driver
+    POSTGRES_POOL_MODE: str = "queue"  # "queue" or "null" (no client-side pooling, behind pgbouncer/Supabase pooler)
+    POSTGRES_POOL_SIZE: int = 5
+    POSTGRES_MAX_OVERFLOW: int = 10
+    POSTGRES_POOL_TIMEOUT: int = 30  # Seconds to wait for a pooled connection
+    POSTGRES_POOL_RECYCLE: int = 60 * 30  # 30 minutes
+    POSTGRES_POOL_PRE_PING: bool = True
+    POSTGRES_CREATE_INDEXES: bool = True  # Create missing indexes on the chat tables at startup
+
+    # Chat history
+    CHAT_HISTORY_PAGE_SIZE: int = 50
+    CHAT_HISTORY_MAX_PAGE_SIZE: int = 200
+
+    # Chat message persistence
+    MESSAGE_WRITE_BEHIND_ENABLED: bool = False  # Queue chat turns and write them in batches off the response path
+    MESSAGE_WRITE_BEHIND_QUEUE_SIZE: int = 1000
+    MESSAGE_WRITE_BEHIND_BATCH_SIZE: int = 100
+    MESSAGE_WRITE_BEHIND_FLUSH_INTERVAL_SECONDS: float = 1.0
+    MESSAGE_WRITE_BEHIND_RETRIES: int = 2  # Then the turns of a failed batch are written one by one
+    MESSAGE_WRITE_BEHIND_RETRY_BACKOFF_SECONDS: float = 0.5
 
     # Pinecone
     PINECONE_API_KEY: str
     PINECONE_ENVIRONMENT: str
     PINECONE_INDEX_NAME: str = "damg7245-a4"
+    PINECONE_METRIC: str = "euclidean"  # Metric the index was created with by the Reddit processing DAG
+
+    # Vector store
+    VECTOR_STORE_BACKEND: str = "pinecone"  # "pinecone" or "local"
+    LOCAL_VECTOR_INDEX_PATH: str = "resources/vector_index"
+
+    # Retrieval
+    RETRIEVAL_MODE: str = "dense"  # "dense" or "hybrid" (BM25 + vector search fused with RRF)
+    RETRIEVAL_HYBRID_CANDIDATES: int = 12  # Candidates taken from each retriever before fusion
+    RETRIEVAL_RRF_K: int = 60
+    KEYWORD_INDEX_REFRESH_SECONDS: int = 60 * 15  # 15 minutes
 
     # OpenAI
     OPENAI_API_KEY: str
     OPENAI_EMBEDDINGS_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 4096
+    EMBEDDING_CACHE_PATH: str | None = "resources/cached/query_embeddings.pkl"
+
+    # Retrieval grading
+    RETRIEVAL_GRADER_MODE: str = "batched"  # "batched", "concurrent" or "sequential"
+    RETRIEVAL_GRADER_MAX_CONCURRENCY: int = 6
+    LOCAL_RERANKER_ENABLED: bool = False  # Decide clearly (ir)relevant documents locally, grade the rest with the LLM
+    LOCAL_RERANKER_ACCEPT_THRESHOLD: float = 0.7
+    LOCAL_RERANKER_REJECT_THRESHOLD: float = 0.25
+    LOCAL_RERANKER_SIMILARITY_WEIGHT: float = 0.6
+
+    # Conversation memory
+    CONVERSATION_MEMORY_ENABLED: bool = True
+    CONVERSATION_MEMORY_RECENT_TURNS: int = 4  # Older turns are folded into a rolling summary
+    CONVERSATION_MEMORY_MAX_SESSIONS: int = 1024  # Conversations kept in memory, others are reloaded from messages
+
+    # Token usage accounting
+    TOKEN_USAGE_TRACKING_ENABLED: bool = True  # Attach token usage to search responses and store it in token_usage
+
+    # Semantic response cache
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1024
+    SEMANTIC_CACHE_TTL_SECONDS: int = 60 * 60  # 1 hour
 
     # Tavily
     TAVILY_API_KEY: str
+    SPECULATIVE_WEB_SEARCH: bool = False  # Start the web search alongside vector retrieval and grading
 
     # OxyLabs
     OXYLABS_USERNAME: str
     OXYLABS_PASSWORD: str
+    OXYLABS_TIMEOUT_SECONDS: float = 60
+    PRODUCT_LISTING_BATCH_CONCURRENCY: int = 5  # Concurrent lookups per /search/product-listings/batch request
+    PRODUCT_LISTING_CACHE_ENABLED: bool = True
+    PRODUCT_LISTING_CACHE_BACKEND: str = "memory"  # "memory" or "redis"
+    PRODUCT_LISTING_CACHE_TTL_SECONDS: int = 60 * 60 * 6  # 6 hours
+    PRODUCT_LISTING_CACHE_MAX_ENTRIES: int = 2048  # Memory backend only
+    PRODUCT_LISTING_CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Rate limiting of /search/initial
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" (per worker) or "redis" (shared by all workers)
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
+    RATE_LIMIT_IN_FLIGHT_TTL_SECONDS: int = 60 * 10  # Frees slots that were never released (crashed workers)
+    SEARCH_RATE_LIMIT_PER_MINUTE: int = 10
+    SEARCH_RATE_LIMIT_BURST: int = 5
+    SEARCH_MAX_IN_FLIGHT_PER_USER: int = 2
+
+    # Outbound HTTP client
+    HTTP_CLIENT_TIMEOUT_SECONDS: float = 30
+    HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS: float = 5
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 50
+    HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS: float = 30
+    HTTP_CLIENT_HTTP2: bool = True  # Only used when the `h2` package is installed
+    HTTP_CLIENT_RETRIES: int = 2  # Retries on connection errors, and on 429/502/503/504 responses to idempotent calls
+    HTTP_CLIENT_RETRY_BACKOFF_SECONDS: float = 0.5
+    HTTP_CLIENT_MAX_RETRY_AFTER_SECONDS: float = 10  # Longer Retry-After delays are cut to this
 
     # Fast API config
     APP_TITLE: str = "Rekomme - AI Powered Shopping Assistant"
@@ -57,6 +155,8 @@ class Settings(BaseSettings, extra="ignore"):
     @model_validator(mode="after")
     def validator(cls, values: "Settings") -> "Settings":
         values.POSTGRES_URI = values.POSTGRES_CONN_STRING
+        if values.POSTGRES_ASYNC_URI is None:
+            values.POSTGRES_ASYNC_URI = to_async_postgres_uri(values.POSTGRES_CONN_STRING)
         return values
 
 
@@ -1,11 +1,16 @@
 import logging
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator
 
 from sqlalchemy import create_engine
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.orm import scoped_session, sessionmaker, Session
 
 from backend.config import settings
+from backend.database.pool import PoolStats, engine_options, timed_checkout
+from backend.metrics import instrument_engine
 
 logger = logging.getLogger(__name__)
 
@@ -16,13 +21,18 @@ class Base(DeclarativeBase):
 
 
 class DatabaseSession:
+    """
+    Sync sessions, only used by fetch_reddit_posts_by_namespace, which loads the keyword indexes in a thread.
+    """
+
     _instance = None
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             logger.info("Created new database session object")
             cls._instance = super().__new__(cls)
-            cls._instance.db_engine = create_engine(settings.POSTGRES_URI)
+            cls._instance.db_engine = create_engine(settings.POSTGRES_URI, **engine_options(async_engine=False))
+            instrument_engine(cls._instance.db_engine)
             cls._instance.session_maker = scoped_session(
                 sessionmaker(autocommit=False, autoflush=True, bind=cls._instance.db_engine)
             )
@@ -41,4 +51,64 @@ def db_session() -> Session:
     except Exception as e:
         raise ValueError(f"Failed to connect to database: {e}")
     finally:
-        _session.close()
\ No newline at end of file
+        _session.close()
+
+
+class AsyncDatabaseSession:
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            logger.info("Created new async database session object")
+            cls._instance = super().__new__(cls)
+            cls._instance.db_engine = create_async_engine(
+                settings.POSTGRES_ASYNC_URI, **engine_options(async_engine=True)
+            )
+            cls._instance.pool_stats = PoolStats()
+            cls._instance.pool_stats.attach(cls._instance.db_engine.sync_engine)
+            instrument_engine(cls._instance.db_engine.sync_engine)
+            # Objects stay usable after commit; attribute access must never trigger implicit IO in async code
+            cls._instance.session_maker = async_sessionmaker(
+                bind=cls._instance.db_engine, autoflush=True, expire_on_commit=False
+            )
+        return cls._instance
+
+    @classmethod
+    def db_session(cls) -> AsyncSession:
+        return cls().session_maker()
+
+    @classmethod
+    def pool_stats_snapshot(cls) -> dict:
+        return cls().pool_stats.snapshot()
+
+    @classmethod
+    async def dispose(cls):
+        if cls._instance is not None:
+            await cls._instance.db_engine.dispose()
+            cls._instance = None
+
+
+@asynccontextmanager
+async def async_db_session() -> AsyncIterator[AsyncSession]:
+    _session = AsyncDatabaseSession.db_session()
+    try:
+        # Acquire the connection up front so that the pool wait is measured on its own
+        with timed_checkout(AsyncDatabaseSession().pool_stats):
+            await _session.connection()
+        yield _session
+    except (OSError, OperationalError, InterfaceError) as e:
+        await _session.rollback()
+        raise ValueError(f"Failed to connect to database: {e}")
+    except Exception:
+        await _session.rollback()
+        raise
+    finally:
+        await _session.close()
+
+
+async def get_async_db_session() -> AsyncIterator[AsyncSession]:
+    """
+    FastAPI dependency yielding an AsyncSession for the duration of the request.
+    """
+    async with async_db_session() as session:
+        yield session
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, Sequence, DateTime, String, func
+from sqlalchemy import Column, Integer, Sequence, DateTime, String, Index, func, select, update
 
-from backend.database import Base, db_session
+from backend.database import Base, async_db_session
 
 
 class ChatSessionModel(Base):
@@ -13,46 +13,60 @@ class ChatSessionModel(Base):
     created_at =  Column(DateTime, server_default="CURRENT_TIMESTAMP()", nullable=False)
     last_message_time =  Column(DateTime, server_default="CURRENT_TIMESTAMP()", nullable=False)
 
+    __table_args__ = (
+        # Listing a user's sessions by recency
+        Index("ix_chat_session_user_id_last_message_time", "user_id", "last_message_time",
+              postgresql_concurrently=True),
+    )
 
-def create_chat_session(user_id: int) -> ChatSessionModel:
-    with db_session() as session:
+
+async def create_chat_session(user_id: int) -> ChatSessionModel:
+    async with async_db_session() as session:
         _chat_session = ChatSessionModel(user_id=user_id, title='Untitled')
         session.add(_chat_session)
-        session.commit()
+        await session.commit()
 
-        session.refresh(_chat_session)
+        await session.refresh(_chat_session)
         return _chat_session
 
 
-def fetch_chat_session_by_id(chat_session_id: int) -> ChatSessionModel:
-    with db_session() as session:
-        return session.query(ChatSessionModel).filter(ChatSessionModel.id == chat_session_id).first()
-
-def fetch_chat_sessions_by_user_id(user_id: int) -> ChatSessionModel:
-    with db_session() as session:
-        return session.query(ChatSessionModel.id, ChatSessionModel.title).filter(ChatSessionModel.user_id == user_id)
-
-
-def update_last_message_time(chat_session_id: int) -> ChatSessionModel:
-    chat_session = fetch_chat_session_by_id(chat_session_id)
-
-    with db_session() as session:
-        chat_session.last_message_time = func.now()
-
-        session.add(chat_session)
-        session.commit()
-        session.refresh(chat_session)
+async def fetch_chat_session_by_id(chat_session_id: int) -> ChatSessionModel | None:
+    async with async_db_session() as session:
+        return await session.get(ChatSessionModel, chat_session_id)
+
+async def fetch_chat_sessions_by_user_id(user_id: int, limit: int = 100) -> dict[int, str]:
+    """
+    Return the user's most recently active chat sessions as {id: title}, newest first.
+    """
+    async with async_db_session() as session:
+        result = await session.execute(
+            select(ChatSessionModel.id, ChatSessionModel.title)
+            .where(ChatSessionModel.user_id == user_id)
+            .order_by(ChatSessionModel.last_message_time.desc())
+            .limit(limit)
+        )
+        return dict(result.all())
+
+
+async def update_last_message_time(chat_session_id: int) -> ChatSessionModel | None:
+    async with async_db_session() as session:
+        chat_session = await session.scalar(
+            update(ChatSessionModel)
+            .where(ChatSessionModel.id == chat_session_id)
+            .values(last_message_time=func.now())
+            .returning(ChatSessionModel)
+        )
+        await session.commit()
         return chat_session
 
 
-def update_chat_session_title(chat_session_id: int, title: str) -> ChatSessionModel:
-    chat_session = fetch_chat_session_by_id(chat_session_id)
-
-    with db_session() as session:
-        chat_session.title = title
-        chat_session.last_message_time = func.now()
-
-        session.add(chat_session)
-        session.commit()
-        session.refresh(chat_session)
+async def update_chat_session_title(chat_session_id: int, title: str) -> ChatSessionModel | None:
+    async with async_db_session() as session:
+        chat_session = await session.scalar(
+            update(ChatSessionModel)
+            .where(ChatSessionModel.id == chat_session_id)
+            .values(title=title, last_message_time=func.now())
+            .returning(ChatSessionModel)
+        )
+        await session.commit()
         return chat_session
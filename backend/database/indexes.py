@@ -0,0 +1,23 @@
+import logging
+
+from sqlalchemy.schema import CreateIndex
+
+from backend.database import AsyncDatabaseSession
+from backend.database.chat_sessions import ChatSessionModel
+from backend.database.messages import MessagesModel
+
+logger = logging.getLogger(__name__)
+
+
+async def create_indexes():
+    """
+    Create the indexes declared on the chat models if they do not exist yet. They are built CONCURRENTLY so that
+    existing tables are not locked against writes, which requires running outside a transaction.
+    """
+    engine = AsyncDatabaseSession().db_engine
+    async with engine.connect() as connection:
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        for table in (MessagesModel.__table__, ChatSessionModel.__table__):
+            for index in table.indexes:
+                await connection.execute(CreateIndex(index, if_not_exists=True))
+                logger.info(f"Ensured index {index.name} on {table.name}")
@@ -1,8 +1,10 @@
+import json
 from enum import StrEnum
 
-from sqlalchemy import Column, Integer, String, Sequence, Text, DateTime
+from sqlalchemy import Column, Integer, String, Sequence, Text, DateTime, Index, bindparam, func, insert, select, update
 
-from backend.database import Base, db_session
+from backend.database import Base, async_db_session
+from backend.database.chat_sessions import ChatSessionModel
 
 
 class MessagesModel(Base):
@@ -17,25 +19,118 @@ class MessagesModel(Base):
     ref = Column(Text)
     tools_used = Column(Text)
 
+    __table_args__ = (
+        # Keyset pagination over a chat session's history
+        Index("ix_messages_chat_session_id_id", "chat_session_id", "id", postgresql_concurrently=True),
+    )
+
 
 class MessageSenderEnum(StrEnum):
     SYSTEM = "system"
     USER = "user"
 
 
-def create_message(content: str, chat_session_id: int, references: list[str], tools_used: list[str], sender) -> MessagesModel:
-    with db_session() as session:
+def encode_references(references: list[str]) -> str:
+    # References are free-text passages that contain commas, so they are stored as a JSON array
+    return json.dumps(references)
+
+
+def decode_references(value: str | None) -> list[str]:
+    """
+    Parse a stored `ref` value. Older messages stored the references joined with commas, which cannot be split
+    reliably; they are returned as a single reference.
+    """
+    if not value:
+        return []
+    try:
+        references = json.loads(value)
+    except json.JSONDecodeError:
+        return [value]
+    return references if isinstance(references, list) else [value]
+
+
+async def create_message(content: str, chat_session_id: int, references: list[str], tools_used: list[str], sender) -> MessagesModel:
+    async with async_db_session() as session:
         _new_message = MessagesModel(sender=sender.value, chat_session_id=chat_session_id, content=content,
-                                     ref=",".join(references), tools_used=",".join(tools_used))
+                                     ref=encode_references(references), tools_used=",".join(tools_used))
 
         session.add(_new_message)
-        session.commit()
-        session.refresh(_new_message)
+        await session.commit()
+        await session.refresh(_new_message)
         return _new_message
 
 
-def get_messages_by_chat_id(chat_session_id: int) -> list[MessagesModel]:
-    with db_session() as session:
-        return session.query(
-            MessagesModel.sender, MessagesModel.content, MessagesModel.ref, MessagesModel.tools_used
-        ).filter(MessagesModel.chat_session_id == chat_session_id)
+async def record_chat_turn(chat_session_id: int, prompt: str, generation: str, references: list[str],
+                           tools_used: list[str]) -> list[MessagesModel]:
+    """
+    Store the user prompt and the system generation and move the chat session's title and last message time
+    forward, in a single transaction. Both messages are inserted with one statement and returned via RETURNING.
+    """
+    async with async_db_session() as session:
+        messages = await session.scalars(
+            insert(MessagesModel).returning(MessagesModel, sort_by_parameter_order=True),
+            _chat_turn_rows(chat_session_id, prompt, generation, references, tools_used),
+        )
+        messages = list(messages.all())
+        await session.execute(
+            update(ChatSessionModel)
+            .where(ChatSessionModel.id == chat_session_id)
+            .values(title=prompt, last_message_time=func.now())
+        )
+        await session.commit()
+        return messages
+
+
+def _chat_turn_rows(chat_session_id: int, prompt: str, generation: str, references: list[str],
+                    tools_used: list[str]) -> list[dict]:
+    return [
+        {"sender": MessageSenderEnum.USER.value, "chat_session_id": chat_session_id, "content": prompt,
+         "ref": encode_references([]), "tools_used": ",".join(tools_used)},
+        {"sender": MessageSenderEnum.SYSTEM.value, "chat_session_id": chat_session_id, "content": generation,
+         "ref": encode_references(references), "tools_used": ",".join(tools_used)},
+    ]
+
+
+async def record_chat_turns(turns: list[dict]):
+    """
+    Bulk version of record_chat_turn used by the write-behind queue. `turns` holds record_chat_turn keyword arguments.
+    All messages are written with one multi-row INSERT, and every chat session gets the title of its latest turn.
+    """
+    rows = [row for turn in turns for row in _chat_turn_rows(**turn)]
+    titles = {turn["chat_session_id"]: turn["prompt"] for turn in turns}
+
+    async with async_db_session() as session:
+        await session.execute(insert(MessagesModel), rows)
+        await session.execute(
+            update(ChatSessionModel.__table__)
+            .where(ChatSessionModel.__table__.c.id == bindparam("chat_session_id"))
+            .values(title=bindparam("new_title"), last_message_time=func.now()),
+            [{"chat_session_id": chat_session_id, "new_title": title} for chat_session_id, title in titles.items()],
+        )
+        await session.commit()
+
+
+async def fetch_messages_page(chat_session_id: int, before_id: int | None = None,
+                              limit: int = 50) -> tuple[list[MessagesModel], int | None]:
+    """
+    Keyset-paginated chat history, walking backwards from the newest message.
+
+    Args:
+        chat_session_id: Chat session to read
+        before_id: Only return messages older than this message id (the cursor of the previous page)
+        limit: Page size
+
+    Returns:
+        The page in chronological order, and the cursor of the next (older) page or None on the last page
+    """
+    stmt = select(MessagesModel).where(MessagesModel.chat_session_id == chat_session_id)
+    if before_id is not None:
+        stmt = stmt.where(MessagesModel.id < before_id)
+    # One extra row tells whether an older page exists without a COUNT
+    stmt = stmt.order_by(MessagesModel.id.desc()).limit(limit + 1)
+
+    async with async_db_session() as session:
+        messages = list((await session.scalars(stmt)).all())
+
+    next_cursor = messages[limit - 1].id if len(messages) > limit else None
+    return list(reversed(messages[:limit])), next_cursor
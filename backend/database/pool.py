@@ -0,0 +1,123 @@
+import time
+import uuid
+from contextlib import contextmanager
+from threading import Lock
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool
+
+from backend.config import settings
+
+
+def engine_options(async_engine: bool) -> dict:
+    """
+    Build the create_engine / create_async_engine keyword arguments from the pool settings.
+
+    In "null" pool mode connections are not pooled by SQLAlchemy because a transaction pooler (pgbouncer, the
+    Supabase pooler on port 6543) already does it. Such a pooler hands every transaction a possibly different server
+    connection, so asyncpg's prepared statement caches are disabled and statement names are made unique.
+    """
+    if settings.POSTGRES_POOL_MODE == "null":
+        options = {"poolclass": NullPool}
+        if async_engine:
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+            }
+        return options
+
+    return {
+        "pool_size": settings.POSTGRES_POOL_SIZE,
+        "max_overflow": settings.POSTGRES_MAX_OVERFLOW,
+        "pool_timeout": settings.POSTGRES_POOL_TIMEOUT,
+        "pool_recycle": settings.POSTGRES_POOL_RECYCLE,
+        "pool_pre_ping": settings.POSTGRES_POOL_PRE_PING,
+    }
+
+
+class PoolStats:
+    """
+    Connection pool counters collected from SQLAlchemy pool events, plus the time callers waited for a connection
+    (recorded by the session context managers).
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._engine = None
+
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def attach(self, engine: Engine):
+        self._engine = engine
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _increment(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self._increment("connects")
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self._increment("checkouts")
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        self._increment("checkins")
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        self._increment("invalidations")
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def record_timeout(self):
+        self._increment("timeouts")
+
+    def snapshot(self) -> dict:
+        pool = self._engine.pool if self._engine is not None else None
+        with self._lock:
+            stats = {
+                "pool": type(pool).__name__ if pool is not None else None,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "checkout_wait_avg_ms": self.wait_seconds_total / self.waits * 1000 if self.waits else 0.0,
+                "checkout_wait_max_ms": self.wait_seconds_max * 1000,
+            }
+        # NullPool does not keep connections and has none of these
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            if pool is not None and hasattr(pool, name):
+                stats[name] = getattr(pool, name)()
+        return stats
+
+
+@contextmanager
+def timed_checkout(stats: PoolStats):
+    """
+    Record how long acquiring a connection took, and whether the pool timed out.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except PoolTimeoutError:
+        stats.record_timeout()
+        raise
+    stats.record_wait(time.perf_counter() - start)
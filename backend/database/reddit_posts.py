@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+
+from backend.database import Base, db_session
+
+
+class RedditPostModel(Base):
+    # Table is created and populated by the Reddit processing DAG
+    __tablename__ = 'reddit_posts'
+
+
+    id = Column(String, primary_key=True)
+    title = Column(Text)
+    body = Column(Text)
+    author = Column(Text)
+    subreddit = Column(Text)
+    score = Column(Integer)
+    created_at = Column(DateTime)
+    s3_url = Column(Text)
+    vector_id = Column(Text)
+    namespace = Column(Text)
+    comments = Column(JSONB)
+
+
+def fetch_reddit_posts_by_namespace(namespace: str) -> list[RedditPostModel]:
+    with db_session() as session:
+        return session.query(RedditPostModel).filter(RedditPostModel.namespace == namespace).all()
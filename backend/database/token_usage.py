@@ -0,0 +1,96 @@
+from datetime import timedelta
+
+from sqlalchemy import Column, Integer, String, Float, Sequence, DateTime, Index, func, insert, select
+from sqlalchemy.engine import RowMapping
+
+from backend.database import AsyncDatabaseSession, Base, async_db_session
+
+
+class TokenUsageModel(Base):
+    __tablename__ = 'token_usage'
+
+    # One row per request, graph node and model
+    id = Column(Integer, Sequence("token_usage_id_seq"), primary_key=True, autoincrement=True)
+    request_id = Column(String(36), nullable=False)
+    user_id = Column(Integer, nullable=False)
+    chat_session_id = Column(Integer, nullable=False)
+    node = Column(String(50), nullable=False)
+    model = Column(String(100), nullable=False)
+    calls = Column(Integer, nullable=False)
+    prompt_tokens = Column(Integer, nullable=False)
+    completion_tokens = Column(Integer, nullable=False)
+    cost_usd = Column(Float, nullable=False)
+    seconds = Column(Float, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        # Reports over a user's usage in a time window, and over a chat session
+        Index("ix_token_usage_user_id_created_at", "user_id", "created_at"),
+        Index("ix_token_usage_chat_session_id", "chat_session_id"),
+    )
+
+
+async def create_token_usage_table():
+    """
+    Create the token_usage table and its indexes if they do not exist yet.
+    """
+    async with AsyncDatabaseSession().db_engine.begin() as connection:
+        await connection.run_sync(TokenUsageModel.__table__.create, checkfirst=True)
+
+
+async def record_token_usage(request_id: str, user_id: int, chat_session_id: int, usage: list[dict]):
+    """
+    Store the usage of a request. `usage` holds one dict of node, model, calls, token counts, cost_usd and seconds
+    per graph node and model.
+    """
+    rows = [{"request_id": request_id, "user_id": user_id, "chat_session_id": chat_session_id, **record}
+            for record in usage]
+    async with async_db_session() as session:
+        await session.execute(insert(TokenUsageModel), rows)
+        await session.commit()
+
+
+def _usage_totals():
+    return (
+        func.coalesce(func.sum(TokenUsageModel.prompt_tokens), 0).label("prompt_tokens"),
+        func.coalesce(func.sum(TokenUsageModel.completion_tokens), 0).label("completion_tokens"),
+        func.coalesce(func.sum(TokenUsageModel.cost_usd), 0.0).label("cost_usd"),
+    )
+
+
+async def fetch_token_usage_report(user_id: int, days: int,
+                                   chat_session_id: int | None = None) -> dict[str, list[RowMapping]]:
+    """
+    Aggregate the user's usage over the last `days` days, optionally of a single chat session.
+
+    Returns:
+        The rows of the overall totals ("totals", a single row), the totals per graph node and model ("by_node")
+        and the totals per chat session, most expensive first ("by_chat_session")
+    """
+    conditions = [TokenUsageModel.user_id == user_id, TokenUsageModel.created_at >= func.now() - timedelta(days=days)]
+    if chat_session_id is not None:
+        conditions.append(TokenUsageModel.chat_session_id == chat_session_id)
+    requests = func.count(TokenUsageModel.request_id.distinct()).label("requests")
+
+    async with async_db_session() as session:
+        totals = await session.execute(select(requests, *_usage_totals()).where(*conditions))
+        by_node = await session.execute(
+            select(TokenUsageModel.node, TokenUsageModel.model,
+                   func.sum(TokenUsageModel.calls).label("calls"), *_usage_totals(),
+                   func.sum(TokenUsageModel.seconds).label("seconds"))
+            .where(*conditions)
+            .group_by(TokenUsageModel.node, TokenUsageModel.model)
+            .order_by(TokenUsageModel.node, TokenUsageModel.model)
+        )
+        by_chat_session = await session.execute(
+            select(TokenUsageModel.chat_session_id, requests, *_usage_totals())
+            .where(*conditions)
+            .group_by(TokenUsageModel.chat_session_id)
+            .order_by(func.sum(TokenUsageModel.cost_usd).desc())
+            .limit(100)
+        )
+        return {
+            "totals": list(totals.mappings().all()),
+            "by_node": list(by_node.mappings().all()),
+            "by_chat_session": list(by_chat_session.mappings().all()),
+        }
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+from backend.config import settings
+from backend.database.messages import record_chat_turn, record_chat_turns
+
+logger = logging.getLogger(__name__)
+
+
+class ChatTurnWriter:
+    """
+    Write-behind queue for chat turns. Turns are put on a bounded in-process queue and a background worker writes
+    them with `flush` in batches of up to `batch_size`, or whatever has accumulated after `flush_interval_seconds`.
+    A failed batch is retried `retries` times with exponential backoff, then its turns are written one by one with
+    `write_one`, so a bad turn only loses itself. `stop` drains the queue before returning.
+    """
+
+    def __init__(self, max_queue_size: int = 1000, batch_size: int = 100, flush_interval_seconds: float = 1.0,
+                 flush: Callable[[list[dict]], Awaitable] = record_chat_turns,
+                 write_one: Callable[..., Awaitable] = record_chat_turn, retries: int = 2,
+                 retry_backoff_seconds: float = 0.5):
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.flush = flush
+        self.write_one = write_one
+        self.retries = retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._worker = asyncio.create_task(self._run())
+        logger.info("Started the chat turn write-behind worker")
+
+    def submit(self, **turn) -> bool:
+        """
+        Queue a chat turn (record_chat_turn keyword arguments).
+
+        Returns:
+            False when the turn was not queued because the writer is not running in this event loop or the queue
+            is full; the caller should then write the turn itself.
+        """
+        try:
+            if not self.running or asyncio.get_running_loop() is not self._loop:
+                return False
+        except RuntimeError:
+            return False
+        try:
+            self._queue.put_nowait(turn)
+        except asyncio.QueueFull:
+            logger.warning("Chat turn write-behind queue is full, writing the turn directly")
+            return False
+        self.enqueued += 1
+        return True
+
+    async def _next_batch(self) -> list[dict]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval_seconds
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _flush_batch(self, batch: list[dict]):
+        try:
+            if not await self._write_batch(batch):
+                await self._write_one_by_one(batch)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _write_batch(self, batch: list[dict]) -> bool:
+        for attempt in range(self.retries + 1):
+            try:
+                await self.flush(batch)
+            except Exception as e:
+                if attempt == self.retries:
+                    logger.error(f"Failed to write {len(batch)} chat turns, writing them one by one: {e}")
+                    return False
+                delay = self.retry_backoff_seconds * 2 ** attempt
+                logger.warning(f"Failed to write {len(batch)} chat turns, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+            else:
+                self.flushed += len(batch)
+                return True
+
+    async def _write_one_by_one(self, batch: list[dict]):
+        for turn in batch:
+            try:
+                await self.write_one(**turn)
+                self.flushed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Dropped a chat turn of chat session {turn['chat_session_id']}: {e}", exc_info=True)
+
+    async def _run(self):
+        while True:
+            await self._flush_batch(await self._next_batch())
+
+    async def stop(self, timeout: float = 10):
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Gave up draining the chat turn queue, {self._queue.qsize()} turns were not written")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        logger.info(f"Stopped the chat turn write-behind worker ({self.flushed} written, {self.failed} failed)")
+
+
+chat_turn_writer = ChatTurnWriter(
+    max_queue_size=settings.MESSAGE_WRITE_BEHIND_QUEUE_SIZE,
+    batch_size=settings.MESSAGE_WRITE_BEHIND_BATCH_SIZE,
+    flush_interval_seconds=settings.MESSAGE_WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+    retries=settings.MESSAGE_WRITE_BEHIND_RETRIES,
+    retry_backoff_seconds=settings.MESSAGE_WRITE_BEHIND_RETRY_BACKOFF_SECONDS,
+)
+
+
+async def persist_chat_turn(chat_session_id: int, prompt: str, generation: str, references: list[str],
+                            tools_used: list[str]):
+    """
+    Hand the turn to the write-behind queue when it is running, otherwise write it right away.
+    """
+    turn = dict(chat_session_id=chat_session_id, prompt=prompt, generation=generation, references=references,
+                tools_used=tools_used)
+    if not chat_turn_writer.submit(**turn):
+        await record_chat_turn(**turn)
@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from threading import Lock
+from typing import Any, Iterable
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILENAME = "vectors.npy"
+DOCUMENTS_FILENAME = "documents.json"
+CURRENT_FILENAME = "CURRENT"
+DEFAULT_NAMESPACE_DIRECTORY = "__default__"
+SNAPSHOTS_KEPT = 2  # The previous snapshot stays readable for readers that just resolved CURRENT
+LOAD_ATTEMPTS = 3
+
+
+class _NamespaceIndex:
+    def __init__(self, vectors: np.ndarray, ids: list[str], texts: list[str], metadatas: list[dict],
+                 version: str):
+        self.vectors = vectors
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.version = version
+
+
+def _json_default(value: Any):
+    # Metadata built from pandas rows holds numpy scalars
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store used as a drop-in for PineconeVectorStore.
+
+    Every namespace is stored in its own directory under `path` as immutable snapshots: a snapshot directory holds a
+    `vectors.npy` matrix of L2-normalized float32 embeddings and a `documents.json` file with the matching `ids`,
+    `texts` and `metadatas` lists, and the `CURRENT` file names the snapshot to read. Writers create a new snapshot
+    and then swap `CURRENT` with os.replace, so readers never pair the vectors of one write with the documents of
+    another. The matrix is memory-mapped when read, so the index is shared with the page cache instead of being
+    copied into every worker, and a namespace is reloaded whenever `CURRENT` changes (e.g. after the Reddit
+    processing DAG ran). Scores are cosine similarities.
+
+    Like PineconeVectorStore, `namespace` is the namespace used when a call does not name one.
+    """
+
+    def __init__(self, path: str, embedding: Embeddings, namespace: str | None = None):
+        self.path = path
+        self.namespace = namespace
+        self._embedding = embedding
+        self._namespaces: dict[str, _NamespaceIndex] = {}
+        self._lock = Lock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def _namespace_path(self, namespace: str | None) -> str:
+        return os.path.join(self.path, namespace or DEFAULT_NAMESPACE_DIRECTORY)
+
+    @staticmethod
+    def _current_snapshot(namespace_path: str) -> str | None:
+        try:
+            with open(os.path.join(namespace_path, CURRENT_FILENAME)) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _load_namespace(self, namespace: str | None, mmap: bool = True) -> _NamespaceIndex | None:
+        namespace = namespace or self.namespace
+        namespace_path = self._namespace_path(namespace)
+        cached = self._namespaces.get(namespace or "")
+
+        for _ in range(LOAD_ATTEMPTS):
+            if (snapshot := self._current_snapshot(namespace_path)) is None:
+                return None
+            if mmap and cached is not None and cached.version == snapshot:
+                return cached
+
+            snapshot_path = os.path.join(namespace_path, snapshot)
+            try:
+                with open(os.path.join(snapshot_path, DOCUMENTS_FILENAME)) as f:
+                    documents = json.load(f)
+                vectors = np.load(os.path.join(snapshot_path, VECTORS_FILENAME), mmap_mode="r" if mmap else None)
+            except FileNotFoundError:
+                # The snapshot was replaced and removed after CURRENT was read
+                continue
+
+            index = _NamespaceIndex(vectors, documents["ids"], documents["texts"], documents["metadatas"], snapshot)
+            if mmap:
+                self._namespaces[namespace or ""] = index
+                logger.info(f"Loaded {len(index.ids)} vectors for namespace '{namespace}' from {snapshot_path}")
+            return index
+
+        logger.error(f"Could not load the current snapshot of namespace '{namespace}'")
+        return cached if mmap else None
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+    def add_texts(self, texts: Iterable[str], metadatas: list[dict] | None = None, *, ids: list[str] | None = None,
+                  namespace: str | None = None, **kwargs: Any) -> list[str]:
+        namespace = namespace or self.namespace
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = self._normalize(self._embedding.embed_documents(texts))
+
+        with self._lock:
+            existing = self._load_namespace(namespace, mmap=False)
+            if existing is None:
+                all_ids, all_texts, all_metadatas = [], [], []
+                all_vectors = np.empty((0, vectors.shape[1]), dtype=np.float32)
+            else:
+                all_ids, all_texts, all_metadatas = existing.ids, existing.texts, existing.metadatas
+                all_vectors = existing.vectors
+
+            # Upsert: rows with an existing id are replaced in place
+            positions = {_id: position for position, _id in enumerate(all_ids)}
+            new_rows = []
+            for _id, text, metadata, vector in zip(ids, texts, metadatas, vectors):
+                if _id in positions:
+                    all_texts[positions[_id]] = text
+                    all_metadatas[positions[_id]] = metadata
+                    all_vectors[positions[_id]] = vector
+                else:
+                    all_ids.append(_id)
+                    all_texts.append(text)
+                    all_metadatas.append(metadata)
+                    new_rows.append(vector)
+            if new_rows:
+                all_vectors = np.vstack([all_vectors, np.stack(new_rows)])
+
+            self._write_namespace(namespace, all_vectors, all_ids, all_texts, all_metadatas)
+        return ids
+
+    def _write_namespace(self, namespace: str | None, vectors: np.ndarray, ids: list[str], texts: list[str],
+                         metadatas: list[dict]):
+        namespace_path = self._namespace_path(namespace)
+        snapshot = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        snapshot_path = os.path.join(namespace_path, snapshot)
+        os.makedirs(snapshot_path)
+
+        with open(os.path.join(snapshot_path, VECTORS_FILENAME), "wb") as f:
+            np.save(f, vectors.astype(np.float32))
+        with open(os.path.join(snapshot_path, DOCUMENTS_FILENAME), "w") as f:
+            json.dump({"ids": ids, "texts": texts, "metadatas": metadatas}, f, default=_json_default)
+
+        # Publish the snapshot atomically
+        current_tmp_path = os.path.join(namespace_path, f"{CURRENT_FILENAME}.{snapshot}.tmp")
+        with open(current_tmp_path, "w") as f:
+            f.write(snapshot)
+        os.replace(current_tmp_path, os.path.join(namespace_path, CURRENT_FILENAME))
+        self._remove_old_snapshots(namespace_path)
+
+    @staticmethod
+    def _remove_old_snapshots(namespace_path: str):
+        # Readers that still map a removed matrix keep a valid view of it
+        snapshots = sorted(entry.name for entry in os.scandir(namespace_path) if entry.is_dir())
+        for snapshot in snapshots[:-SNAPSHOTS_KEPT]:
+            shutil.rmtree(os.path.join(namespace_path, snapshot), ignore_errors=True)
+
+    def documents(self, namespace: str | None = None) -> list[Document]:
+        """
+        Return every document stored in the namespace.
+        """
+        index = self._load_namespace(namespace)
+        if index is None:
+            return []
+        return [Document(id=_id, page_content=text, metadata=dict(metadata))
+                for _id, text, metadata in zip(index.ids, index.texts, index.metadatas)]
+
+    def similarity_search_by_vector_with_score(self, embedding: list[float], k: int = 4,
+                                               namespace: str | None = None,
+                                               **kwargs: Any) -> list[tuple[Document, float]]:
+        index = self._load_namespace(namespace)
+        if index is None or not index.ids:
+            return []
+
+        scores = index.vectors @ self._normalize(embedding)[0]
+        k = min(k, len(scores))
+        top_k = np.argpartition(-scores, k - 1)[:k]
+        top_k = top_k[np.argsort(-scores[top_k])]
+        return [
+            (Document(id=index.ids[i], page_content=index.texts[i], metadata=dict(index.metadatas[i])), float(scores[i]))
+            for i in top_k
+        ]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, namespace: str | None = None,
+                                     **kwargs: Any) -> list[tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k=k,
+                                                           namespace=namespace)
+
+    def similarity_search_by_vector(self, embedding: list[float], k: int = 4, namespace: str | None = None,
+                                    **kwargs: Any) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, namespace=namespace)]
+
+    def similarity_search(self, query: str, k: int = 4, namespace: str | None = None,
+                          **kwargs: Any) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, namespace=namespace)]
+
+    @classmethod
+    def from_texts(cls, texts: list[str], embedding: Embeddings, metadatas: list[dict] | None = None, *,
+                   path: str, ids: list[str] | None = None, namespace: str | None = None,
+                   **kwargs: Any) -> "LocalVectorStore":
+        vector_store = cls(path=path, embedding=embedding, namespace=namespace)
+        vector_store.add_texts(texts, metadatas, ids=ids, namespace=namespace)
+        return vector_store
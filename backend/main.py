@@ -1,13 +1,26 @@
+import asyncio
 import logging.config
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.agent import semantic_cache
+from backend.agent.usage import preload_encoding
+from backend.agent.vector_store import get_embedding_cache
 from backend.config import settings
-from backend.database import db_session
+from backend.database import AsyncDatabaseSession, get_async_db_session
+from backend.database.indexes import create_indexes
+from backend.database.token_usage import create_token_usage_table
+from backend.database.write_behind import chat_turn_writer
+from backend.metrics import REGISTRY, PrometheusMiddleware, StatsCollector
 from backend.schemas import HealthSchema
+from backend.services.listing_cache import listing_cache
+from backend.services.rate_limit import search_rate_limiter
+from backend.services.http_client import http_client
 from backend.views import central_router
 
 # Load logging configuration from file
@@ -16,12 +29,45 @@ logging.config.fileConfig("backend/logging.conf", disable_existing_loggers=False
 logger = logging.getLogger(__name__)
 logging.getLogger("passlib").setLevel(logging.ERROR)
 
+REGISTRY.register(StatsCollector(
+    "semantic_cache", "Semantic response cache of this worker.", semantic_cache.stats,
+    counters=("hits", "misses", "evictions", "expirations"),
+))
+REGISTRY.register(StatsCollector(
+    "product_listing_cache", "Product listing cache of this worker.",
+    lambda: listing_cache.stats() if listing_cache is not None else None,
+    counters=("hits", "misses", "coalesced"),
+))
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("[FastAPI] Startup lifespan invoked")
     # await init_db()
+    if settings.TOKEN_USAGE_TRACKING_ENABLED:
+        try:
+            await create_token_usage_table()
+        except Exception as e:
+            logger.warning(f"Could not create the token_usage table: {e}")
+        await asyncio.to_thread(preload_encoding, settings.OPENAI_EMBEDDINGS_MODEL)
+    if settings.POSTGRES_CREATE_INDEXES:
+        try:
+            await create_indexes()
+        except Exception as e:
+            logger.warning(f"Could not create database indexes: {e}")
+    if settings.MESSAGE_WRITE_BEHIND_ENABLED:
+        await chat_turn_writer.start()
+    await http_client.start()
     yield
+    await chat_turn_writer.stop()
+    get_embedding_cache().save()
+    if listing_cache is not None:
+        logger.info(f"Product listing cache: {listing_cache.stats()}")
+        await listing_cache.close()
+    await http_client.close()
+    if search_rate_limiter is not None:
+        await search_rate_limiter.close()
+    await AsyncDatabaseSession.dispose()
 
 
 app = FastAPI(title=settings.APP_TITLE, version=settings.APP_VERSION, lifespan=lifespan)
@@ -38,8 +84,24 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(PrometheusMiddleware)
 
 
 @app.get("/", response_model=HealthSchema, tags=["health"])
-async def health_check(db: AsyncSession = Depends(db_session)):
+async def health_check(db: AsyncSession = Depends(get_async_db_session)):
+    try:
+        await db.execute(text("SELECT 1"))
+    except Exception as e:
+        logger.warning(f"Database health check failed: {e}")
+        return {"api": True, "database": False}
     return {"api": True, "database": True}
+
+
+@app.get("/health/database-pool", tags=["health"])
+async def database_pool_stats():
+    return AsyncDatabaseSession.pool_stats_snapshot()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
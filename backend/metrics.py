@@ -0,0 +1,289 @@
+import logging
+import math
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Callable, Iterator
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Seconds; wide enough for LLM calls and whole recommendation requests
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _statement_operation(statement: str | None) -> str:
+    words = (statement or "").split(None, 1)
+    return words[0].lower() if words else "unknown"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                labels = _format_labels(dict(zip(self.label_names, key)))
+                lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Per label values: (count per bucket, sum, count)
+        self._series: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            bucket_counts, total, count = self._series.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for index, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    bucket_counts[index] += 1
+            self._series[key] = (bucket_counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """
+        Observe the duration of the block, with an `outcome` label of "ok" or "error" when the histogram has one.
+        """
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            if "outcome" in self.label_names:
+                labels["outcome"] = outcome
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (bucket_counts, total, count) in sorted(self._series.items()):
+                labels = dict(zip(self.label_names, key))
+                for upper_bound, bucket_count in zip(self.buckets, bucket_counts):
+                    bucket_labels = _format_labels(labels | {"le": _format_value(upper_bound)})
+                    lines.append(f"{self.name}_bucket{bucket_labels} {bucket_count}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class StatsCollector:
+    """
+    Exports the numeric values of a component's `stats()` dict, read when the metrics are scraped, as
+    `<name>_<key>` gauges; the keys in `counters` only ever increase and are exported as `<name>_<key>_total`
+    counters. `stats` may return None when the component is disabled.
+    """
+
+    def __init__(self, name: str, documentation: str, stats: Callable[[], dict | None],
+                 counters: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.stats = stats
+        self.counters = counters
+
+    def collect(self) -> list[str]:
+        try:
+            stats = self.stats() or {}
+        except Exception as e:
+            logger.warning(f"Could not collect the {self.name} stats: {e}")
+            return []
+        lines = []
+        for key, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            metric_type = "counter" if key in self.counters else "gauge"
+            name = f"{self.name}_{key}_total" if metric_type == "counter" else f"{self.name}_{key}"
+            lines += [f"# HELP {name} {self.documentation} ({key})", f"# TYPE {name} {metric_type}",
+                      f"{name} {_format_value(value)}"]
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram | StatsCollector] = {}
+
+    def register(self, metric: Counter | Histogram | StatsCollector) -> Counter | Histogram | StatsCollector:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """
+        The metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        return "\n".join(line for metric in self._metrics.values() for line in metric.collect()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Time until the response body was sent, by route template.",
+    ("method", "route", "status"),
+))
+GRAPH_NODE_DURATION = REGISTRY.register(Histogram(
+    "graph_node_duration_seconds", "Duration of the recommendation graph nodes.", ("node", "outcome"),
+))
+EXTERNAL_CALL_DURATION = REGISTRY.register(Histogram(
+    "external_call_duration_seconds", "Duration of calls to external services.", ("service", "operation", "outcome"),
+))
+
+
+def time_external_call(service: str, operation: str):
+    return EXTERNAL_CALL_DURATION.time(service=service, operation=operation)
+
+
+class PrometheusMiddleware:
+    """
+    ASGI middleware recording the latency of every HTTP request until its last body chunk has been sent, so
+    streaming responses are measured to the end of the stream. Requests are labelled with the route template
+    (e.g. /search/chat-sessions/{chat_session_id}/messages) to keep the number of series bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_and_record(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method=scope["method"], route=route_path,
+                                          status=str(status_code))
+
+
+class GraphMetricsCallback(BaseCallbackHandler):
+    """
+    LangChain callback recording the duration of every LangGraph node and of the LLM and tool calls made inside the
+    graph. Runs inline, as it only reads the clock.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._started: dict[UUID, tuple[Histogram, dict[str, str], float]] = {}
+
+    def _start(self, run_id: UUID, histogram: Histogram, **labels: str):
+        self._started[run_id] = (histogram, labels, time.perf_counter())
+
+    def _end(self, run_id: UUID, outcome: str):
+        if (started := self._started.pop(run_id, None)) is not None:
+            histogram, labels, start = started
+            histogram.observe(time.perf_counter() - start, outcome=outcome, **labels)
+
+    def on_chain_start(self, serialized: dict[str, Any], inputs: Any, *, run_id: UUID,
+                       metadata: dict[str, Any] | None = None, **kwargs: Any):
+        node = (metadata or {}).get("langgraph_node")
+        if node is not None and node != "__start__" and kwargs.get("name") == node:
+            self._start(run_id, GRAPH_NODE_DURATION, node=node)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, "ok")
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, "error")
+
+    def on_chat_model_start(self, serialized: dict[str, Any], messages: Any, *, run_id: UUID,
+                            metadata: dict[str, Any] | None = None, **kwargs: Any):
+        model = (metadata or {}).get("ls_model_name") or "chat_model"
+        self._start(run_id, EXTERNAL_CALL_DURATION, service="openai", operation=model)
+
+    def on_llm_start(self, serialized: dict[str, Any], prompts: list[str], *, run_id: UUID,
+                     metadata: dict[str, Any] | None = None, **kwargs: Any):
+        model = (metadata or {}).get("ls_model_name") or "llm"
+        self._start(run_id, EXTERNAL_CALL_DURATION, service="openai", operation=model)
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, "ok")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, "error")
+
+    def on_tool_start(self, serialized: dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        service = "tavily" if "tavily" in name else name
+        self._start(run_id, EXTERNAL_CALL_DURATION, service=service, operation=name)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, "ok")
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, "error")
+
+
+def instrument_engine(engine: Engine):
+    """
+    Record the duration of every statement executed by the engine (for async engines, pass `sync_engine`).
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start_times"].pop()
+        EXTERNAL_CALL_DURATION.observe(time.perf_counter() - start, service="postgres",
+                                       operation=_statement_operation(statement), outcome="ok")
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start_times"):
+            start = connection.info["query_start_times"].pop()
+            EXTERNAL_CALL_DURATION.observe(time.perf_counter() - start, service="postgres",
+                                           operation=_statement_operation(exception_context.statement),
+                                           outcome="error")
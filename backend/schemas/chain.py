@@ -11,3 +11,8 @@ class SearchResult(BaseModel):
     """Search result containing extracted products"""
     products: list[ExtractedProduct] = Field(..., description="List of extracted products")
     reasoning_summary: str = Field(..., description="A brief summary of how the LLM derived these suggestions")
+
+
+class RetrievalGrades(BaseModel):
+    """Relevance verdicts for a numbered batch of retrieved documents"""
+    scores: list[str] = Field(..., description="One 'yes' or 'no' per document, in the same order as the documents")
@@ -1,4 +1,6 @@
-from pydantic import BaseModel, field_validator
+from datetime import datetime
+
+from pydantic import BaseModel, Field, field_validator
 
 from backend.schemas.chain import SearchResult as LlmSearchResult
 from backend.services.choices import get_supported_product_categories
@@ -9,6 +11,7 @@ class InitialSearchRequest(BaseModel):
     prompt: str
     category: str
     chat_session_id: int | None
+    include_listings: bool = False  # Look up the product listings of the recommendations during the generation
 
     # @field_validator('category')
     # @classmethod
@@ -18,12 +21,6 @@ class InitialSearchRequest(BaseModel):
     #     return v
 
 
-class InitialSearchResponse(BaseModel):
-    chat_session_id: int
-    response: LlmSearchResult
-    tools_used: list[str]
-
-
 class SearchQuery(BaseModel):
     query: str
 
@@ -32,3 +29,70 @@ class Product(BaseModel):
     price: str
     product_url: str
     merchant_name: str
+
+
+class ProductListingsBatchRequest(BaseModel):
+    queries: list[str] = Field(min_length=1, max_length=20)
+
+
+class ProductListingsResult(BaseModel):
+    query: str
+    products: list[Product] = []
+    error: str | None = None
+
+
+class NodeTokenUsage(BaseModel):
+    node: str  # Graph node, or "other" for calls made outside a node
+    model: str  # LLM, embedding model or billed tool
+    calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    cost_usd: float
+    seconds: float  # Time spent waiting on the calls
+
+
+class TokenUsage(BaseModel):
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+    by_node: list[NodeTokenUsage] = []
+
+
+class InitialSearchResponse(BaseModel):
+    chat_session_id: int
+    response: LlmSearchResult
+    tools_used: list[str]
+    product_listings: list[ProductListingsResult] | None = None  # One per product, when include_listings is set
+    token_usage: TokenUsage | None = None  # Usage of this request, when TOKEN_USAGE_TRACKING_ENABLED is set
+
+
+class ChatSessionTokenUsage(BaseModel):
+    chat_session_id: int
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    cost_usd: float
+
+
+class TokenUsageReport(BaseModel):
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    cost_usd: float
+    by_node: list[NodeTokenUsage]
+    by_chat_session: list[ChatSessionTokenUsage]  # Most expensive first
+
+
+class ChatMessage(BaseModel):
+    id: int
+    sender: str
+    content: str
+    references: list[str]
+    tools_used: list[str]
+    timestamp: datetime
+
+
+class ChatHistoryResponse(BaseModel):
+    chat_session_id: int
+    messages: list[ChatMessage]
+    next_cursor: int | None  # Pass as `before` to load the previous page
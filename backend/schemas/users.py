@@ -1,9 +1,7 @@
 from datetime import datetime
 from time import time
 
-from pydantic import BaseModel, EmailStr, Field, model_validator
-
-from backend.utils import get_password_hash
+from pydantic import BaseModel, EmailStr, Field
 
 
 class UserRequest(BaseModel):
@@ -14,14 +12,12 @@ class UserRequest(BaseModel):
 
 
 class UserCreateRequest(UserRequest):
+    """
+    The user row to insert. `password` must already be hashed (see backend.utils.aget_password_hash).
+    """
     active: bool = True
     password_timestamp: datetime = Field(default_factory=lambda: int(time()))
 
-    @model_validator(mode="after")
-    def validator(self) -> "UserCreateRequest":
-        self.password = get_password_hash(self.password)
-        return self
-
 
 class UserResponse(BaseModel):
     username: str
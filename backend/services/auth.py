@@ -1,5 +1,8 @@
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from threading import Lock
+from typing import Callable, Optional
 
 from fastapi import HTTPException, status
 from jose import jwt, JWTError, ExpiredSignatureError
@@ -7,23 +10,89 @@ from jose.exceptions import JWTClaimsError
 from sqlalchemy import select
 
 from backend.config import settings
-from backend.database import db_session
+from backend.database import async_db_session
 from backend.database.users import UserModel
 from backend.schemas.auth import Token
-from backend.utils import verify_password
+from backend.utils import averify_password
+
+
+@dataclass(frozen=True)
+class UserStatus:
+    """
+    The user columns needed to check a token: whether the account is active and the password timestamp that
+    tokens are issued with.
+    """
+    id: int
+    active: bool
+    password_timestamp: int | None
+
+    @classmethod
+    def from_user(cls, user: UserModel) -> "UserStatus":
+        return cls(id=user.id, active=user.active, password_timestamp=user.password_timestamp)
+
+
+class UserStatusCache:
+    """
+    Per-process cache of UserStatus by user id whose entries expire after `ttl_seconds`, so token checks do not
+    load the user on every request. Entries must be invalidated when the user changes; other workers pick up the
+    change once their entry expires.
+    """
+
+    def __init__(self, ttl_seconds: float = 60, max_entries: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: dict[int, tuple[UserStatus, float]] = {}
+        self._lock = Lock()
+
+    def get(self, user_id: int) -> UserStatus | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] <= self._clock():
+                return None
+            return entry[0]
+
+    def set(self, user_status: UserStatus):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = self._clock()
+                self._entries = {user_id: entry for user_id, entry in self._entries.items() if entry[1] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[user_status.id] = (user_status, self._clock() + self.ttl_seconds)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+user_status_cache = UserStatusCache(ttl_seconds=settings.AUTH_USER_STATUS_CACHE_TTL_SECONDS)
+
+
+async def get_user_status(user_id: int) -> UserStatus | None:
+    if (user_status := user_status_cache.get(user_id)) is None:
+        async with async_db_session() as session:
+            user = await session.get(UserModel, user_id)
+        if user is None:
+            return None
+        user_status = UserStatus.from_user(user)
+        user_status_cache.set(user_status)
+    return user_status
 
 
 async def authenticate_user(username: str, password: str) -> Optional[UserModel]:
-    with db_session() as session:
-        user = session.scalar(select(UserModel).filter_by(username=username))
-        if user and verify_password(
-            plain_password=password, hashed_password=user.password
-        ):
-            return await validate_user(user=user)
+    async with async_db_session() as session:
+        user = await session.scalar(select(UserModel).filter_by(username=username))
+    # The connection is returned to the pool before the (slow) password check
+    if user and await averify_password(
+        plain_password=password, hashed_password=user.password
+    ):
+        return await validate_user(user=user)
     return None
 
 
-async def validate_user(user: UserModel) -> UserModel:
+async def validate_user(user: UserModel | UserStatus) -> UserModel | UserStatus:
     if not user.active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -32,7 +101,7 @@ async def validate_user(user: UserModel) -> UserModel:
     return user
 
 
-async def generate_token(user: UserModel) -> Token:
+async def generate_token(user: UserModel | UserStatus) -> Token:
     _access_token = {
         "user_id": user.id,
         "password_timestamp": user.password_timestamp,
@@ -64,18 +133,18 @@ async def decode_token(token: str) -> dict:
 
 async def authenticate_token(
     user_id: int, password_timestamp: float
-) -> UserModel | None:
+) -> UserStatus | None:
     """
     Authenticate a user by id and password timestamp. Check if the token matches the latest generated token (using
-    the timestamp). If it does not match, then the token is invalidated.
+    the timestamp). If it does not match, then the token is invalidated. The user is read through the
+    user_status_cache.
     :param user_id:
     :param password_timestamp:
     :return:
     """
-    with db_session() as session:
-        user = session.get(UserModel, user_id)
-        if user and password_timestamp == user.password_timestamp:
-            return await validate_user(user=user)
+    user_status = await get_user_status(user_id)
+    if user_status and password_timestamp == user_status.password_timestamp:
+        return await validate_user(user=user_status)
     return None
 
 
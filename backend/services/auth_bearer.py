@@ -3,19 +3,25 @@ from typing import Annotated
 from fastapi import Request, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
-from backend.services.auth import decode_token
-
-
-async def verify_jwt(token: str) -> bool:
-    decoded_token = await decode_token(token)
-    return True if decoded_token else False
+from backend.config import settings
+from backend.services.auth import authenticate_token, decode_token
 
 
 class JWTBearer(HTTPBearer):
+    """
+    Verifies the bearer token and returns its claims. The token is decoded once per request and the claims are kept
+    on `request.state.jwt_claims` for anything else that needs them. With AUTH_CHECK_USER_STATUS, tokens of
+    deactivated users and tokens issued before a password change are rejected (checked through the user status
+    cache).
+    """
+
     def __init__(self, auto_error: bool = True):
         super(JWTBearer, self).__init__(auto_error=auto_error)
 
-    async def __call__(self, request: Request):
+    async def __call__(self, request: Request) -> dict:
+        if (claims := getattr(request.state, "jwt_claims", None)) is not None:
+            return claims
+
         credentials: HTTPAuthorizationCredentials = await super(
             JWTBearer, self
         ).__call__(request)
@@ -24,11 +30,19 @@ class JWTBearer(HTTPBearer):
                 raise HTTPException(
                     status_code=403, detail="Invalid authentication scheme"
                 )
-            if not await verify_jwt(credentials.credentials):
+            claims = await decode_token(credentials.credentials)
+            if not claims:
+                raise HTTPException(
+                    status_code=403, detail="Invalid token or expired token"
+                )
+            if settings.AUTH_CHECK_USER_STATUS and not await authenticate_token(
+                user_id=claims["user_id"], password_timestamp=claims.get("password_timestamp")
+            ):
                 raise HTTPException(
                     status_code=403, detail="Invalid token or expired token"
                 )
-            return credentials.credentials
+            request.state.jwt_claims = claims
+            return claims
         else:
             raise HTTPException(status_code=403, detail="Invalid authorization code")
 
@@ -36,6 +50,5 @@ class JWTBearer(HTTPBearer):
 security_scheme = JWTBearer()
 
 
-async def get_current_user_id(token: Annotated[str, Depends(security_scheme)]) -> int:
-    decoded_token = await decode_token(token)
-    return decoded_token["user_id"]
+async def get_current_user_id(claims: Annotated[dict, Depends(security_scheme)]) -> int:
+    return claims["user_id"]
@@ -0,0 +1,104 @@
+import asyncio
+import importlib.util
+import logging
+
+import httpx
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Raised before the request was sent, so retrying cannot repeat it
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class HttpClient:
+    """
+    Process-wide pooled httpx.AsyncClient for outbound API calls, so connections (and their TLS sessions) are kept
+    alive and reused instead of being set up for every call. HTTP/2 is negotiated when enabled and the `h2` package
+    is installed. `start` and `close` are called from the FastAPI lifespan; the client is also created on first use
+    outside of it (scripts, tests).
+    """
+
+    def __init__(self, timeout_seconds: float = 30, connect_timeout_seconds: float = 5, max_connections: int = 50,
+                 max_keepalive_connections: int = 20, keepalive_expiry_seconds: float = 30, http2: bool = True,
+                 retries: int = 2, retry_backoff_seconds: float = 0.5, max_retry_after_seconds: float = 10):
+        self.timeout = httpx.Timeout(timeout_seconds, connect=connect_timeout_seconds)
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections,
+                                   keepalive_expiry=keepalive_expiry_seconds)
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self.retries = retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_retry_after_seconds = max_retry_after_seconds
+
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, http2=self.http2)
+        return self._client
+
+    async def start(self):
+        logger.info(f"Starting the outbound HTTP client (HTTP/2: {self.http2})")
+        self.client  # Created here rather than on the first request
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _backoff(self, attempt: int, response: httpx.Response | None = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), self.max_retry_after_seconds)
+        return self.retry_backoff_seconds * 2 ** attempt
+
+    async def request(self, method: str, url: str, retry_non_idempotent: bool = False, **kwargs) -> httpx.Response:
+        """
+        Send a request, retrying up to `retries` times with exponential backoff when the connection fails or the
+        server answers 429, 502, 503 or 504 (waiting for its Retry-After, up to `max_retry_after_seconds`). The last
+        response is returned (or the last error raised) once the retries are used up; raising for the status is left
+        to the caller.
+
+        Requests with a non-idempotent method (POST, PATCH) may have been processed, and billed, when the response
+        is an error or is lost, so they are only retried when the connection could not be established, unless the
+        caller passes `retry_non_idempotent`.
+        """
+        idempotent = retry_non_idempotent or method.upper() in IDEMPOTENT_METHODS
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if attempt == self.retries or not (idempotent or isinstance(e, CONNECT_ERRORS)):
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"{method} {url} failed ({e!r}), retrying in {delay:.1f}s")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or not idempotent or attempt == self.retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+
+http_client = HttpClient(
+    timeout_seconds=settings.HTTP_CLIENT_TIMEOUT_SECONDS,
+    connect_timeout_seconds=settings.HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS,
+    max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry_seconds=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS,
+    http2=settings.HTTP_CLIENT_HTTP2,
+    retries=settings.HTTP_CLIENT_RETRIES,
+    retry_backoff_seconds=settings.HTTP_CLIENT_RETRY_BACKOFF_SECONDS,
+    max_retry_after_seconds=settings.HTTP_CLIENT_MAX_RETRY_AFTER_SECONDS,
+)
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from functools import partial
+from threading import Lock
+from typing import Any, Awaitable, Callable
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_listing_query(query: str) -> str:
+    """
+    Cache key for a product-listing query: lowercased with whitespace collapsed, so "Sony  WH-1000XM5 " and
+    "sony wh-1000xm5" share an entry.
+    """
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class MemoryListingStore:
+    """
+    In-process LRU store whose entries expire after `ttl_seconds`.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 3600,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    async def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (value, self._clock() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def close(self):
+        pass
+
+
+class RedisListingStore:
+    """
+    Store backed by Redis (or a Redis-compatible server such as Valkey or KeyDB), shared by all backend workers.
+    Expiry is left to the server. Requires the `redis` package.
+    """
+
+    def __init__(self, url: str, ttl_seconds: float = 3600, key_prefix: str = "product-listings:"):
+        try:
+            from redis import asyncio as redis
+        except ImportError as e:
+            raise ImportError("The redis product listing cache requires the `redis` package") from e
+
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Any | None:
+        value = await self._client.get(self.key_prefix + key)
+        return json.loads(value) if value is not None else None
+
+    async def set(self, key: str, value: Any):
+        await self._client.set(self.key_prefix + key, json.dumps(value), ex=int(self.ttl_seconds))
+
+    async def close(self):
+        await self._client.aclose()
+
+
+class ListingCache:
+    """
+    Product-listing results cached by normalized query. Concurrent lookups of the same query that miss the cache
+    share a single call to `fetch` (single-flight), including its error; the call runs in its own task, so it
+    completes for the other lookups when the one that started it is cancelled. Errors and empty results are not
+    cached. Store errors are logged and treated as a miss, so a Redis outage only costs the extra API calls.
+    """
+
+    def __init__(self, store: MemoryListingStore | RedisListingStore):
+        self.store = store
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def _get(self, key: str) -> Any | None:
+        try:
+            return await self.store.get(key)
+        except Exception as e:
+            logger.warning(f"Could not read the product listing cache: {e}")
+            return None
+
+    async def _set(self, key: str, value: Any):
+        try:
+            await self.store.set(key, value)
+        except Exception as e:
+            logger.warning(f"Could not write the product listing cache: {e}")
+
+    async def _fetch_and_store(self, key: str, query: str,
+                               fetch: Callable[[str], Awaitable[list[dict] | None]]) -> list[dict] | None:
+        listings = await fetch(query)
+        if listings:
+            await self._set(key, listings)
+        return listings
+
+    def _on_fetch_done(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Waiters re-raise the error; mark it as retrieved for when there are none
+        if not task.cancelled():
+            task.exception()
+
+    async def get_or_fetch(self, query: str,
+                           fetch: Callable[[str], Awaitable[list[dict] | None]]) -> list[dict] | None:
+        key = normalize_listing_query(query)
+        if (cached := await self._get(key)) is not None:
+            self.hits += 1
+            return cached
+
+        if (task := self._in_flight.get(key)) is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # Detached from the request that started it, so cancelling that request does not cancel the lookup for
+            # the requests waiting on it
+            task = asyncio.create_task(self._fetch_and_store(key, query, fetch))
+            self._in_flight[key] = task
+            task.add_done_callback(partial(self._on_fetch_done, key))
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {"backend": type(self.store).__name__, "hits": self.hits, "misses": self.misses,
+                "coalesced": self.coalesced, "in_flight": len(self._in_flight)}
+
+    async def close(self):
+        await self.store.close()
+
+
+def create_listing_cache() -> ListingCache | None:
+    if not settings.PRODUCT_LISTING_CACHE_ENABLED:
+        return None
+    if settings.PRODUCT_LISTING_CACHE_BACKEND == "redis":
+        store = RedisListingStore(settings.PRODUCT_LISTING_CACHE_REDIS_URL,
+                                  ttl_seconds=settings.PRODUCT_LISTING_CACHE_TTL_SECONDS)
+    else:
+        store = MemoryListingStore(max_entries=settings.PRODUCT_LISTING_CACHE_MAX_ENTRIES,
+                                   ttl_seconds=settings.PRODUCT_LISTING_CACHE_TTL_SECONDS)
+    return ListingCache(store)
+
+
+listing_cache = create_listing_cache()
@@ -0,0 +1,274 @@
+import logging
+import math
+import time
+from threading import Lock
+from typing import AsyncIterator, Awaitable, Callable
+
+from fastapi import Depends, HTTPException, status
+
+from backend.config import settings
+from backend.services.auth_bearer import get_current_user_id
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryRateLimitStore:
+    """
+    Token buckets and in-flight slots of this process. With several backend workers every worker enforces the
+    limits on its own; use RedisRateLimitStore to share them. Slots expire `in_flight_ttl_seconds` after they were
+    acquired, so a slot whose release never ran (e.g. a cancelled response) is not held forever.
+    """
+
+    def __init__(self, max_keys: int = 10000, in_flight_ttl_seconds: float = 600,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.in_flight_ttl_seconds = in_flight_ttl_seconds
+        self._clock = clock
+        self._buckets: dict[str, tuple[float, float]] = {}  # key -> (tokens, updated at)
+        self._in_flight: dict[str, list[float]] = {}  # key -> acquisition times of the held slots, oldest first
+        self._lock = Lock()
+
+    def _prune_full_buckets(self, capacity: int, refill_per_second: float, now: float):
+        # A bucket that has refilled completely is the same as no bucket
+        refill_seconds = capacity / refill_per_second
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < refill_seconds}
+
+    async def take_token(self, key: str, capacity: int, refill_per_second: float) -> float:
+        """
+        Take a token from the bucket.
+
+        Returns:
+            0 if a token was taken, otherwise the seconds until the next token is available.
+        """
+        with self._lock:
+            now = self._clock()
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                retry_after = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                retry_after = (1 - tokens) / refill_per_second
+            if len(self._buckets) > self.max_keys:
+                self._prune_full_buckets(capacity, refill_per_second, now)
+            return retry_after
+
+    async def acquire_slot(self, key: str, limit: int) -> bool:
+        with self._lock:
+            now = self._clock()
+            slots = [acquired_at for acquired_at in self._in_flight.get(key, [])
+                     if now - acquired_at < self.in_flight_ttl_seconds]
+            if len(slots) >= limit:
+                self._in_flight[key] = slots
+                return False
+            self._in_flight[key] = slots + [now]
+            return True
+
+    async def release_slot(self, key: str):
+        with self._lock:
+            if len(slots := self._in_flight.get(key, [])) <= 1:
+                self._in_flight.pop(key, None)
+            else:
+                slots.pop(0)
+
+    async def close(self):
+        pass
+
+
+# Refill and take a token atomically. Returns the seconds to wait for the next token (0 when one was taken).
+_TAKE_TOKEN_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_per_second = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * refill_per_second)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / refill_per_second
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill_per_second) + 1)
+return tostring(retry_after)
+"""
+
+# Take an in-flight slot if fewer than ARGV[1] are held. The TTL is only set by the first slot, so that a slot leaked
+# by a crashed worker still expires while other requests keep taking and releasing slots.
+_ACQUIRE_SLOT_SCRIPT = """
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+end
+if count > tonumber(ARGV[1]) then
+    redis.call('DECR', KEYS[1])
+    return 0
+end
+return 1
+"""
+
+# Release an in-flight slot, unless the counter expired meanwhile (it must never go negative)
+_RELEASE_SLOT_SCRIPT = """
+if (tonumber(redis.call('GET', KEYS[1])) or 0) > 0 then
+    redis.call('DECR', KEYS[1])
+end
+"""
+
+
+class RedisRateLimitStore:
+    """
+    Token buckets and in-flight counters in Redis (or a Redis-compatible server), shared by all backend workers.
+    In-flight counters expire after `in_flight_ttl_seconds` so that slots held by a crashed worker are freed.
+    Requires the `redis` package.
+    """
+
+    def __init__(self, url: str, in_flight_ttl_seconds: int = 600, key_prefix: str = "rate-limit:"):
+        try:
+            from redis import asyncio as redis
+        except ImportError as e:
+            raise ImportError("The redis rate limit store requires the `redis` package") from e
+
+        self.in_flight_ttl_seconds = in_flight_ttl_seconds
+        self.key_prefix = key_prefix
+        self._client = redis.from_url(url)
+        self._take_token = self._client.register_script(_TAKE_TOKEN_SCRIPT)
+        self._acquire_slot = self._client.register_script(_ACQUIRE_SLOT_SCRIPT)
+        self._release_slot = self._client.register_script(_RELEASE_SLOT_SCRIPT)
+
+    async def take_token(self, key: str, capacity: int, refill_per_second: float) -> float:
+        retry_after = await self._take_token(keys=[f"{self.key_prefix}bucket:{key}"],
+                                             args=[capacity, refill_per_second, time.time()])
+        return float(retry_after)
+
+    async def acquire_slot(self, key: str, limit: int) -> bool:
+        acquired = await self._acquire_slot(keys=[f"{self.key_prefix}in-flight:{key}"],
+                                            args=[limit, self.in_flight_ttl_seconds])
+        return bool(int(acquired))
+
+    async def release_slot(self, key: str):
+        await self._release_slot(keys=[f"{self.key_prefix}in-flight:{key}"])
+
+    async def close(self):
+        await self._client.aclose()
+
+
+class RateLimitLease:
+    """
+    An in-flight slot held by a request. The rate limit dependency releases it when the endpoint returns, unless the
+    endpoint hands it to a streaming response with `hold_until_done`.
+    """
+
+    def __init__(self, release: Callable[[], Awaitable] | None = None):
+        self._release = release
+        self.held = False
+
+    async def release(self):
+        if self._release is not None:
+            release, self._release = self._release, None
+            await release()
+
+    def hold_until_done(self, stream: AsyncIterator[str]) -> AsyncIterator[str]:
+        """
+        Keep the slot until the stream has been sent (or the client went away). The slot is released when the
+        stream ends; a response cancelled before the stream started never runs that, so also pass `release` as
+        the response's background task (releasing is idempotent).
+        """
+        self.held = True
+
+        async def stream_and_release():
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await self.release()
+
+        return stream_and_release()
+
+
+def _too_many_requests(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class RateLimiter:
+    """
+    Per-user token bucket (`requests_per_minute`, with bursts of up to `burst` requests) combined with a cap of
+    `max_in_flight` concurrent requests per user. Requests over either limit are answered with 429 and a
+    Retry-After header. If the store fails, requests are let through.
+    """
+
+    def __init__(self, store: MemoryRateLimitStore | RedisRateLimitStore, name: str, requests_per_minute: int,
+                 burst: int, max_in_flight: int, busy_retry_after_seconds: float = 5):
+        self.store = store
+        self.name = name
+        self.refill_per_second = requests_per_minute / 60
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.busy_retry_after_seconds = busy_retry_after_seconds
+
+        self.rejected = 0
+
+    async def acquire(self, user_id: int) -> RateLimitLease:
+        key = f"{self.name}:{user_id}"
+        try:
+            if not await self.store.acquire_slot(key, self.max_in_flight):
+                self.rejected += 1
+                raise _too_many_requests(f"Only {self.max_in_flight} requests can run at once, wait for one to finish",
+                                         self.busy_retry_after_seconds)
+            if (retry_after := await self.store.take_token(key, self.burst, self.refill_per_second)) > 0:
+                await self.store.release_slot(key)
+                self.rejected += 1
+                raise _too_many_requests("Too many requests, slow down", retry_after)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.warning(f"Rate limit store failed, letting the request through: {e}")
+            return RateLimitLease()
+        return RateLimitLease(release=lambda: self._release_slot(key))
+
+    async def _release_slot(self, key: str):
+        try:
+            await self.store.release_slot(key)
+        except Exception as e:
+            logger.warning(f"Could not release the in-flight slot {key}: {e}")
+
+    async def close(self):
+        await self.store.close()
+
+
+def create_search_rate_limiter() -> RateLimiter | None:
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        store = RedisRateLimitStore(settings.RATE_LIMIT_REDIS_URL,
+                                    in_flight_ttl_seconds=settings.RATE_LIMIT_IN_FLIGHT_TTL_SECONDS)
+    else:
+        store = MemoryRateLimitStore(in_flight_ttl_seconds=settings.RATE_LIMIT_IN_FLIGHT_TTL_SECONDS)
+    return RateLimiter(
+        store,
+        name="search",
+        requests_per_minute=settings.SEARCH_RATE_LIMIT_PER_MINUTE,
+        burst=settings.SEARCH_RATE_LIMIT_BURST,
+        max_in_flight=settings.SEARCH_MAX_IN_FLIGHT_PER_USER,
+    )
+
+
+search_rate_limiter = create_search_rate_limiter()
+
+
+async def limit_search_requests(user_id: int = Depends(get_current_user_id)) -> AsyncIterator[RateLimitLease]:
+    """
+    FastAPI dependency applying search_rate_limiter to the current user.
+    """
+    lease = await search_rate_limiter.acquire(user_id) if search_rate_limiter is not None else RateLimitLease()
+    try:
+        yield lease
+    finally:
+        if not lease.held:
+            await lease.release()
@@ -1,13 +1,34 @@
+import asyncio
+import json
+import logging
+import uuid
 from functools import lru_cache
-from typing import List, Dict
+from typing import Any, List, Dict, AsyncIterator
 
-import requests
+from langchain_core.callbacks import AsyncCallbackHandler, BaseCallbackHandler
+from langchain_core.runnables import RunnableLambda
 
-from backend.agent import agent_workflow
+from backend.agent import agent_workflow, conversation_memory, semantic_cache
+from backend.agent.graph import StreamEvents, Steps
+from backend.agent.usage import TokenUsageTracker, usage_config
+from backend.agent.vector_store import get_embeddings
 from backend.config import settings
-from backend.database.chat_sessions import create_chat_session, update_chat_session_title, \
+from backend.database.chat_sessions import create_chat_session, fetch_chat_session_by_id, \
     fetch_chat_sessions_by_user_id
-from backend.schemas.search import InitialSearchResponse
+from backend.database.messages import decode_references, fetch_messages_page
+from backend.database.token_usage import fetch_token_usage_report, record_token_usage
+from backend.database.write_behind import persist_chat_turn
+from backend.metrics import GraphMetricsCallback, time_external_call
+from backend.schemas.chain import ExtractedProduct
+from backend.services.http_client import http_client
+from backend.services.listing_cache import listing_cache
+from backend.schemas.search import ChatHistoryResponse, ChatMessage, InitialSearchResponse, ProductListingsResult, \
+    NodeTokenUsage, TokenUsage, TokenUsageReport, ChatSessionTokenUsage
+
+logger = logging.getLogger(__name__)
+
+# Referenced until done, the event loop only keeps weak references to tasks
+_background_tasks: set[asyncio.Task] = set()
 
 
 @lru_cache(maxsize=128)
@@ -15,28 +36,250 @@ def manage_chat_sessions(chat_session_id):
     ...
 
 
-async def process_initial_search_query(
-    model: str, prompt: str, category: str, chat_session_id: int | None, user_id: int
-) -> InitialSearchResponse:
+class ChatSessionNotFoundError(Exception):
+    def __init__(self, chat_session_id: int):
+        super().__init__(f"Chat session {chat_session_id} not found")
+        self.chat_session_id = chat_session_id
+
+
+async def resolve_chat_session(chat_session_id: int | None, user_id: int) -> int:
+    """
+    Create a chat session for the user when `chat_session_id` is None, otherwise check that the session belongs to
+    the user.
+
+    Raises:
+        ChatSessionNotFoundError: The session does not exist or belongs to another user
+    """
     if chat_session_id is None:
-        chat_session_id = create_chat_session(user_id,).id
+        return (await create_chat_session(user_id)).id
+    chat_session = await fetch_chat_session_by_id(chat_session_id)
+    if chat_session is None or chat_session.user_id != user_id:
+        raise ChatSessionNotFoundError(chat_session_id)
+    return chat_session_id
 
-    response = agent_workflow.invoke({"prompt": prompt, "category": category, "chat_session_id": chat_session_id})
 
-    print(response["steps"])
+async def _standalone_query(chat_session_id: int | None, prompt: str,
+                            usage_tracker: TokenUsageTracker | None = None) -> str:
+    """
+    Condense the prompt and the conversation so far into the query used for retrieval, grading, generation and the
+    semantic cache. The condense LLM call is reported to `usage_tracker` as the step "condense_query"; folding old
+    turns into the conversation summary runs in the background and is not attributed to the request.
+    """
+    if conversation_memory is None:
+        return prompt
+    try:
+        conversation = await conversation_memory.load(chat_session_id)
+    except Exception as e:
+        logger.warning(f"Could not load the conversation for chat session {chat_session_id}: {e}")
+        return prompt
+    return await conversation_memory.condense(conversation, prompt,
+                                              config=usage_config(usage_tracker, "condense_query"))
 
+
+def _tools_used(response: dict) -> list[str]:
     tools_used = ["vector_search"]
     if response.get("perform_web_search", False):
         tools_used.append("web_search")
-    update_chat_session_title(chat_session_id, response["prompt"])
+    return tools_used
+
+
+def _graph_config(*callbacks: BaseCallbackHandler | None) -> dict:
+    # Passed per run: callbacks bound with `with_config` are not used by astream_events
+    return {"callbacks": [GraphMetricsCallback(), *(callback for callback in callbacks if callback is not None)]}
+
+
+def _create_usage_tracker() -> TokenUsageTracker | None:
+    return TokenUsageTracker() if settings.TOKEN_USAGE_TRACKING_ENABLED else None
+
+
+def _token_usage(tracker: TokenUsageTracker | None) -> TokenUsage | None:
+    if tracker is None:
+        return None
+    by_node = [NodeTokenUsage(**vars(record)) for record in tracker.records()]
+    return TokenUsage(
+        prompt_tokens=sum(usage.prompt_tokens for usage in by_node),
+        completion_tokens=sum(usage.completion_tokens for usage in by_node),
+        cost_usd=sum(usage.cost_usd for usage in by_node),
+        by_node=by_node,
+    )
+
+
+def _store_token_usage(search_response: InitialSearchResponse, user_id: int):
+    """
+    Store the token usage of the response in the background, off the request path. The write is started before the
+    response is returned, so it is not lost when a streaming client disconnects after the result.
+    """
+    # No calls were made, e.g. the response was served from the semantic cache for a cached embedding
+    if search_response.token_usage is None or not search_response.token_usage.by_node:
+        return
+    task = asyncio.create_task(_record_token_usage(search_response, user_id))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _record_token_usage(search_response: InitialSearchResponse, user_id: int):
+    try:
+        await record_token_usage(
+            request_id=str(uuid.uuid4()), user_id=user_id, chat_session_id=search_response.chat_session_id,
+            usage=[usage.model_dump() for usage in search_response.token_usage.by_node],
+        )
+    except Exception as e:
+        logger.warning(f"Could not store the token usage of chat session {search_response.chat_session_id}: {e}")
+
+
+def _build_search_response(chat_session_id: int, response: dict) -> InitialSearchResponse:
+    # The chat session title and last message time are updated together with the messages (see persist_chat_turn)
+    logger.debug(f"Graph steps: {response['steps']}")
 
     return InitialSearchResponse(
         chat_session_id=chat_session_id,
         response=response["generation"],
-        tools_used=tools_used
+        tools_used=_tools_used(response)
+    )
+
+
+async def _embed_for_semantic_cache(prompt: str,
+                                    usage_tracker: TokenUsageTracker | None = None) -> list[float] | None:
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return None
+    # Run as a runnable, so that CachedEmbeddings reports a cache miss to the usage tracker
+    embed_query = RunnableLambda(get_embeddings().aembed_query, name="semantic_cache_embedding")
+    return await embed_query.ainvoke(prompt, config=usage_config(usage_tracker, "semantic_cache"))
+
+
+async def _load_cached_response(prompt: str, category: str, chat_session_id: int,
+                                embedding: list[float] | None) -> dict | None:
+    """
+    Build the graph response from the semantic cache and record the turn in the chat session, or return None on a
+    cache miss.
+    """
+    if embedding is None or (cached := semantic_cache.lookup(category, embedding)) is None:
+        return None
+
+    response = {"prompt": prompt, "steps": [Steps.SEMANTIC_CACHE_HIT.value], **cached}
+    await persist_chat_turn(
+        chat_session_id=chat_session_id, prompt=prompt,
+        generation=json.dumps(response["generation"].model_dump(mode="json")), references=response["resources"],
+        tools_used=_tools_used(response),
     )
+    return response
+
+
+def _store_cached_response(category: str, embedding: list[float] | None, response: dict):
+    if embedding is None:
+        return
+    semantic_cache.store(category, embedding, {
+        "generation": response["generation"],
+        "perform_web_search": response.get("perform_web_search", False),
+        "resources": [r.page_content if hasattr(r, "page_content") else r for r in response.get("resources", [])],
+    })
+
+
+async def process_initial_search_query(
+    model: str, prompt: str, category: str, chat_session_id: int | None, user_id: int, include_listings: bool = False
+) -> InitialSearchResponse:
+    """
+    With `include_listings`, the product listings of every recommended product are looked up while the rest of the
+    recommendation is still being generated, and returned in `product_listings`.
+
+    Raises:
+        ChatSessionNotFoundError: `chat_session_id` does not belong to the user
+    """
+    new_chat_session = chat_session_id is None
+    chat_session_id = await resolve_chat_session(chat_session_id, user_id)
+    prefetcher = ListingPrefetcher() if include_listings else None
+    usage_tracker = _create_usage_tracker()
+    query = prompt if new_chat_session else await _standalone_query(chat_session_id, prompt, usage_tracker)
+
+    try:
+        embedding = await _embed_for_semantic_cache(query, usage_tracker)
+        if (response := await _load_cached_response(prompt, category, chat_session_id, embedding)) is None:
+            response = await agent_workflow.ainvoke(
+                {"prompt": prompt, "query": query, "category": category, "chat_session_id": chat_session_id},
+                config=_graph_config(prefetcher, usage_tracker),
+            )
+            _store_cached_response(category, embedding, response)
 
-def fetch_google_shopping_results(search_term: str) -> Dict:
+        search_response = _build_search_response(chat_session_id, response)
+        search_response.token_usage = _token_usage(usage_tracker)
+        _store_token_usage(search_response, user_id)
+        if prefetcher is not None:
+            search_response.product_listings = await prefetcher.results(search_response.response.products)
+        return search_response
+    finally:
+        if prefetcher is not None:
+            prefetcher.cancel()
+
+
+def _server_sent_event(event: StreamEvents, data: dict) -> str:
+    return f"event: {event.value}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_initial_search_query(
+    model: str, prompt: str, category: str, chat_session_id: int | None, user_id: int, include_listings: bool = False
+) -> AsyncIterator[str]:
+    """
+    Run the recommendation graph and stream its progress as Server-Sent Events: a `step` event for every graph
+    step as it completes, a `product` event for every recommended product as soon as it has been generated, and a
+    final `result` event holding the complete InitialSearchResponse (or an `error` event).
+
+    With `include_listings`, the listing lookup of a product starts when its `product` event is sent, and a
+    `listings` event is sent for every product once its listings are in, before the `result` event.
+    """
+    prefetcher = ListingPrefetcher() if include_listings else None
+    usage_tracker = _create_usage_tracker()
+    try:
+        new_chat_session = chat_session_id is None
+        chat_session_id = await resolve_chat_session(chat_session_id, user_id)
+        query = prompt if new_chat_session else await _standalone_query(chat_session_id, prompt, usage_tracker)
+
+        embedding = await _embed_for_semantic_cache(query, usage_tracker)
+        if (response := await _load_cached_response(prompt, category, chat_session_id, embedding)) is not None:
+            yield _server_sent_event(StreamEvents.STEP, {"step": Steps.SEMANTIC_CACHE_HIT.value, "node": None})
+            for product in response["generation"].products:
+                if prefetcher is not None:
+                    prefetcher.start(product.product_name)
+                yield _server_sent_event(StreamEvents.PRODUCT, product.model_dump())
+        else:
+            completed_steps = 0
+            async for event in agent_workflow.astream_events(
+                {"prompt": prompt, "query": query, "category": category, "chat_session_id": chat_session_id},
+                config=_graph_config(usage_tracker), version="v2",
+            ):
+                match event["event"]:
+                    case "on_custom_event" if event["name"] == StreamEvents.PRODUCT.value:
+                        if prefetcher is not None:
+                            prefetcher.start(event["data"]["product_name"])
+                        yield _server_sent_event(StreamEvents.PRODUCT, event["data"])
+                    case "on_chain_end" if event["metadata"].get("langgraph_node") == event["name"]:
+                        # A graph node finished
+                        steps = event["data"]["output"].get("steps", [])
+                        for step in steps[completed_steps:]:
+                            yield _server_sent_event(StreamEvents.STEP, {"step": step, "node": event["name"]})
+                        completed_steps = len(steps)
+                    case "on_chain_end" if not event["parent_ids"]:
+                        # The graph itself finished
+                        response = event["data"]["output"]
+            _store_cached_response(category, embedding, response)
+
+        search_response = _build_search_response(chat_session_id, response)
+        search_response.token_usage = _token_usage(usage_tracker)
+        _store_token_usage(search_response, user_id)
+        if prefetcher is not None:
+            async for listings in prefetcher.as_completed(search_response.response.products):
+                yield _server_sent_event(StreamEvents.LISTINGS, listings.model_dump(mode="json"))
+            search_response.product_listings = await prefetcher.results(search_response.response.products)
+        yield _server_sent_event(StreamEvents.RESULT, search_response.model_dump(mode="json"))
+    except Exception as e:
+        logger.error(f"Streaming search failed: {e}", exc_info=True)
+        yield _server_sent_event(StreamEvents.ERROR, {"detail": str(e)})
+    finally:
+        if prefetcher is not None:
+            prefetcher.cancel()
+
+OXYLABS_QUERIES_URL = 'https://realtime.oxylabs.io/v1/queries'
+
+async def fetch_google_shopping_results(search_term: str) -> Dict:
     payload = {
         'source': 'google_shopping_search',
         'domain': 'com',
@@ -44,22 +287,20 @@ def fetch_google_shopping_results(search_term: str) -> Dict:
         'pages': 1,
         'parse': True,
     }
-    try:
-        response = requests.post(
-            'https://realtime.oxylabs.io/v1/queries',
+    with time_external_call("oxylabs", "google_shopping_search"):
+        response = await http_client.post(
+            OXYLABS_QUERIES_URL,
             auth=(settings.OXYLABS_USERNAME, settings.OXYLABS_PASSWORD),
             json=payload,
+            timeout=settings.OXYLABS_TIMEOUT_SECONDS,
         )
         response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"Error invoking API: {e}")
-        return {}
+    return response.json()
 
 def extract_product_details(api_response: Dict) -> List[Dict]:
     products = []
     if not api_response or 'results' not in api_response:
-        print("Invalid API response.")
+        logger.warning("Invalid Oxylabs API response")
         return products
 
     for result in api_response['results']:
@@ -85,5 +326,118 @@ def extract_product_details(api_response: Dict) -> List[Dict]:
     return products
 
 
+async def _fetch_product_listings(search_term: str) -> List[Dict]:
+    return extract_product_details(await fetch_google_shopping_results(search_term))
+
+
+async def search_product_listings(search_term: str) -> List[Dict]:
+    """
+    Look up the Google Shopping listings for a product through the listing cache.
+
+    Raises:
+        httpx.HTTPError: The Oxylabs call failed.
+    """
+    if listing_cache is None:
+        return await _fetch_product_listings(search_term)
+    return await listing_cache.get_or_fetch(search_term, _fetch_product_listings)
+
+
+async def search_product_listings_batch(search_terms: List[str]) -> List[ProductListingsResult]:
+    """
+    Look up the listings of several products concurrently, at most PRODUCT_LISTING_BATCH_CONCURRENCY at a time.
+    Results are in the order of `search_terms`; a failed lookup is reported in its own result.
+    """
+    semaphore = asyncio.Semaphore(settings.PRODUCT_LISTING_BATCH_CONCURRENCY)
+    return list(await asyncio.gather(*(_lookup_product_listings(search_term, semaphore)
+                                       for search_term in search_terms)))
+
+
+async def _lookup_product_listings(search_term: str, semaphore: asyncio.Semaphore) -> ProductListingsResult:
+    async with semaphore:
+        try:
+            return ProductListingsResult(query=search_term, products=await search_product_listings(search_term))
+        except Exception as e:
+            logger.warning(f"Product listing lookup for '{search_term}' failed: {e}")
+            return ProductListingsResult(query=search_term, error="Error fetching data from API")
+
+
+class ListingPrefetcher(AsyncCallbackHandler):
+    """
+    Starts the listing lookup of every recommended product as soon as the generate node dispatches it as a
+    StreamEvents.PRODUCT event, so the lookups overlap with the rest of the generation.
+    """
+
+    def __init__(self):
+        self.tasks: dict[str, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(settings.PRODUCT_LISTING_BATCH_CONCURRENCY)
+
+    def start(self, product_name: str) -> asyncio.Task:
+        if product_name not in self.tasks:
+            self.tasks[product_name] = asyncio.create_task(_lookup_product_listings(product_name, self._semaphore))
+        return self.tasks[product_name]
+
+    async def on_custom_event(self, name: str, data: Any, **kwargs):
+        if name == StreamEvents.PRODUCT.value:
+            self.start(data["product_name"])
+
+    async def as_completed(self, products: list[ExtractedProduct]) -> AsyncIterator[ProductListingsResult]:
+        """
+        Yield the listings of the products as their lookups finish. Lookups that were not started yet (products
+        served from the semantic cache) are started now.
+        """
+        for future in asyncio.as_completed([self.start(product.product_name) for product in products]):
+            yield await future
+
+    async def results(self, products: list[ExtractedProduct]) -> list[ProductListingsResult]:
+        return list(await asyncio.gather(*(self.start(product.product_name) for product in products)))
+
+    def cancel(self):
+        for task in self.tasks.values():
+            task.cancel()
+
+
 async def get_chat_sessions_for_user(user_id: int):
-    return fetch_chat_sessions_by_user_id(user_id)
\ No newline at end of file
+    return await fetch_chat_sessions_by_user_id(user_id)
+
+
+def _split_list(value: str | None) -> list[str]:
+    return value.split(",") if value else []
+
+
+async def get_chat_history_for_user(user_id: int, chat_session_id: int, before: int | None,
+                                    limit: int) -> ChatHistoryResponse | None:
+    """
+    Load one page of a chat session's history, or None if the session does not exist or belongs to another user.
+    """
+    chat_session = await fetch_chat_session_by_id(chat_session_id)
+    if chat_session is None or chat_session.user_id != user_id:
+        return None
+
+    messages, next_cursor = await fetch_messages_page(chat_session_id, before_id=before, limit=limit)
+    return ChatHistoryResponse(
+        chat_session_id=chat_session_id,
+        messages=[
+            ChatMessage(id=message.id, sender=message.sender, content=message.content,
+                        references=decode_references(message.ref), tools_used=_split_list(message.tools_used),
+                        timestamp=message.timestamp)
+            for message in messages
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+async def get_token_usage_report(user_id: int, days: int, chat_session_id: int | None = None) -> TokenUsageReport:
+    """
+    The user's token usage and cost over the last `days` days, in total, per graph node and model, and per chat
+    session.
+    """
+    report = await fetch_token_usage_report(user_id, days=days, chat_session_id=chat_session_id)
+    totals = report["totals"][0]
+    return TokenUsageReport(
+        requests=totals["requests"],
+        prompt_tokens=totals["prompt_tokens"],
+        completion_tokens=totals["completion_tokens"],
+        cost_usd=totals["cost_usd"],
+        by_node=[NodeTokenUsage(**row) for row in report["by_node"]],
+        by_chat_session=[ChatSessionTokenUsage(**row) for row in report["by_chat_session"]],
+    )
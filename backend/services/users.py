@@ -4,9 +4,11 @@ from typing import Optional
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 
-from backend.database.db import db_session
+from backend.database import async_db_session
 from backend.database.users import UserModel
 from backend.schemas.users import UserRequest, UserCreateRequest
+from backend.services.auth import user_status_cache
+from backend.utils import aget_password_hash
 
 logger = logging.getLogger(__name__)
 
@@ -22,10 +24,11 @@ async def _create_user(user: UserRequest) -> Optional[UserModel]:
         UserModel if creation successful, None if user already exists or on error
     """
     try:
-        # Using synchronous context manager
-        with db_session() as session:
-            # Convert the request to a UserCreateRequest for password hashing
-            user_create = UserCreateRequest(**user.model_dump())
+        # Hash the password off the event loop before taking a database connection
+        hashed_password = await aget_password_hash(user.password)
+
+        async with async_db_session() as session:
+            user_create = UserCreateRequest(**(user.model_dump() | {"password": hashed_password}))
 
             # Create new user instance excluding id field
             user_dict = user_create.model_dump(
@@ -35,10 +38,10 @@ async def _create_user(user: UserRequest) -> Optional[UserModel]:
 
             # Add and commit
             session.add(new_user)
-            session.commit()
+            await session.commit()
 
             # Refresh to get the generated ID and timestamps
-            session.refresh(new_user)
+            await session.refresh(new_user)
             return new_user
 
     except IntegrityError as ie:
@@ -61,18 +64,17 @@ async def _get_user(username: str) -> Optional[UserModel]:
         UserModel if found, None if not found or on error
     """
     try:
-        # Using synchronous context manager
-        with db_session() as session:
+        async with async_db_session() as session:
             # Use select to query the user
             stmt = select(UserModel).where(UserModel.username == username)
 
             # Execute query and return first result or None
-            result = session.execute(stmt)
+            result = await session.execute(stmt)
             user = result.scalar_one_or_none()
 
             if user:
                 # Ensure the instance is attached to this session
-                session.refresh(user)
+                await session.refresh(user)
 
             return user
 
@@ -93,10 +95,10 @@ async def _update_user(username: str, update_data: dict) -> Optional[UserModel]:
         Updated UserModel if successful, None if user not found or on error
     """
     try:
-        with db_session() as session:
+        async with async_db_session() as session:
             # Get existing user
             stmt = select(UserModel).where(UserModel.username == username)
-            result = session.execute(stmt)
+            result = await session.execute(stmt)
             user = result.scalar_one_or_none()
 
             if not user:
@@ -107,8 +109,9 @@ async def _update_user(username: str, update_data: dict) -> Optional[UserModel]:
                 if hasattr(user, key):
                     setattr(user, key, value)
 
-            session.commit()
-            session.refresh(user)
+            await session.commit()
+            user_status_cache.invalidate(user.id)
+            await session.refresh(user)
             return user
 
     except IntegrityError as ie:
@@ -131,16 +134,17 @@ async def _delete_user(username: str) -> bool:
         True if user was deleted, False if user not found or on error
     """
     try:
-        with db_session() as session:
+        async with async_db_session() as session:
             stmt = select(UserModel).where(UserModel.username == username)
-            result = session.execute(stmt)
+            result = await session.execute(stmt)
             user = result.scalar_one_or_none()
 
             if not user:
                 return False
 
-            session.delete(user)
-            session.commit()
+            await session.delete(user)
+            await session.commit()
+            user_status_cache.invalidate(user.id)
             return True
 
     except Exception as e:
@@ -1,5 +1,7 @@
+import asyncio
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 
 import boto3
@@ -19,7 +21,12 @@ CACHED_RESOURCES_PATH = os.path.join(BASE_RESOURCES_PATH, "cached")
 
 
 logger = logging.getLogger(__name__)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# bcrypt releases the GIL, so hashes run in parallel on these threads while the event loop keeps serving requests.
+# The pool size bounds how many hashes run at once; further calls wait in the executor queue.
+_password_hashing_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASHING_WORKERS,
+                                                thread_name_prefix="password-hashing")
 
 
 def get_password_hash(plain_password: str) -> str:
@@ -30,6 +37,18 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+async def aget_password_hash(plain_password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(
+        _password_hashing_executor, get_password_hash, plain_password
+    )
+
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(
+        _password_hashing_executor, verify_password, plain_password, hashed_password
+    )
+
+
 def ensure_directory_exists(directory):
     os.makedirs(directory, exist_ok=True)
 
@@ -1,29 +1,99 @@
-from fastapi import APIRouter, Depends, HTTPException
+import logging
 
-from backend.schemas.search import InitialSearchRequest, Product, SearchQuery, InitialSearchResponse
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from backend.config import settings
+from backend.schemas import ExceptionSchema
+from backend.schemas.search import InitialSearchRequest, Product, SearchQuery, InitialSearchResponse, \
+    ChatHistoryResponse, ProductListingsBatchRequest, ProductListingsResult, TokenUsageReport
 from backend.services.auth_bearer import get_current_user_id
-from backend.services.search import process_initial_search_query, fetch_google_shopping_results, \
-    extract_product_details, get_chat_sessions_for_user
+from backend.services.rate_limit import RateLimitLease, limit_search_requests
+from backend.services.search import process_initial_search_query, search_product_listings, \
+    search_product_listings_batch, get_chat_sessions_for_user, stream_initial_search_query, get_chat_history_for_user, \
+    get_token_usage_report, resolve_chat_session, ChatSessionNotFoundError
+
+logger = logging.getLogger(__name__)
 
 search_router = APIRouter(prefix="/search", tags=["search"])
 
 
 @search_router.post("/product-listings", response_model=list[Product])
-def search_products(query: SearchQuery):
-    api_response = fetch_google_shopping_results(query.query)
-    if not api_response:
+async def search_products(query: SearchQuery):
+    try:
+        return await search_product_listings(query.query)
+    except httpx.HTTPError as e:
+        logger.warning(f"Product listing lookup for '{query.query}' failed: {e}")
         raise HTTPException(status_code=500, detail="Error fetching data from API")
-    products = extract_product_details(api_response)
-    return products
+
+
+@search_router.post("/product-listings/batch", response_model=list[ProductListingsResult])
+async def search_products_batch(request: ProductListingsBatchRequest):
+    """
+    Listings for several products at once, looked up concurrently. Every query gets a result, in request order,
+    with `error` set when its lookup failed.
+    """
+    return await search_product_listings_batch(request.queries)
+
+
+def _chat_session_not_found(e: ChatSessionNotFoundError) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 
 @search_router.post(
     "/initial",
+    responses={
+        status.HTTP_404_NOT_FOUND: {"model": ExceptionSchema},
+        status.HTTP_429_TOO_MANY_REQUESTS: {"model": ExceptionSchema},
+    },
 )
 async def initial_search(
-    request: InitialSearchRequest, user_id: int = Depends(get_current_user_id)
+    request: InitialSearchRequest, user_id: int = Depends(get_current_user_id),
+    lease: RateLimitLease = Depends(limit_search_requests),
 ) -> InitialSearchResponse:
-    return await process_initial_search_query(request.model, request.prompt, request.category, request.chat_session_id, user_id)
+    try:
+        return await process_initial_search_query(request.model, request.prompt, request.category,
+                                                  request.chat_session_id, user_id, request.include_listings)
+    except ChatSessionNotFoundError as e:
+        raise _chat_session_not_found(e)
+
+
+@search_router.post(
+    "/initial/stream",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_404_NOT_FOUND: {"model": ExceptionSchema},
+        status.HTTP_429_TOO_MANY_REQUESTS: {"model": ExceptionSchema},
+    },
+)
+async def initial_search_stream(
+    request: InitialSearchRequest, user_id: int = Depends(get_current_user_id),
+    lease: RateLimitLease = Depends(limit_search_requests),
+) -> StreamingResponse:
+    """
+    Same as /search/initial, but streams the graph steps, the recommended products and the final
+    InitialSearchResponse as Server-Sent Events.
+    """
+    # Checked before the response starts, so that a foreign chat session is answered with 404
+    if request.chat_session_id is not None:
+        try:
+            await resolve_chat_session(request.chat_session_id, user_id)
+        except ChatSessionNotFoundError as e:
+            raise _chat_session_not_found(e)
+
+    # The in-flight slot is held until the stream ends, not just until the response starts
+    return StreamingResponse(
+        lease.hold_until_done(stream_initial_search_query(
+            request.model, request.prompt, request.category, request.chat_session_id, user_id,
+            request.include_listings,
+        )),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also runs when the client went away before the stream started
+        background=BackgroundTask(lease.release),
+    )
 
 """
     Initial Search -> List[Products]
@@ -44,3 +114,28 @@ async def initial_search(
 @search_router.get("/chat-sessions")
 async def list_chat_sessions(user_id: int = Depends(get_current_user_id)):
     return await get_chat_sessions_for_user(user_id)
+
+
+@search_router.get("/chat-sessions/{chat_session_id}/messages", response_model=ChatHistoryResponse)
+async def chat_session_history(
+    chat_session_id: int,
+    before: int | None = Query(default=None, description="`next_cursor` of the previously loaded page"),
+    limit: int = Query(default=settings.CHAT_HISTORY_PAGE_SIZE, ge=1, le=settings.CHAT_HISTORY_MAX_PAGE_SIZE),
+    user_id: int = Depends(get_current_user_id),
+):
+    history = await get_chat_history_for_user(user_id, chat_session_id, before, limit)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return history
+
+
+@search_router.get("/usage", response_model=TokenUsageReport)
+async def token_usage_report(
+    days: int = Query(default=30, ge=1, le=365),
+    chat_session_id: int | None = Query(default=None, description="Only report the usage of this chat session"),
+    user_id: int = Depends(get_current_user_id),
+):
+    """
+    Token usage and cost of the current user's searches, per graph node and model and per chat session.
+    """
+    return await get_token_usage_report(user_id, days, chat_session_id)
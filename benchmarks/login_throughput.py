@@ -0,0 +1,63 @@
+"""
+Login throughput benchmark for password verification.
+
+Runs N concurrent bcrypt verifications the old way (blocking the event loop) and through the password hashing
+pool, and reports logins per second and the worst event loop stall seen by a coroutine ticking every 10 ms (a
+stand-in for the /search/initial streams that share the loop).
+
+    python -m benchmarks.login_throughput --logins 64 --rounds 12
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from passlib.context import CryptContext
+
+from backend import utils
+
+logging.getLogger("passlib").setLevel(logging.ERROR)
+
+
+async def _monitor_loop(stop: asyncio.Event, interval: float = 0.01) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def _run(verify, logins: int, hashed_password: str) -> tuple[float, float]:
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(_monitor_loop(stop))
+    await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(verify("correct horse", hashed_password) for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    assert all(results)
+    return logins / elapsed, await monitor
+
+
+async def _blocking_verify(plain_password: str, hashed_password: str) -> bool:
+    return utils.verify_password(plain_password, hashed_password)
+
+
+async def main(logins: int, rounds: int):
+    utils.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+    hashed_password = utils.get_password_hash("correct horse")
+
+    for name, verify in [("blocking", _blocking_verify), ("worker pool", utils.averify_password)]:
+        throughput, worst_stall = await _run(verify, logins, hashed_password)
+        print(f"{name:>12}: {throughput:7.1f} logins/s, worst event loop stall {worst_stall * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.rounds))
@@ -16,6 +16,9 @@ import boto3
 import psycopg2
 from dotenv import load_dotenv
 
+# Shared with the backend, which reads the local index (mounted into the Airflow containers)
+from backend.local_index import LocalVectorStore
+
 class NumpyEncoder(json.JSONEncoder):
     """
     Custom JSON encoder to handle NumPy arrays and other non-serializable types
@@ -42,6 +45,10 @@ class RedditDataProcessor:
         self.pinecone_api_key = os.getenv('PINECONE_API_KEY')
         self.pinecone_environment = os.getenv('PINECONE_ENVIRONMENT')
         self.pinecone_index_name = os.getenv('PINECONE_INDEX_NAME')
+
+        # Vector store backend ("pinecone" or "local")
+        self.vector_store_backend = os.getenv('VECTOR_STORE_BACKEND', 'pinecone')
+        self.local_vector_index_path = os.getenv('LOCAL_VECTOR_INDEX_PATH', 'resources/vector_index')
         
         # AWS S3 configuration
         self.aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
@@ -57,7 +64,8 @@ class RedditDataProcessor:
         
         # Initialize clients
         self._init_s3_client()
-        self._init_pinecone()
+        if self.vector_store_backend != 'local':
+            self._init_pinecone()
         self._init_embedding_model()
         
     def _init_s3_client(self):
@@ -97,6 +105,20 @@ class RedditDataProcessor:
         )
     
     
+    def _get_vector_store(self, namespace):
+        """Return the vector store posts are written to for the namespace"""
+        if self.vector_store_backend == 'local':
+            return LocalVectorStore(
+                path=self.local_vector_index_path,
+                embedding=self.embeddings,
+                namespace=namespace
+            )
+        return PineconeVectorStore(
+            index=self.pc_index,
+            embedding=self.embeddings,
+            namespace=namespace
+        )
+
     def save_to_s3(self, content, filename):
         """
         Save content to S3 bucket
@@ -128,7 +150,7 @@ class RedditDataProcessor:
         Process Reddit data by:
         1. Saving to S3
         2. Creating vector embeddings
-        3. Storing in Pinecone with metadata in a specific namespace
+        3. Storing in Pinecone (or the local vector index) with metadata in a specific namespace
         4. Inserting into PostgreSQL
         
         Args:
@@ -139,7 +161,10 @@ class RedditDataProcessor:
         
         # Timestamp for S3 and tracking
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
+
+        # Posts are written to the vector store once per namespace and run, not once per post
+        pending = {}
+
         # Process each post
         for _, row in dataframe.iterrows():
             try:
@@ -165,12 +190,6 @@ class RedditDataProcessor:
                 s3_key = f"reddit_posts/{timestamp}/{row_dict['id']}.json"
                 s3_url = self.save_to_s3(row_dict, s3_key)
 
-                vector_store = PineconeVectorStore(
-                    index=self.pc_index, 
-                    embedding=self.embeddings,
-                    namespace=namespace
-                )
-
                 # Prepare metadata for Pinecone
                 metadata = {
                     'id': row_dict['id'],
@@ -185,13 +204,6 @@ class RedditDataProcessor:
                     'comments': json.dumps(row_dict.get('comments', []), cls=NumpyEncoder)
                 }
 
-                # Add text with metadata
-                vector_store.add_texts(
-                    texts=[full_text],
-                    ids=[row_dict['id']],
-                    metadatas=[metadata]
-                )
-                
                 # Prepare post data for database
                 post_data = {
                     'id': row_dict['id'],
@@ -207,10 +219,11 @@ class RedditDataProcessor:
                     'comments': row_dict.get('comments', [])
                 }
                 
-                # Insert into database
-                self.insert_reddit_article(post_data)
-                
-                print(f"Processed post in {namespace} namespace: {row_dict['title']}")
+                posts = pending.setdefault(namespace, {'texts': [], 'ids': [], 'metadatas': [], 'post_data': []})
+                posts['texts'].append(full_text)
+                posts['ids'].append(row_dict['id'])
+                posts['metadatas'].append(metadata)
+                posts['post_data'].append(post_data)
             
             except Exception as e:
                 print(f"Error processing post: {e}")
@@ -218,6 +231,25 @@ class RedditDataProcessor:
                 import traceback
                 traceback.print_exc()
 
+        for namespace, posts in pending.items():
+            try:
+                # Add texts with metadata
+                self._get_vector_store(namespace).add_texts(
+                    texts=posts['texts'],
+                    ids=posts['ids'],
+                    metadatas=posts['metadatas']
+                )
+            except Exception as e:
+                print(f"Error adding {len(posts['ids'])} posts to the {namespace} namespace: {e}")
+                import traceback
+                traceback.print_exc()
+                continue
+
+            # Insert into database
+            for post_data in posts['post_data']:
+                self.insert_reddit_article(post_data)
+                print(f"Processed post in {namespace} namespace: {post_data['title']}")
+
     def insert_reddit_article(self, post_data):
         """
         Insert Reddit post data into PostgreSQL
@@ -5,6 +5,11 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings, extra="ignore"):
     BACKEND_URI: str
+    BACKEND_CONNECT_TIMEOUT_SECONDS: float = 5
+    BACKEND_TIMEOUT_SECONDS: float = 180  # Recommendations run the whole agent graph
+    BACKEND_MAX_CONNECTIONS: int = 10
+    BACKEND_RETRIES: int = 2
+    BACKEND_RETRY_BACKOFF_SECONDS: float = 0.5
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -5,7 +5,7 @@ from frontend.utils.chat import (
     get_openai_model_choices,
     get_categories,
     search_initial,
-    search_product_listings,
+    search_product_listings_batch,
     fetch_chat_sessions,
     process_selected_chat_session,
 )
@@ -92,7 +92,10 @@ def qa_interface():
         selected_chat_session = st.selectbox(
             "Chat Session", options=["New Chat"] + fetch_chat_sessions()
         )
-        if selected_chat_session:
+        if selected_chat_session == "New Chat":
+            # Follow-ups stay in the chat session the backend created for the first prompt
+            st.session_state.chat_session_id = st.session_state.get("new_chat_session_id")
+        elif selected_chat_session:
             st.session_state.chat_session_id = process_selected_chat_session(selected_chat_session)
 
         if st.button("Clear Chat"):
@@ -100,6 +103,7 @@ def qa_interface():
                 {"role": "assistant", "content": "Hello! How can I help you today?"}
             ]
             st.session_state.recommended_products = []
+            st.session_state.new_chat_session_id = None
             st.rerun()
 
     # Main chat container
@@ -123,9 +127,14 @@ def qa_interface():
             # Perform initial search for every prompt
             with st.spinner("Searching for recommendations..."):
                 try:
-                    response = search_initial(model, prompt, category, selected_chat_session, st.session_state.chat_history)
-
-                    if isinstance(response, dict):
+                    response = search_initial(model, prompt, category, st.session_state.chat_session_id)
+
+                    if isinstance(response, dict) and "response" not in response and response.get("detail"):
+                        # Rejected by the backend, e.g. 429 when searching too often
+                        st.error(response["detail"])
+                    elif isinstance(response, dict):
+                        if selected_chat_session == "New Chat":
+                            st.session_state.new_chat_session_id = response.get("chat_session_id")
                         rag_output = response.get("response", {})
                         products = rag_output.get("products", [])
                         reasoning_summary = rag_output.get("reasoning_summary", "")
@@ -165,17 +174,24 @@ def qa_interface():
                                 st.markdown(assistant_reply)
                             st.session_state.chat_history.append({"role": "assistant", "content": assistant_reply})
 
-                            # Fetch product listings for each recommended product
-                            for product in processed_products:
-                                with st.spinner(f"Fetching product links for: {product['title']}..."):
+                            # Product listings come with the response; older backends need a separate request
+                            listings = response.get("product_listings")
+                            if listings is None:
+                                with st.spinner("Fetching product links..."):
                                     try:
-                                        product_response = search_product_listings(product['title'])
-                                        if isinstance(product_response, list) and product_response:
-                                            additional_products = preprocess_products(product_response)
-                                            card_markdown = create_cards(additional_products[:5], title=f"Product Listings for {product['title']}")
-                                            st.markdown(card_markdown, unsafe_allow_html=True)
+                                        listings = search_product_listings_batch([product['title'] for product in processed_products])
                                     except Exception as e:
-                                        st.error(f"Error fetching products for {product['title']}: {e}")
+                                        listings = []
+                                        st.error(f"Error fetching product links: {e}")
+                            if not isinstance(listings, list):
+                                listings = []
+                            for listing in listings:
+                                if listing.get("error"):
+                                    st.error(f"Error fetching products for {listing['query']}: {listing['error']}")
+                                elif listing.get("products"):
+                                    additional_products = preprocess_products(listing["products"])
+                                    card_markdown = create_cards(additional_products[:5], title=f"Product Listings for {listing['query']}")
+                                    st.markdown(card_markdown, unsafe_allow_html=True)
                 except Exception as e:
                     st.error(f"Error during initial search: {e}")
 
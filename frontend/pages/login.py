@@ -1,7 +1,7 @@
-import requests
 import streamlit as st
 
 from frontend.config import settings
+from frontend.utils import http
 from frontend.utils.auth import set_tokens
 
 
@@ -11,7 +11,8 @@ def login():
     password = st.text_input("Enter Password", type="password")
 
     if st.button("Login"):
-        response = requests.post(
+        response = http.request(
+            "POST",
             f"{settings.BACKEND_URI}/auth/token",
             json={"username": username, "password": password},
         )
@@ -1,7 +1,7 @@
-import requests
 import streamlit as st
 
 from frontend.config import settings
+from frontend.utils import http
 
 
 def create_user():
@@ -12,7 +12,8 @@ def create_user():
     full_name = st.text_input("Full Name")
 
     if st.button("Create User"):
-        response = requests.post(
+        response = http.request(
+            "POST",
             f"{settings.BACKEND_URI}/users/",
             json={
                 "username": username,
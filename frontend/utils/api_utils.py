@@ -1,10 +1,12 @@
-import requests
 import streamlit as st
 
+from frontend.utils import http
+
 
 def generate_document_summary(doc_id):
     """Generate document summary using NVIDIA services"""
-    response = requests.post(
+    response = http.request(
+        "POST",
         f"{st.secrets['API_URL']}/generate_summary", json={"document_id": doc_id}
     )
     return response.json()["summary"]
@@ -12,7 +14,8 @@ def generate_document_summary(doc_id):
 
 def process_question(question, doc_id):
     """Process question using multi-modal RAG"""
-    response = requests.post(
+    response = http.request(
+        "POST",
         f"{st.secrets['API_URL']}/process_question",
         json={"question": question, "document_id": doc_id, "context_needed": "minimal"},
     )
@@ -1,7 +1,7 @@
-import requests
 import streamlit as st
 
 from frontend.config import settings
+from frontend.utils import http
 
 
 def set_tokens(tokens: dict[str, str]):
@@ -27,9 +27,9 @@ def make_authenticated_request(endpoint, method="GET", data=None, params=None):
     url = f"{settings.BACKEND_URI}/{endpoint}"
 
     if method == "POST":
-        response = requests.post(url, json=data, headers=headers, params=params)
+        response = http.request("POST", url, json=data, headers=headers, params=params)
     else:
-        response = requests.get(url, headers=headers, params=params)
+        response = http.request("GET", url, headers=headers, params=params)
 
     return response.json()
 
@@ -38,8 +38,8 @@ def make_unauthenticated_request(endpoint, method="GET", data=None, params=None)
     url = f"{settings.BACKEND_URI}/{endpoint}"
 
     if method == "POST":
-        response = requests.post(url, json=data, params=params)
+        response = http.request("POST", url, json=data, params=params)
     else:
-        response = requests.get(url, params=params)
+        response = http.request("GET", url, params=params)
 
     return response.json()
@@ -51,18 +51,16 @@ def get_pdf_object_from_db(pdf_filename: str, extraction_mechanism: str):
         method="GET",
         params={"filename": pdf_filename, "extraction-mechanism": extraction_mechanism},
     )
-def search_initial(model: str, prompt: str, category: str, chat_session_id: str | None, chat_history):
+def search_initial(model: str, prompt: str, category: str, chat_session_id: int | None):
     # POST /search/initial
-    if chat_history:
-        prompt = " ".join([i["content"] for i in chat_history if i["role"] == "user"]) + prompt
-
-    chat_session_id = process_selected_chat_session(chat_session_id)
-
+    # The backend keeps the conversation for the chat session, so only the new prompt is sent
     payload = {
         "model": model,
         "prompt": prompt,
         "category": category,
         "chat_session_id": chat_session_id,
+        # The backend looks up the product listings while the recommendations are generated
+        "include_listings": True,
     }
     return make_authenticated_request(
         endpoint="/search/initial",
@@ -96,6 +94,17 @@ def search_product_listings(query: str):
         data=payload
     )
 
+def search_product_listings_batch(queries: list[str]):
+    # POST /search/product-listings/batch
+    payload = {
+        "queries": queries
+    }
+    return make_authenticated_request(
+        endpoint="/search/product-listings/batch",
+        method="POST",
+        data=payload
+    )
+
 def set_chat_id(chat_id: str):
     st.session_state.chat_id = chat_id
 
@@ -0,0 +1,33 @@
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from frontend.config import settings
+
+
+@lru_cache
+def get_http_session() -> requests.Session:
+    """
+    Session shared by all backend calls of the Streamlit process, so connections to the backend are kept alive and
+    reused. Failed connections are retried with backoff for every method; 502/503/504 responses only for
+    idempotent methods, since POST /search/initial records the chat turn.
+    """
+    retry = Retry(
+        total=settings.BACKEND_RETRIES,
+        backoff_factor=settings.BACKEND_RETRY_BACKOFF_SECONDS,
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.BACKEND_MAX_CONNECTIONS, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    kwargs.setdefault("timeout", (settings.BACKEND_CONNECT_TIMEOUT_SECONDS, settings.BACKEND_TIMEOUT_SECONDS))
+    return get_http_session().request(method, url, **kwargs)
@@ -1,6 +1,11 @@
+import threading
+
 import pytest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from datetime import datetime, timedelta
+from passlib.context import CryptContext
+
+from backend import utils
 from backend.database.users import UserModel
 from backend.schemas.auth import Token
 from backend.services.auth import (
@@ -30,7 +35,7 @@ def token():
 # Test authenticate_user
 @pytest.mark.asyncio
 async def test_authenticate_user_success():
-    with patch("backend.database.db.db_session") as mock_session:
+    with patch("backend.database.db_session") as mock_session:
         session_mock = mock_session.return_value.__enter__.return_value
         session_mock.scalar.return_value = UserModel(
             id=1,
@@ -112,3 +117,24 @@ async def test_authenticate_refresh_token_failure():
     with patch("backend.services.auth.decode_token", return_value={}):
         result = await authenticate_refresh_token("invalid_refresh_token")
         assert result is None
+
+# Test that password hashing and verification run on the password hashing pool
+@pytest.mark.asyncio
+async def test_password_hashing_runs_in_worker_pool():
+    threads = []
+    fast_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+
+    def record_thread(method):
+        def wrapper(*args):
+            threads.append(threading.current_thread().name)
+            return method(*args)
+        return wrapper
+
+    with patch("backend.utils.pwd_context", MagicMock(hash=record_thread(fast_context.hash),
+                                                      verify=record_thread(fast_context.verify))):
+        hashed_password = await utils.aget_password_hash("password123")
+        assert await utils.averify_password("password123", hashed_password)
+        assert not await utils.averify_password("wrong", hashed_password)
+
+    assert len(threads) == 3
+    assert all(name.startswith("password-hashing") for name in threads)
@@ -0,0 +1,85 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from backend.services.auth import UserStatus, UserStatusCache, authenticate_token, user_status_cache
+from backend.services.auth_bearer import JWTBearer
+
+CLAIMS = {"user_id": 1, "password_timestamp": 1234567890, "token_type": "access"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def bearer_request(token: str = "access_token") -> Request:
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+
+@pytest.fixture(autouse=True)
+def empty_user_status_cache():
+    user_status_cache._entries.clear()
+    yield
+    user_status_cache._entries.clear()
+
+
+def test_user_status_cache_expires_and_invalidates():
+    clock = FakeClock()
+    cache = UserStatusCache(ttl_seconds=60, clock=clock)
+    cache.set(UserStatus(id=1, active=True, password_timestamp=1))
+    cache.set(UserStatus(id=2, active=True, password_timestamp=1))
+
+    cache.invalidate(1)
+    assert cache.get(1) is None
+    assert cache.get(2) == UserStatus(id=2, active=True, password_timestamp=1)
+
+    clock.now = 60
+    assert cache.get(2) is None
+
+
+@pytest.mark.asyncio
+async def test_authenticate_token_uses_cached_user_status():
+    user_status_cache.set(UserStatus(id=1, active=True, password_timestamp=1234567890))
+
+    with patch("backend.services.auth.async_db_session") as mock_session:
+        assert await authenticate_token(1, 1234567890) == UserStatus(id=1, active=True, password_timestamp=1234567890)
+        assert await authenticate_token(1, 1111111111) is None
+        mock_session.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_jwt_bearer_decodes_once_per_request():
+    request = bearer_request()
+    user_status_cache.set(UserStatus(id=1, active=True, password_timestamp=1234567890))
+
+    with patch("backend.services.auth_bearer.decode_token", new_callable=AsyncMock, return_value=CLAIMS) as mock_decode:
+        assert await JWTBearer()(request) == CLAIMS
+        assert await JWTBearer()(request) == CLAIMS
+
+    mock_decode.assert_awaited_once_with("access_token")
+    assert request.state.jwt_claims == CLAIMS
+
+
+@pytest.mark.asyncio
+async def test_jwt_bearer_rejects_token_after_password_change():
+    user_status_cache.set(UserStatus(id=1, active=True, password_timestamp=1300000000))
+
+    with patch("backend.services.auth_bearer.decode_token", new_callable=AsyncMock, return_value=CLAIMS), \
+            pytest.raises(HTTPException) as exc_info:
+        await JWTBearer()(bearer_request())
+
+    assert exc_info.value.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_jwt_bearer_rejects_invalid_token():
+    with patch("backend.services.auth_bearer.decode_token", new_callable=AsyncMock, return_value={}), \
+            pytest.raises(HTTPException) as exc_info:
+        await JWTBearer()(bearer_request())
+
+    assert exc_info.value.status_code == 403
@@ -0,0 +1,67 @@
+import pytest
+from unittest.mock import patch
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+
+from backend.database.pool import PoolStats, engine_options, timed_checkout
+
+
+# Fixtures
+@pytest.fixture
+def stats():
+    return PoolStats()
+
+
+def test_engine_options_queue_pool():
+    with patch("backend.database.pool.settings") as mock_settings:
+        mock_settings.POSTGRES_POOL_MODE = "queue"
+        mock_settings.POSTGRES_POOL_SIZE = 3
+        mock_settings.POSTGRES_POOL_PRE_PING = True
+
+        options = engine_options(async_engine=True)
+
+    assert options["pool_size"] == 3
+    assert options["pool_pre_ping"] is True
+    assert "poolclass" not in options
+
+
+def test_engine_options_null_pool_disables_statement_cache():
+    with patch("backend.database.pool.settings") as mock_settings:
+        mock_settings.POSTGRES_POOL_MODE = "null"
+
+        async_options = engine_options(async_engine=True)
+        sync_options = engine_options(async_engine=False)
+
+    assert async_options["poolclass"] is NullPool
+    assert async_options["connect_args"]["statement_cache_size"] == 0
+    assert async_options["connect_args"]["prepared_statement_cache_size"] == 0
+    assert sync_options == {"poolclass": NullPool}
+
+
+def test_pool_stats_counts_pool_events(stats):
+    engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=1)
+    stats.attach(engine)
+
+    for _ in range(2):
+        with timed_checkout(stats):
+            connection = engine.connect()
+        connection.execute(text("SELECT 1"))
+        connection.close()
+
+    snapshot = stats.snapshot()
+    assert snapshot["pool"] == "QueuePool"
+    assert snapshot["connects"] == 1
+    assert snapshot["checkouts"] == 2
+    assert snapshot["checkins"] == 2
+    assert snapshot["checkedout"] == 0
+    assert snapshot["checkout_wait_max_ms"] >= snapshot["checkout_wait_avg_ms"] > 0
+
+
+def test_timed_checkout_records_timeouts(stats):
+    with pytest.raises(PoolTimeoutError):
+        with timed_checkout(stats):
+            raise PoolTimeoutError("QueuePool limit reached")
+
+    assert stats.snapshot()["timeouts"] == 1
+    assert stats.waits == 0
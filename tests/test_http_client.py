@@ -0,0 +1,114 @@
+import httpx
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from backend.services.http_client import HttpClient
+
+
+def mock_client(handler) -> HttpClient:
+    client = HttpClient(retries=2, retry_backoff_seconds=0.5)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+@pytest.mark.asyncio
+async def test_request_retries_with_backoff():
+    responses = iter([httpx.Response(503), httpx.Response(502), httpx.Response(200, json={"ok": True})])
+    client = mock_client(lambda request: next(responses))
+
+    with patch("backend.services.http_client.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+        response = await client.get("https://example.com")
+
+    assert response.json() == {"ok": True}
+    assert [call.args[0] for call in mock_sleep.await_args_list] == [0.5, 1.0]
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_request_honours_retry_after():
+    responses = iter([httpx.Response(429, headers={"Retry-After": "3"}), httpx.Response(200)])
+    client = mock_client(lambda request: next(responses))
+
+    with patch("backend.services.http_client.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+        assert (await client.get("https://example.com")).status_code == 200
+
+    mock_sleep.assert_awaited_once_with(3.0)
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_request_caps_retry_after():
+    responses = iter([httpx.Response(503, headers={"Retry-After": "3600"}), httpx.Response(200)])
+    client = mock_client(lambda request: next(responses))
+
+    with patch("backend.services.http_client.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+        assert (await client.get("https://example.com")).status_code == 200
+
+    mock_sleep.assert_awaited_once_with(10)
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_post_is_only_retried_when_the_connection_failed():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.ConnectError("connection refused", request=request)
+        if len(calls) == 2:
+            return httpx.Response(503)
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    client = mock_client(handler)
+    with patch("backend.services.http_client.asyncio.sleep", new_callable=AsyncMock):
+        # The request may have been processed (and billed) once it was sent
+        assert (await client.post("https://realtime.oxylabs.io/v1/queries", json={})).status_code == 503
+        assert len(calls) == 2
+        with pytest.raises(httpx.ReadTimeout):
+            await client.post("https://realtime.oxylabs.io/v1/queries", json={})
+        assert len(calls) == 3
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_post_retries_when_the_caller_opts_in():
+    responses = iter([httpx.Response(503), httpx.Response(200)])
+    client = mock_client(lambda request: next(responses))
+
+    with patch("backend.services.http_client.asyncio.sleep", new_callable=AsyncMock):
+        response = await client.post("https://example.com", json={}, retry_non_idempotent=True)
+
+    assert response.status_code == 200
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_request_gives_up_after_retries():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ConnectError("connection refused", request=request)
+
+    client = mock_client(handler)
+    with patch("backend.services.http_client.asyncio.sleep", new_callable=AsyncMock), \
+            pytest.raises(httpx.ConnectError):
+        await client.get("https://example.com")
+
+    assert len(calls) == 3
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_request_does_not_retry_client_errors():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(401)
+
+    client = mock_client(handler)
+    assert (await client.get("https://example.com")).status_code == 401
+    assert len(calls) == 1
+    await client.close()
@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+from unittest.mock import MagicMock
+from langchain_core.documents import Document
+
+from backend.agent.keyword_index import BM25Index, KeywordIndexes, tokenize
+
+
+# Fixtures
+@pytest.fixture
+def documents():
+    return [
+        Document(page_content="Sony WH-1000XM5 noise cancelling is the best", metadata={"id": "a"}),
+        Document(page_content="Noise cancelling headphones for travel, noise free flights", metadata={"id": "b"}),
+        Document(page_content="Bose QC45 comfort review", metadata={"id": "c"}),
+    ]
+
+
+def test_tokenize_keeps_model_names():
+    tokens = tokenize("Sony WH-1000XM5!")
+
+    assert "wh-1000xm5" in tokens
+    assert "wh1000xm5" in tokens
+    assert "1000xm5" in tokens
+
+
+def test_bm25_ranks_exact_model_name_first(documents):
+    index = BM25Index(documents)
+
+    results = index.search("sony wh1000xm5 headphones", k=3)
+
+    assert results[0][0].metadata["id"] == "a"
+    assert results[1][0].metadata["id"] == "b"
+    assert results[0][1] > results[1][1]
+
+
+def test_bm25_unknown_terms_return_nothing(documents):
+    assert BM25Index(documents).search("sneakers") == []
+
+
+def test_keyword_indexes_rebuild_after_refresh(documents):
+    now = [0.0]
+    loader = MagicMock(return_value=documents)
+    indexes = KeywordIndexes(loader=loader, refresh_seconds=60, clock=lambda: now[0])
+
+    indexes.search("bose", namespace="headphones")
+    indexes.search("sony", namespace="headphones")
+    assert loader.call_count == 1
+
+    now[0] = 61
+    indexes.search("bose", namespace="headphones")
+    assert loader.call_count == 2
+
+
+def test_bm25_returns_copies(documents):
+    index = BM25Index(documents)
+
+    index.search("bose")[0][0].metadata["rrf_score"] = 1.0
+
+    assert "rrf_score" not in documents[2].metadata
+    assert "rrf_score" not in index.search("bose")[0][0].metadata
+
+
+def test_keyword_index_build_does_not_block_other_namespaces(documents):
+    building = threading.Event()
+    release = threading.Event()
+
+    def loader(namespace: str):
+        if namespace == "slow":
+            building.set()
+            release.wait(5)
+        return documents
+
+    indexes = KeywordIndexes(loader=loader)
+    slow_build = threading.Thread(target=indexes.get, args=("slow",))
+    slow_build.start()
+    building.wait(5)
+
+    assert indexes.search("bose", namespace="headphones")[0][0].metadata["id"] == "c"
+
+    release.set()
+    slow_build.join(5)
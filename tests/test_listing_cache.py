@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock
+
+from backend.services.listing_cache import ListingCache, MemoryListingStore, normalize_listing_query
+
+LISTINGS = [{"title": "Sony WH-1000XM5", "price": "$299.99", "product_url": "https://www.google.com/shopping/product/1",
+             "merchant_name": "Best Buy"}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_listing_query():
+    assert normalize_listing_query("  Sony   WH-1000XM5\n") == "sony wh-1000xm5"
+
+
+@pytest.mark.asyncio
+async def test_memory_store_expires_and_evicts():
+    clock = FakeClock()
+    store = MemoryListingStore(max_entries=2, ttl_seconds=10, clock=clock)
+    await store.set("a", 1)
+    await store.set("b", 2)
+    await store.get("a")
+    await store.set("c", 3)
+
+    assert await store.get("b") is None
+    assert await store.get("a") == 1
+
+    clock.now = 10
+    assert await store.get("a") is None
+    assert len(store) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_or_fetch_caches_by_normalized_query():
+    cache = ListingCache(MemoryListingStore())
+    fetch = AsyncMock(return_value=LISTINGS)
+
+    assert await cache.get_or_fetch("Sony WH-1000XM5", fetch) == LISTINGS
+    assert await cache.get_or_fetch("sony  wh-1000xm5", fetch) == LISTINGS
+
+    fetch.assert_awaited_once_with("Sony WH-1000XM5")
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_get_or_fetch_does_not_cache_failures():
+    cache = ListingCache(MemoryListingStore())
+    fetch = AsyncMock(side_effect=[None, LISTINGS])
+
+    assert await cache.get_or_fetch("Sony WH-1000XM5", fetch) is None
+    assert await cache.get_or_fetch("Sony WH-1000XM5", fetch) == LISTINGS
+    assert fetch.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_fetch():
+    cache = ListingCache(MemoryListingStore())
+    release = asyncio.Event()
+    calls = []
+
+    async def fetch(query):
+        calls.append(query)
+        await release.wait()
+        return LISTINGS
+
+    lookups = [asyncio.create_task(cache.get_or_fetch("Sony WH-1000XM5", fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*lookups) == [LISTINGS] * 5
+    assert calls == ["Sony WH-1000XM5"]
+    assert cache.coalesced == 4
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_coalesced_lookups():
+    cache = ListingCache(MemoryListingStore())
+    release = asyncio.Event()
+    fetch = AsyncMock(return_value=None)
+
+    async def fetch_listings(query):
+        await release.wait()
+        return LISTINGS
+
+    leader = asyncio.create_task(cache.get_or_fetch("Sony WH-1000XM5", fetch_listings))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get_or_fetch("Sony WH-1000XM5", fetch))
+    await asyncio.sleep(0)
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await follower == LISTINGS
+    assert leader.cancelled()
+    fetch.assert_not_awaited()
+    assert await cache.get_or_fetch("Sony WH-1000XM5", fetch) == LISTINGS
+    assert cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_the_error():
+    cache = ListingCache(MemoryListingStore())
+    release = asyncio.Event()
+
+    async def fetch(query):
+        await release.wait()
+        raise RuntimeError("Oxylabs is down")
+
+    lookups = [asyncio.create_task(cache.get_or_fetch("Sony WH-1000XM5", fetch)) for _ in range(2)]
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(*lookups, return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_store_errors_fall_back_to_fetch():
+    store = MemoryListingStore()
+    store.get = AsyncMock(side_effect=ConnectionError("redis is down"))
+    store.set = AsyncMock(side_effect=ConnectionError("redis is down"))
+    cache = ListingCache(store)
+
+    assert await cache.get_or_fetch("Sony WH-1000XM5", AsyncMock(return_value=LISTINGS)) == LISTINGS
@@ -0,0 +1,77 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from backend.local_index import LocalVectorStore
+from backend.agent.vector_store import Retriever
+
+
+# Fixtures
+@pytest.fixture
+def embeddings():
+    return DeterministicFakeEmbedding(size=16)
+
+
+@pytest.fixture
+def local_store(tmp_path, embeddings):
+    return LocalVectorStore.from_texts(
+        ["sony wh-1000xm5 review", "bose qc45 comfort", "airpods max battery"],
+        embeddings,
+        metadatas=[{"id": "a", "score": 10}, {"id": "b", "score": 30}, {"id": "c", "score": 20}],
+        ids=["a", "b", "c"],
+        path=str(tmp_path),
+        namespace="headphones",
+    )
+
+
+def test_similarity_search_returns_exact_match_first(local_store, embeddings):
+    results = local_store.similarity_search_by_vector_with_score(
+        embeddings.embed_query("bose qc45 comfort"), k=2, namespace="headphones")
+
+    assert len(results) == 2
+    assert results[0][0].page_content == "bose qc45 comfort"
+    assert results[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert results[0][1] >= results[1][1]
+
+
+def test_namespaces_are_isolated(local_store):
+    assert local_store.similarity_search("bose qc45 comfort", namespace="sneakers") == []
+    assert len(local_store.documents("headphones")) == 3
+
+
+def test_add_texts_upserts_by_id(local_store, tmp_path, embeddings):
+    local_store.add_texts(["bose qc45 updated"], [{"id": "b", "score": 31}], ids=["b"], namespace="headphones")
+
+    reader = LocalVectorStore(path=str(tmp_path), embedding=embeddings)
+    documents = reader.documents("headphones")
+    assert len(documents) == 3
+    assert reader.similarity_search("bose qc45 updated", k=1, namespace="headphones")[0].metadata["score"] == 31
+
+
+def test_reader_picks_up_rewritten_index(local_store, tmp_path, embeddings):
+    reader = LocalVectorStore(path=str(tmp_path), embedding=embeddings)
+    assert len(reader.documents("headphones")) == 3
+
+    local_store.add_texts(["sennheiser momentum 4"], [{"id": "d", "score": 5}], ids=["d"], namespace="headphones")
+
+    assert len(reader.documents("headphones")) == 4
+
+
+@pytest.mark.asyncio
+async def test_retriever_reads_local_index(local_store, embeddings):
+    retriever = Retriever(vector_store=local_store, embeddings=embeddings)
+
+    docs = await retriever.asim_search("sony wh-1000xm5 review", "headphones")
+
+    assert [d.metadata["score"] for d in docs] == [30, 20, 10]
+    assert all("similarity" in d.metadata for d in docs)
+
+
+def test_writes_publish_snapshots_through_the_current_pointer(local_store, tmp_path):
+    for n in range(3):
+        local_store.add_texts([f"headphones {n}"], [{"id": str(n), "score": n}], ids=[str(n)], namespace="headphones")
+
+    namespace_path = tmp_path / "headphones"
+    snapshots = sorted(entry.name for entry in namespace_path.iterdir() if entry.is_dir())
+    assert len(snapshots) == 2
+    assert (namespace_path / "CURRENT").read_text() == snapshots[-1]
+    assert len(local_store.documents("headphones")) == 6
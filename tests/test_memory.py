@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from backend.agent.memory import ConversationMemory, Conversation, ConversationTurn, summarize_generation
+from backend.database.messages import MessageSenderEnum
+
+
+def generation(*product_names: str) -> str:
+    return json.dumps({
+        "products": [{"product_name": name, "reason_for_recommendation": "ANC"} for name in product_names],
+        "reasoning_summary": "Great noise cancelling.",
+    })
+
+
+def build_memory(*responses: str, max_recent_turns: int = 2) -> ConversationMemory:
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content=response) for response in responses]))
+    return ConversationMemory(llm=llm, max_recent_turns=max_recent_turns)
+
+
+def test_summarize_generation():
+    assert summarize_generation(generation("Sony WH-1000XM5", "Bose QC45")) == \
+           "Recommended: Sony WH-1000XM5, Bose QC45. Great noise cancelling."
+    assert summarize_generation("not json") == "not json"
+
+
+@pytest.mark.asyncio
+async def test_condense_first_prompt_skips_llm():
+    memory = build_memory()
+
+    assert await memory.condense(Conversation(), "noise cancelling headphones") == "noise cancelling headphones"
+
+
+@pytest.mark.asyncio
+async def test_condense_follow_up():
+    memory = build_memory("noise cancelling headphones under $200")
+    conversation = Conversation(turns=[ConversationTurn("noise cancelling headphones", "Recommended: Sony.")])
+
+    assert await memory.condense(conversation, "anything under $200?") == "noise cancelling headphones under $200"
+
+
+def stored_turns(*prompts: str) -> list[MagicMock]:
+    messages = []
+    for index, prompt in enumerate(prompts):
+        messages.append(MagicMock(id=index * 2 + 1, sender=MessageSenderEnum.USER.value, content=prompt))
+        messages.append(MagicMock(id=index * 2 + 2, sender=MessageSenderEnum.SYSTEM.value,
+                                  content=generation("Sony WH-1000XM5")))
+    return messages
+
+
+@pytest.mark.asyncio
+async def test_load_pairs_stored_messages():
+    messages = stored_turns("noise cancelling headphones") + [
+        MagicMock(id=3, sender=MessageSenderEnum.USER.value, content="unanswered prompt"),
+    ]
+    memory = build_memory()
+    with patch("backend.agent.memory.fetch_messages_page", new_callable=AsyncMock,
+               return_value=(messages, None)) as mock_fetch:
+        conversation = await memory.load(7)
+        await memory.load(7)
+
+    # Always read from the database, so turns stored by other workers are seen
+    assert mock_fetch.await_count == 2
+    mock_fetch.assert_awaited_with(7, limit=6)
+    assert conversation.turns == [
+        ConversationTurn("noise cancelling headphones", "Recommended: Sony WH-1000XM5. Great noise cancelling.", 2)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_load_folds_old_turns_into_summary_once():
+    memory = build_memory("Wants noise cancelling headphones.")
+    messages = stored_turns("headphones", "with noise cancelling", "under $200")
+
+    with patch("backend.agent.memory.fetch_messages_page", new_callable=AsyncMock, return_value=(messages, None)):
+        conversation = await memory.load(7)
+        assert [turn.prompt for turn in conversation.turns] == ["with noise cancelling", "under $200"]
+        await asyncio.gather(*memory._summary_tasks)
+
+        # The folded turn is not summarized again
+        conversation = await memory.load(7)
+        assert not memory._summary_tasks
+
+    assert conversation.summary == "Wants noise cancelling headphones."
+
+
+@pytest.mark.asyncio
+async def test_summaries_are_bounded():
+    memory = build_memory()
+    memory.max_sessions = 2
+    with patch("backend.agent.memory.fetch_messages_page", new_callable=AsyncMock, return_value=([], None)):
+        for chat_session_id in (1, 2, 3):
+            await memory.load(chat_session_id)
+
+    assert list(memory._summaries) == [2, 3]
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from backend.database.messages import MessageSenderEnum, MessagesModel, fetch_messages_page, record_chat_turn
+
+
+# Fixtures
+@pytest.fixture
+def session():
+    session = AsyncMock()
+    session.scalars.return_value = MagicMock(all=MagicMock(return_value=["user message", "system message"]))
+    return session
+
+
+@pytest.fixture
+def mock_db_session(session):
+    @asynccontextmanager
+    async def _db_session():
+        yield session
+
+    with patch("backend.database.messages.async_db_session", _db_session):
+        yield session
+
+
+@pytest.mark.asyncio
+async def test_record_chat_turn_single_transaction(mock_db_session):
+    messages = await record_chat_turn(chat_session_id=7, prompt="headphones", generation='{"products": []}',
+                                      references=["ref 1", "ref 2"], tools_used=["vector_search"])
+
+    assert messages == ["user message", "system message"]
+    # Both messages go out in one INSERT ... RETURNING
+    mock_db_session.scalars.assert_awaited_once()
+    rows = mock_db_session.scalars.call_args.args[1]
+    assert [row["sender"] for row in rows] == [MessageSenderEnum.USER.value, MessageSenderEnum.SYSTEM.value]
+    assert json.loads(rows[1]["ref"]) == ["ref 1", "ref 2"]
+    # The chat session update shares the transaction
+    mock_db_session.execute.assert_awaited_once()
+    mock_db_session.commit.assert_awaited_once()
+    mock_db_session.refresh.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_fetch_messages_page_keyset(mock_db_session):
+    newest_first = [MessagesModel(id=message_id, chat_session_id=7) for message_id in (10, 9, 8)]
+    mock_db_session.scalars.return_value = MagicMock(all=MagicMock(return_value=newest_first))
+
+    messages, next_cursor = await fetch_messages_page(7, before_id=11, limit=2)
+
+    assert [message.id for message in messages] == [9, 10]
+    assert next_cursor == 9
+    sql = str(mock_db_session.scalars.call_args.args[0])
+    assert "messages.id < :id_1" in sql
+    assert "ORDER BY messages.id DESC" in sql
+
+
+@pytest.mark.asyncio
+async def test_fetch_messages_page_last_page(mock_db_session):
+    mock_db_session.scalars.return_value = MagicMock(all=MagicMock(return_value=[MessagesModel(id=1)]))
+
+    messages, next_cursor = await fetch_messages_page(7, limit=2)
+
+    assert [message.id for message in messages] == [1]
+    assert next_cursor is None
@@ -0,0 +1,132 @@
+import pytest
+from typing import TypedDict
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langgraph.graph import END, StateGraph
+from sqlalchemy import create_engine, text
+
+from backend.metrics import EXTERNAL_CALL_DURATION, GRAPH_NODE_DURATION, HTTP_REQUEST_DURATION, \
+    GraphMetricsCallback, Histogram, MetricsRegistry, PrometheusMiddleware, StatsCollector, instrument_engine
+
+
+def observed_count(histogram: Histogram, *label_values: str) -> int:
+    series = histogram._series.get(label_values)
+    return series[2] if series is not None else 0
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.register(Histogram("step_seconds", "Step duration.", ("step",), buckets=(0.1, 1)))
+
+    histogram.observe(0.05, step="retrieve")
+    histogram.observe(0.5, step="retrieve")
+    histogram.observe(3, step="retrieve")
+
+    assert registry.render().splitlines() == [
+        "# HELP step_seconds Step duration.",
+        "# TYPE step_seconds histogram",
+        'step_seconds_bucket{step="retrieve",le="0.1"} 1',
+        'step_seconds_bucket{step="retrieve",le="1"} 2',
+        'step_seconds_bucket{step="retrieve",le="+Inf"} 3',
+        'step_seconds_sum{step="retrieve"} 3.55',
+        'step_seconds_count{step="retrieve"} 3',
+    ]
+
+
+def test_stats_collector_renders_numeric_stats():
+    registry = MetricsRegistry()
+    registry.register(StatsCollector(
+        "listing_cache", "Listing cache.", lambda: {"backend": "MemoryListingStore", "hits": 3, "in_flight": 1},
+        counters=("hits",),
+    ))
+    registry.register(StatsCollector("disabled_cache", "Disabled cache.", lambda: None))
+
+    assert registry.render().splitlines() == [
+        "# HELP listing_cache_hits_total Listing cache. (hits)",
+        "# TYPE listing_cache_hits_total counter",
+        "listing_cache_hits_total 3",
+        "# HELP listing_cache_in_flight Listing cache. (in_flight)",
+        "# TYPE listing_cache_in_flight gauge",
+        "listing_cache_in_flight 1",
+    ]
+
+
+def test_histogram_time_labels_the_outcome():
+    histogram = Histogram("call_seconds", "Call duration.", ("service", "outcome"))
+
+    with histogram.time(service="oxylabs"):
+        pass
+    with pytest.raises(ValueError):
+        with histogram.time(service="oxylabs"):
+            raise ValueError("boom")
+
+    assert observed_count(histogram, "oxylabs", "ok") == 1
+    assert observed_count(histogram, "oxylabs", "error") == 1
+
+
+def test_middleware_labels_requests_with_the_route_template():
+    app = FastAPI()
+    app.add_middleware(PrometheusMiddleware)
+
+    @app.get("/chat-sessions/{chat_session_id}/messages")
+    async def messages(chat_session_id: int):
+        return []
+
+    route = "/chat-sessions/{chat_session_id}/messages"
+    before = observed_count(HTTP_REQUEST_DURATION, "GET", route, "200")
+    unmatched_before = observed_count(HTTP_REQUEST_DURATION, "GET", "unmatched", "404")
+
+    client = TestClient(app)
+    assert client.get("/chat-sessions/1/messages").status_code == 200
+    assert client.get("/chat-sessions/2/messages").status_code == 200
+    assert client.get("/does-not-exist").status_code == 404
+
+    assert observed_count(HTTP_REQUEST_DURATION, "GET", route, "200") == before + 2
+    assert observed_count(HTTP_REQUEST_DURATION, "GET", "unmatched", "404") == unmatched_before + 1
+
+
+class State(TypedDict):
+    steps: list[str]
+
+
+async def vector_search(state: State):
+    return {"steps": state["steps"] + ["vector_search"]}
+
+
+async def web_search(state: State):
+    raise RuntimeError("Tavily is down")
+
+
+@pytest.mark.asyncio
+async def test_graph_callback_times_every_node():
+    workflow = StateGraph(State)
+    workflow.add_node("vector_search", vector_search)
+    workflow.add_node("web_search", web_search)
+    workflow.set_entry_point("vector_search")
+    workflow.add_edge("vector_search", "web_search")
+    workflow.add_edge("web_search", END)
+    graph = workflow.compile()
+
+    before = observed_count(GRAPH_NODE_DURATION, "vector_search", "ok")
+    errors_before = observed_count(GRAPH_NODE_DURATION, "web_search", "error")
+
+    with pytest.raises(RuntimeError):
+        await graph.ainvoke({"steps": []}, config={"callbacks": [GraphMetricsCallback()]})
+
+    assert observed_count(GRAPH_NODE_DURATION, "vector_search", "ok") == before + 1
+    assert observed_count(GRAPH_NODE_DURATION, "web_search", "error") == errors_before + 1
+    assert observed_count(GRAPH_NODE_DURATION, "__start__", "ok") == 0
+
+
+def test_instrument_engine_times_statements():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    before = observed_count(EXTERNAL_CALL_DURATION, "postgres", "select", "ok")
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        with pytest.raises(Exception):
+            connection.execute(text("SELECT * FROM missing_table"))
+
+    assert observed_count(EXTERNAL_CALL_DURATION, "postgres", "select", "ok") == before + 1
+    assert observed_count(EXTERNAL_CALL_DURATION, "postgres", "select", "error") >= 1
@@ -0,0 +1,244 @@
+import json
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from langchain_core.documents import Document
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from backend.agent.graph import Steps
+from backend.agent.nodes import GraphNodes
+from backend.agent.reranker import LocalReranker
+from backend.schemas.chain import RetrievalGrades, SearchResult
+
+
+# Fixtures
+@pytest.fixture
+def resources():
+    return [
+        Document(page_content="Sony WH-1000XM5 has the best noise cancelling", metadata={"score": 10}),
+        Document(page_content="My cat likes cardboard boxes", metadata={"score": 5}),
+        Document(page_content="Bose QC45 are comfy for long flights", metadata={"score": 3}),
+    ]
+
+
+@pytest.fixture
+def state(resources):
+    return {
+        "prompt": "noise cancelling headphones",
+        "resources": list(resources),
+        "steps": [Steps.VECTOR_STORE_RETRIEVAL.value],
+    }
+
+
+def build_nodes(retrieval_grader=None, batch_retrieval_grader=None, grading_mode="sequential", reranker=None):
+    return GraphNodes(
+        llm=MagicMock(),
+        retriever=MagicMock(),
+        retrieval_grader=retrieval_grader or MagicMock(),
+        web_search_tool=MagicMock(),
+        batch_retrieval_grader=batch_retrieval_grader,
+        grading_mode=grading_mode,
+        reranker=reranker,
+    )
+
+
+# Test sequential grading
+@pytest.mark.asyncio
+async def test_grade_documents_sequential(state, resources):
+    retrieval_grader = MagicMock()
+    retrieval_grader.ainvoke = AsyncMock(side_effect=[{"score": "yes"}, {"score": "no"}, {"score": "Yes"}])
+    nodes = build_nodes(retrieval_grader=retrieval_grader)
+
+    result = await nodes.agrade_vector_store_documents(state)
+    assert result["resources"] == [resources[0], resources[2]]
+    assert result["perform_web_search"] is True
+    assert result["steps"][-1] == Steps.VECTOR_STORE_EVALUATION.value
+    assert retrieval_grader.ainvoke.await_count == 3
+
+
+# Test local reranker pre-filtering
+@pytest.mark.asyncio
+async def test_grade_documents_reranker_grades_only_ambiguous(state, resources):
+    resources[0].metadata["similarity"] = 0.8
+    resources[1].metadata["similarity"] = 0.1
+    resources[2].metadata["similarity"] = 0.5
+    retrieval_grader = MagicMock()
+    retrieval_grader.ainvoke = AsyncMock(side_effect=[{"score": "yes"}])
+    nodes = build_nodes(retrieval_grader=retrieval_grader, reranker=LocalReranker())
+
+    result = await nodes.agrade_vector_store_documents(state)
+    assert result["resources"] == [resources[0], resources[2]]
+    assert result["perform_web_search"] is True
+    retrieval_grader.ainvoke.assert_awaited_once()
+    assert retrieval_grader.ainvoke.call_args.args[0]["resources"] == resources[2]
+
+
+@pytest.mark.asyncio
+async def test_agrade_documents_reranker_skips_grader_when_all_decided(state, resources):
+    for resource in resources:
+        resource.metadata["similarity"] = 0.9
+    resources[1].metadata["similarity"] = 0.0
+    batch_retrieval_grader = AsyncMock()
+    nodes = build_nodes(batch_retrieval_grader=batch_retrieval_grader, grading_mode="batched",
+                        reranker=LocalReranker(accept_threshold=0.5))
+
+    result = await nodes.agrade_vector_store_documents(state)
+    assert result["resources"] == [resources[0], resources[2]]
+    batch_retrieval_grader.ainvoke.assert_not_called()
+
+
+# Test batched grading
+@pytest.mark.asyncio
+async def test_grade_documents_batched_single_call(state, resources):
+    retrieval_grader = MagicMock()
+    batch_retrieval_grader = MagicMock()
+    batch_retrieval_grader.ainvoke = AsyncMock(return_value=RetrievalGrades(scores=["yes", "no", "yes"]))
+    nodes = build_nodes(retrieval_grader, batch_retrieval_grader, grading_mode="batched")
+
+    result = await nodes.agrade_vector_store_documents(state)
+    assert result["resources"] == [resources[0], resources[2]]
+    assert result["perform_web_search"] is True
+    batch_retrieval_grader.ainvoke.assert_awaited_once()
+    assert batch_retrieval_grader.ainvoke.call_args.args[0]["count"] == 3
+    retrieval_grader.ainvoke.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_grade_documents_batched_all_relevant(state, resources):
+    batch_retrieval_grader = MagicMock()
+    batch_retrieval_grader.ainvoke = AsyncMock(return_value=RetrievalGrades(scores=["yes", "yes", "yes"]))
+    nodes = build_nodes(batch_retrieval_grader=batch_retrieval_grader, grading_mode="batched")
+
+    result = await nodes.agrade_vector_store_documents(state)
+    assert result["resources"] == resources
+    assert "perform_web_search" not in result
+    assert result["steps"] == [Steps.VECTOR_STORE_RETRIEVAL.value]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("batch_side_effect", [
+    Exception("LLM unavailable"),
+    [RetrievalGrades(scores=["yes"])],
+])
+async def test_grade_documents_batched_fallback(state, resources, batch_side_effect):
+    retrieval_grader = MagicMock()
+    retrieval_grader.abatch = AsyncMock(return_value=[{"score": "no"}, {"score": "yes"}, {"score": "yes"}])
+    batch_retrieval_grader = MagicMock()
+    batch_retrieval_grader.ainvoke = AsyncMock(side_effect=batch_side_effect)
+    nodes = build_nodes(retrieval_grader, batch_retrieval_grader, grading_mode="batched")
+
+    result = await nodes.agrade_vector_store_documents(state)
+    assert result["resources"] == [resources[1], resources[2]]
+    assert result["perform_web_search"] is True
+    assert len(retrieval_grader.abatch.call_args.args[0]) == 3
+
+
+# Test concurrent grading
+@pytest.mark.asyncio
+async def test_grade_documents_concurrent_keeps_order(state, resources):
+    retrieval_grader = MagicMock()
+    retrieval_grader.abatch = AsyncMock(return_value=[{"score": "no"}, {"score": "yes"}, {"score": "yes"}])
+    nodes = GraphNodes(
+        llm=MagicMock(), retriever=MagicMock(), retrieval_grader=retrieval_grader, web_search_tool=MagicMock(),
+        grading_mode="concurrent", grading_max_concurrency=2,
+    )
+
+    result = await nodes.agrade_vector_store_documents(state)
+    assert result["resources"] == [resources[1], resources[2]]
+    assert result["perform_web_search"] is True
+    inputs = retrieval_grader.abatch.call_args.args[0]
+    assert [i["resources"] for i in inputs] == resources
+    assert retrieval_grader.abatch.call_args.kwargs["config"] == {"max_concurrency": 2}
+    retrieval_grader.ainvoke.assert_not_called()
+
+
+# Test async grading
+@pytest.mark.asyncio
+async def test_agrade_documents_batched(state, resources):
+    batch_retrieval_grader = MagicMock()
+    batch_retrieval_grader.ainvoke = AsyncMock(return_value=RetrievalGrades(scores=["no", "yes", "no"]))
+    nodes = build_nodes(batch_retrieval_grader=batch_retrieval_grader, grading_mode="batched")
+
+    result = await nodes.agrade_vector_store_documents(state)
+    assert result["resources"] == [resources[1]]
+    assert result["perform_web_search"] is True
+    batch_retrieval_grader.ainvoke.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_agrade_documents_concurrent(state, resources):
+    retrieval_grader = MagicMock()
+    retrieval_grader.abatch = AsyncMock(return_value=[{"score": "yes"}, {"score": "yes"}, {"score": "yes"}])
+    nodes = build_nodes(retrieval_grader=retrieval_grader, grading_mode="concurrent")
+
+    result = await nodes.agrade_vector_store_documents(state)
+    assert result["resources"] == resources
+    assert "perform_web_search" not in result
+    retrieval_grader.abatch.assert_awaited_once()
+
+
+# Test async web search
+@pytest.mark.asyncio
+async def test_aweb_search(state):
+    web_search_tool = MagicMock()
+    web_search_tool.ainvoke = AsyncMock(return_value=[{"content": "Result 1"}, {"content": "Result 2"}])
+    nodes = GraphNodes(llm=MagicMock(), retriever=MagicMock(), retrieval_grader=MagicMock(),
+                       web_search_tool=web_search_tool)
+
+    result = await nodes.aweb_search(state)
+    assert result["resources"] == ["Result 1", "Result 2"]
+    assert result["steps"][-1] == Steps.WEB_SEARCH_RETRIEVAL.value
+    web_search_tool.ainvoke.assert_awaited_once_with({"query": state["prompt"]})
+
+
+# Test speculative web search
+@pytest.fixture
+def speculative_nodes(resources):
+    retriever = MagicMock()
+    retriever.asim_search = AsyncMock(return_value=list(resources))
+    web_search_tool = MagicMock()
+    web_search_tool.ainvoke = AsyncMock(return_value=[{"content": "Web result"}])
+    return GraphNodes(llm=MagicMock(), retriever=retriever, retrieval_grader=MagicMock(),
+                      web_search_tool=web_search_tool, speculative_web_search=True)
+
+
+@pytest.mark.asyncio
+async def test_speculative_web_search_is_reused(speculative_nodes):
+    state = await speculative_nodes.avector_store_retrieve({"prompt": "headphones", "category": "headphones"})
+    assert state["web_search_task"] is not None
+
+    result = await speculative_nodes.aweb_search(state)
+    assert result["resources"] == ["Web result"]
+    assert result["web_search_task"] is None
+    speculative_nodes.web_search_tool.ainvoke.assert_awaited_once_with({"query": "headphones"})
+
+
+@pytest.mark.asyncio
+async def test_speculative_web_search_is_discarded(speculative_nodes):
+    state = await speculative_nodes.avector_store_retrieve({"prompt": "headphones", "category": "headphones"})
+    task = state["web_search_task"]
+
+    speculative_nodes._discard_speculative_web_search(state)
+    assert task.cancelled() or task.cancelling()
+    assert state["web_search_task"] is None
+
+
+# Test streamed generation
+@pytest.mark.asyncio
+async def test_agenerate_streams_search_result(state):
+    generation = {
+        "products": [{"product_name": "Sony WH-1000XM5", "reason_for_recommendation": "Best noise cancelling"}],
+        "reasoning_summary": "Most recommended",
+    }
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content=f"```json\n{json.dumps(generation)}\n```")]))
+    nodes = GraphNodes(llm=llm, retriever=MagicMock(), retrieval_grader=MagicMock(), web_search_tool=MagicMock())
+    state["chat_session_id"] = 1
+
+    with patch("backend.agent.nodes.persist_chat_turn") as mock_persist_chat_turn:
+        result = await nodes.agenerate(state)
+
+    assert result["generation"] == SearchResult.model_validate(generation)
+    assert result["steps"][-1] == Steps.LLM_GENERATION.value
+    mock_persist_chat_turn.assert_called_once()
+    assert mock_persist_chat_turn.call_args.kwargs["prompt"] == state["prompt"]
@@ -0,0 +1,140 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from starlette.background import BackgroundTask
+
+from backend.services.auth_bearer import get_current_user_id
+from backend.services.rate_limit import MemoryRateLimitStore, RateLimiter, RateLimitLease, limit_search_requests
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def build_limiter(clock: FakeClock, requests_per_minute: int = 6, burst: int = 2,
+                  max_in_flight: int = 5) -> RateLimiter:
+    return RateLimiter(MemoryRateLimitStore(clock=clock), name="search", requests_per_minute=requests_per_minute,
+                       burst=burst, max_in_flight=max_in_flight)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_allows_bursts_then_refills():
+    clock = FakeClock()
+    limiter = build_limiter(clock)
+
+    for _ in range(2):
+        await (await limiter.acquire(1)).release()
+    with pytest.raises(HTTPException) as exc_info:
+        await limiter.acquire(1)
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers["Retry-After"] == "10"
+
+    # Other users have their own bucket
+    await (await limiter.acquire(2)).release()
+
+    clock.now = 10
+    await (await limiter.acquire(1)).release()
+    assert limiter.rejected == 1
+
+
+@pytest.mark.asyncio
+async def test_in_flight_cap():
+    limiter = build_limiter(FakeClock(), requests_per_minute=600, burst=10, max_in_flight=2)
+
+    leases = [await limiter.acquire(1), await limiter.acquire(1)]
+    with pytest.raises(HTTPException) as exc_info:
+        await limiter.acquire(1)
+    assert exc_info.value.headers["Retry-After"] == "5"
+
+    await leases[0].release()
+    await leases[0].release()  # Releasing twice frees one slot only
+    await limiter.acquire(1)
+    with pytest.raises(HTTPException):
+        await limiter.acquire(1)
+
+
+@pytest.mark.asyncio
+async def test_rejected_by_rate_does_not_hold_a_slot():
+    limiter = build_limiter(FakeClock(), burst=1, max_in_flight=1)
+
+    lease = await limiter.acquire(1)
+    await lease.release()
+    with pytest.raises(HTTPException):
+        await limiter.acquire(1)
+    assert limiter.store._in_flight == {}
+
+
+@pytest.mark.asyncio
+async def test_lease_held_until_stream_ends():
+    limiter = build_limiter(FakeClock(), max_in_flight=1)
+    lease = await limiter.acquire(1)
+
+    async def stream():
+        yield "event: step\n\n"
+        yield "event: result\n\n"
+
+    chunks = lease.hold_until_done(stream())
+    assert lease.held
+    assert await chunks.__anext__() == "event: step\n\n"
+    assert limiter.store._in_flight == {"search:1": [0.0]}
+    assert [chunk async for chunk in chunks] == ["event: result\n\n"]
+    assert limiter.store._in_flight == {}
+
+
+@pytest.mark.asyncio
+async def test_lease_released_by_background_task_when_stream_never_started():
+    limiter = build_limiter(FakeClock(), max_in_flight=1)
+    lease = await limiter.acquire(1)
+
+    async def stream():
+        yield "event: result\n\n"
+
+    lease.hold_until_done(stream())  # Cancelled before the first chunk was requested
+    await BackgroundTask(lease.release)()
+
+    assert limiter.store._in_flight == {}
+    await limiter.acquire(1)
+
+
+@pytest.mark.asyncio
+async def test_unreleased_slots_expire():
+    clock = FakeClock()
+    limiter = RateLimiter(MemoryRateLimitStore(in_flight_ttl_seconds=60, clock=clock), name="search",
+                          requests_per_minute=600, burst=10, max_in_flight=1)
+
+    await limiter.acquire(1)  # Never released
+    with pytest.raises(HTTPException):
+        await limiter.acquire(1)
+
+    clock.now = 60
+    await limiter.acquire(1)
+
+
+@pytest.mark.asyncio
+async def test_store_failure_lets_requests_through():
+    limiter = build_limiter(FakeClock())
+    limiter.store.acquire_slot = AsyncMock(side_effect=ConnectionError("redis is down"))
+
+    assert isinstance(await limiter.acquire(1), RateLimitLease)
+
+
+def test_dependency_returns_429_with_retry_after():
+    app = FastAPI()
+
+    @app.post("/search/initial")
+    async def initial_search(lease: RateLimitLease = Depends(limit_search_requests)):
+        return {"ok": True}
+
+    app.dependency_overrides[get_current_user_id] = lambda: 1
+    with patch("backend.services.rate_limit.search_rate_limiter", build_limiter(FakeClock(), burst=1)):
+        client = TestClient(app)
+        assert client.post("/search/initial").status_code == 200
+        response = client.post("/search/initial")
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "10"
@@ -0,0 +1,34 @@
+import pytest
+from langchain_core.documents import Document
+
+from backend.agent.reranker import LocalReranker
+
+
+# Fixtures
+@pytest.fixture
+def reranker():
+    return LocalReranker(accept_threshold=0.7, reject_threshold=0.25, similarity_weight=0.5)
+
+
+def test_score_uses_prompt_term_coverage(reranker):
+    assert reranker.score("best wh-1000xm5 headphones", "The WH-1000XM5 headphones are great") == 1.0
+    assert reranker.score("best wh-1000xm5 headphones", "My cat likes boxes") == 0.0
+
+
+def test_score_blends_similarity(reranker):
+    doc = Document(page_content="headphones", metadata={"similarity": 0.6})
+
+    assert reranker.score("sony headphones", doc) == pytest.approx(0.5 * 0.6 + 0.5 * 0.5)
+
+
+def test_verdicts_leave_ambiguous_documents_undecided(reranker):
+    docs = [
+        Document(page_content="Sony WH-1000XM5 noise cancelling", metadata={"similarity": 0.8}),
+        Document(page_content="Cardboard boxes", metadata={"similarity": 0.1}),
+        Document(page_content="Bose QC45 travel", metadata={"similarity": 0.6}),
+    ]
+
+    assert reranker.verdicts("sony noise cancelling", docs) == [True, False, None]
+    assert reranker.score("sony noise cancelling", docs[1]) == pytest.approx(0.05)
+    # Retrieved documents may be shared with other requests, so they are left untouched
+    assert all("rerank_score" not in doc.metadata for doc in docs)
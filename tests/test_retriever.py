@@ -0,0 +1,156 @@
+import pickle
+import pytest
+from unittest.mock import MagicMock, patch
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from backend.agent.embedding_cache import CachedEmbeddings, EmbeddingCache
+from backend.agent.keyword_index import KeywordIndexes
+from backend.agent.vector_store import Retriever, load_reddit_post_documents
+from backend.metrics import EXTERNAL_CALL_DURATION
+
+
+# Fixtures
+@pytest.fixture
+def embeddings():
+    fake_embeddings = DeterministicFakeEmbedding(size=8)
+    return CachedEmbeddings(MagicMock(wraps=fake_embeddings), model="fake", cache=EmbeddingCache(max_entries=2))
+
+
+@pytest.fixture
+def vector_store():
+    store = MagicMock()
+    store.similarity_search_by_vector_with_score.return_value = [
+        (Document(page_content="low upvotes", metadata={"score": 1}), 0.9),
+        (Document(page_content="high upvotes", metadata={"score": 50}), 0.7),
+    ]
+    return store
+
+
+# Test EmbeddingCache
+def test_embedding_cache_normalizes_text(embeddings):
+    first = embeddings.embed_query("Best  noise cancelling headphones")
+    second = embeddings.embed_query("best noise cancelling headphones ")
+
+    assert first == second
+    assert embeddings.embeddings.embed_query.call_count == 1
+    assert embeddings.cache.hits == 1
+
+
+def test_embedding_cache_hits_are_not_timed_as_openai_calls(embeddings):
+    def timed_calls():
+        series = EXTERNAL_CALL_DURATION._series.get(("openai", "embed_query", "ok"))
+        return series[2] if series is not None else 0
+
+    before = timed_calls()
+    embeddings.embed_query("headphones")
+    embeddings.embed_query("headphones")
+
+    assert timed_calls() == before + 1
+
+
+def test_embedding_cache_is_bounded(embeddings):
+    for prompt in ["first", "second", "third"]:
+        embeddings.embed_query(prompt)
+
+    assert len(embeddings.cache) == 2
+    embeddings.embed_query("first")
+    assert embeddings.embeddings.embed_query.call_count == 4
+
+
+def test_embedding_cache_persistence(tmp_path):
+    path = str(tmp_path / "embeddings.pkl")
+    cache = EmbeddingCache(path=path)
+    cache.put("fake", "headphones", [0.1, 0.2])
+    cache.save()
+
+    restored = EmbeddingCache(path=path)
+    restored.load()
+    assert restored.get("fake", "Headphones") == [0.1, 0.2]
+    assert [p.name for p in tmp_path.iterdir()] == ["embeddings.pkl"]
+
+
+@pytest.mark.parametrize("content", [b"", b"not a pickle", pickle.dumps(["not", "a", "mapping"])])
+def test_corrupt_embedding_cache_loads_cold(tmp_path, content):
+    path = tmp_path / "embeddings.pkl"
+    path.write_bytes(content)
+    cache = EmbeddingCache(path=str(path))
+    cache.load()
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_cached_embeddings_async(embeddings):
+    embedding = await embeddings.aembed_query("headphones")
+
+    assert embedding == embeddings.embed_query("headphones")
+    assert embeddings.cache.hits == 1
+
+
+# Test Retriever
+@pytest.mark.asyncio
+async def test_sim_search_uses_cached_query_vector(embeddings, vector_store):
+    retriever = Retriever(vector_store=vector_store, embeddings=embeddings)
+
+    await retriever.asim_search("headphones", "headphones")
+    docs = await retriever.asim_search("headphones", "headphones")
+
+    assert [d.page_content for d in docs] == ["high upvotes", "low upvotes"]
+    assert docs[0].metadata["similarity"] == 0.7
+    assert embeddings.embeddings.aembed_query.call_count == 1
+    vector_store.similarity_search.assert_not_called()
+    assert vector_store.similarity_search_by_vector_with_score.call_args.kwargs["namespace"] == "headphones"
+
+
+@pytest.mark.asyncio
+async def test_hybrid_search_fuses_keyword_matches(embeddings, vector_store):
+    keyword_indexes = MagicMock()
+    keyword_indexes.search.return_value = [
+        (Document(page_content="exact model name", metadata={"id": "x", "score": 5}), 3.2),
+        (Document(page_content="high upvotes", metadata={"score": 50}), 1.1),
+    ]
+    retriever = Retriever(vector_store=vector_store, embeddings=embeddings, keyword_indexes=keyword_indexes,
+                          retrieval_mode="hybrid", k=3)
+
+    docs = await retriever.asim_search("wh-1000xm5", "headphones")
+
+    # Fused results are deduplicated and then reranked by upvotes
+    assert [d.page_content for d in docs] == ["high upvotes", "exact model name", "low upvotes"]
+    # "high upvotes" is ranked by both retrievers
+    assert docs[0].metadata["rrf_score"] > max(d.metadata["rrf_score"] for d in docs[1:])
+    assert vector_store.similarity_search_by_vector_with_score.call_args.kwargs["k"] == 12
+
+
+@pytest.mark.asyncio
+async def test_hybrid_search_falls_back_to_dense(embeddings, vector_store):
+    keyword_indexes = MagicMock()
+    keyword_indexes.search.side_effect = ValueError("Failed to connect to database")
+    retriever = Retriever(vector_store=vector_store, embeddings=embeddings, keyword_indexes=keyword_indexes,
+                          retrieval_mode="hybrid")
+
+    docs = await retriever.asim_search("headphones", "headphones")
+
+    assert [d.page_content for d in docs] == ["high upvotes", "low upvotes"]
+
+
+@pytest.mark.asyncio
+async def test_hybrid_search_ranks_reddit_posts_without_a_score(embeddings, vector_store):
+    post = MagicMock(id="p1", title="Sony WH-1000XM5 review", body=None, author="someone", subreddit="headphones",
+                     score=None, created="2024-12-01", s3_url=None, namespace="headphones", comments=None)
+    retriever = Retriever(vector_store=vector_store, embeddings=embeddings, retrieval_mode="hybrid",
+                          keyword_indexes=KeywordIndexes(loader=load_reddit_post_documents))
+
+    with patch("backend.agent.vector_store.fetch_reddit_posts_by_namespace", return_value=[post]):
+        docs = await retriever.asim_search("wh-1000xm5", "headphones")
+
+    assert [d.page_content for d in docs][:2] == ["high upvotes", "low upvotes"]
+    assert docs[-1].metadata["score"] == 0
+
+
+@pytest.mark.asyncio
+async def test_euclidean_scores_converted_to_cosine(embeddings, vector_store):
+    retriever = Retriever(vector_store=vector_store, embeddings=embeddings, distance_metric="euclidean")
+
+    docs = await retriever.asim_search("headphones", "headphones")
+
+    assert docs[0].metadata["similarity"] == pytest.approx(1 - 0.7 / 2)
@@ -1,22 +1,38 @@
+import asyncio
+import json
+
+import httpx
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
+from backend.agent.usage import TokenUsageTracker
 from backend.schemas.search import InitialSearchResponse
 from backend.services.search import (
     process_initial_search_query,
     fetch_google_shopping_results,
     extract_product_details,
+    stream_initial_search_query,
+    get_chat_history_for_user,
+    search_product_listings_batch,
+    ChatSessionNotFoundError,
 )
 
 # Fixtures
 @pytest.fixture
 def mock_agent_workflow():
-    with patch("backend.agent.agent_workflow.invoke", return_value={
+    with patch("backend.agent.agent_workflow.ainvoke", new_callable=AsyncMock, return_value={
         "generation": "Generated response",
         "steps": ["Step 1", "Step 2"],
         "perform_web_search": True,
     }) as mock:
         yield mock
 
+@pytest.fixture(autouse=True)
+def owned_chat_session():
+    # Chat sessions passed to the search functions belong to user 1
+    with patch("backend.services.search.fetch_chat_session_by_id", new_callable=AsyncMock,
+               return_value=MagicMock(user_id=1)) as mock:
+        yield mock
+
 @pytest.fixture
 def google_shopping_response():
     return {
@@ -53,3 +69,242 @@ def test_extract_product_details(google_shopping_response):
 def test_extract_product_details_invalid():
     products = extract_product_details({})
     assert products == []
+
+
+# Test stream_initial_search_query
+@pytest.mark.asyncio
+async def test_stream_initial_search_query():
+    final_state = {
+        "prompt": "noise cancelling headphones",
+        "steps": ["vector_store_retrieval", "llm_generation"],
+        "generation": {"products": [{"product_name": "Sony WH-1000XM5", "reason_for_recommendation": "ANC"}],
+                       "reasoning_summary": "Summary"},
+    }
+    events = [
+        {"event": "on_chain_end", "name": "vector_search", "metadata": {"langgraph_node": "vector_search"},
+         "parent_ids": ["root"], "data": {"output": {"steps": ["vector_store_retrieval"]}}},
+        {"event": "on_custom_event", "name": "product", "metadata": {}, "parent_ids": ["root"],
+         "data": {"product_name": "Sony WH-1000XM5", "reason_for_recommendation": "ANC"}},
+        {"event": "on_chain_end", "name": "generate", "metadata": {"langgraph_node": "generate"},
+         "parent_ids": ["root"], "data": {"output": final_state}},
+        {"event": "on_chain_end", "name": "LangGraph", "metadata": {}, "parent_ids": [],
+         "data": {"output": final_state}},
+    ]
+
+    async def astream_events(*args, **kwargs):
+        for event in events:
+            yield event
+
+    with patch("backend.services.search.agent_workflow") as mock_workflow, \
+            patch("backend.services.search.conversation_memory", None):
+        mock_workflow.astream_events = astream_events
+        chunks = [chunk async for chunk in stream_initial_search_query("gpt-4o-mini", "noise cancelling headphones",
+                                                                       "headphones", 1, 1)]
+
+    assert [chunk.split("\n")[0] for chunk in chunks] == [
+        "event: step", "event: product", "event: step", "event: result",
+    ]
+    assert '"step": "llm_generation"' in chunks[2]
+    assert '"chat_session_id": 1' in chunks[3]
+
+
+# Test that follow-ups are condensed with the conversation memory before running the graph
+@pytest.mark.asyncio
+async def test_process_initial_search_query_condenses_follow_up():
+    final_state = {
+        "steps": ["llm_generation"],
+        "generation": {"products": [{"product_name": "Sony WH-1000XM5", "reason_for_recommendation": "ANC"}],
+                       "reasoning_summary": "Summary"},
+    }
+    memory = MagicMock()
+    memory.load = AsyncMock()
+    memory.condense = AsyncMock(return_value="noise cancelling headphones under $200")
+    with patch("backend.services.search.agent_workflow") as mock_workflow, \
+            patch("backend.services.search.conversation_memory", memory):
+        mock_workflow.ainvoke = AsyncMock(return_value=final_state)
+        response = await process_initial_search_query("gpt-4o-mini", "anything under $200?", "headphones", 7, 1)
+
+    graph_input = mock_workflow.ainvoke.call_args.args[0]
+    assert graph_input["prompt"] == "anything under $200?"
+    assert graph_input["query"] == "noise cancelling headphones under $200"
+    memory.load.assert_awaited_once_with(7)
+
+
+# Test that another user's chat session is rejected before its conversation is loaded
+@pytest.mark.asyncio
+async def test_process_initial_search_query_rejects_other_users_chat_session():
+    memory = MagicMock()
+    memory.load = AsyncMock()
+    with patch("backend.services.search.fetch_chat_session_by_id", new_callable=AsyncMock,
+               return_value=MagicMock(user_id=2)), \
+            patch("backend.services.search.agent_workflow") as mock_workflow, \
+            patch("backend.services.search.conversation_memory", memory):
+        mock_workflow.ainvoke = AsyncMock()
+        with pytest.raises(ChatSessionNotFoundError):
+            await process_initial_search_query("gpt-4o-mini", "anything under $200?", "headphones", 7, 1)
+
+    memory.load.assert_not_awaited()
+    mock_workflow.ainvoke.assert_not_awaited()
+
+
+# Test that the token usage of the graph run is attached to the response and stored
+@pytest.mark.asyncio
+async def test_process_initial_search_query_reports_token_usage():
+    final_state = {
+        "steps": ["llm_generation"],
+        "generation": {"products": [{"product_name": "Sony WH-1000XM5", "reason_for_recommendation": "ANC"}],
+                       "reasoning_summary": "Summary"},
+    }
+
+    async def ainvoke(graph_input, config):
+        tracker = next(callback for callback in config["callbacks"] if isinstance(callback, TokenUsageTracker))
+        tracker.record("vector_search_evaluate", "gpt-4o-mini", 900, 30)
+        tracker.record("generate", "gpt-4o-mini", 1500, 300)
+        return final_state
+
+    with patch("backend.services.search.agent_workflow") as mock_workflow, \
+            patch("backend.services.search.conversation_memory", None), \
+            patch("backend.services.search.record_token_usage", new_callable=AsyncMock) as mock_record:
+        mock_workflow.ainvoke = ainvoke
+        response = await process_initial_search_query("gpt-4o-mini", "headphones", "headphones", 7, 1)
+        await asyncio.sleep(0)  # Stored in the background
+
+    assert (response.token_usage.prompt_tokens, response.token_usage.completion_tokens) == (2400, 330)
+    assert [usage.node for usage in response.token_usage.by_node] == ["generate", "vector_search_evaluate"]
+    assert mock_record.call_args.kwargs["user_id"] == 1
+    assert mock_record.call_args.kwargs["chat_session_id"] == 7
+    assert mock_record.call_args.kwargs["usage"][0]["prompt_tokens"] == 1500
+
+
+# Test that the token usage is stored even when the client disconnects once it received the result
+@pytest.mark.asyncio
+async def test_stream_initial_search_query_stores_token_usage_of_disconnected_clients():
+    final_state = {
+        "steps": ["llm_generation"],
+        "generation": {"products": [{"product_name": "Sony WH-1000XM5", "reason_for_recommendation": "ANC"}],
+                       "reasoning_summary": "Summary"},
+    }
+
+    async def astream_events(graph_input, config, version):
+        tracker = next(callback for callback in config["callbacks"] if isinstance(callback, TokenUsageTracker))
+        tracker.record("generate", "gpt-4o-mini", 1500, 300)
+        yield {"event": "on_chain_end", "name": "LangGraph", "metadata": {}, "parent_ids": [],
+               "data": {"output": final_state}}
+
+    with patch("backend.services.search.agent_workflow") as mock_workflow, \
+            patch("backend.services.search.conversation_memory", None), \
+            patch("backend.services.search.record_token_usage", new_callable=AsyncMock) as mock_record:
+        mock_workflow.astream_events = astream_events
+        stream = stream_initial_search_query("gpt-4o-mini", "headphones", "headphones", 7, 1)
+        assert (await anext(stream)).startswith("event: result")
+        await stream.aclose()
+        await asyncio.sleep(0)
+
+    assert mock_record.call_args.kwargs["usage"][0]["node"] == "generate"
+
+
+@pytest.mark.asyncio
+async def test_get_chat_history_for_other_user():
+    with patch("backend.services.search.fetch_chat_session_by_id", new_callable=AsyncMock) as mock_fetch_session, \
+            patch("backend.services.search.fetch_messages_page", new_callable=AsyncMock) as mock_fetch_page:
+        mock_fetch_session.return_value = MagicMock(user_id=2)
+
+        assert await get_chat_history_for_user(1, 7, None, 50) is None
+        mock_fetch_page.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_chat_history_for_user():
+    references = ["Sony WH-1000XM5: great ANC, comfortable, pricey", "Bose QC45"]
+    message = MagicMock(id=3, sender="system", content="{}", ref=json.dumps(references), tools_used="vector_search",
+                        timestamp="2024-12-01T10:00:00")
+    with patch("backend.services.search.fetch_chat_session_by_id", new_callable=AsyncMock,
+               return_value=MagicMock(user_id=1)), \
+            patch("backend.services.search.fetch_messages_page", new_callable=AsyncMock, return_value=([message], 3)):
+        history = await get_chat_history_for_user(1, 7, None, 1)
+
+    assert history.next_cursor == 3
+    assert history.messages[0].references == references
+    assert history.messages[0].tools_used == ["vector_search"]
+
+
+@pytest.mark.asyncio
+async def test_get_chat_history_keeps_legacy_references_whole():
+    message = MagicMock(id=3, sender="system", content="{}", ref="Great ANC, comfortable", tools_used="",
+                        timestamp="2024-12-01T10:00:00")
+    with patch("backend.services.search.fetch_messages_page", new_callable=AsyncMock, return_value=([message], None)):
+        history = await get_chat_history_for_user(1, 7, None, 1)
+
+    assert history.messages[0].references == ["Great ANC, comfortable"]
+
+
+# Test that a batch of product listing lookups runs concurrently and reports failures per query
+@pytest.mark.asyncio
+async def test_search_product_listings_batch(google_shopping_response):
+    running, max_running = 0, 0
+
+    async def fetch(search_term):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if search_term == "Bose QC45":
+            raise httpx.ConnectError("Oxylabs is down")
+        return google_shopping_response
+
+    with patch("backend.services.search.fetch_google_shopping_results", side_effect=fetch), \
+            patch("backend.services.search.listing_cache", None), \
+            patch("backend.services.search.settings.PRODUCT_LISTING_BATCH_CONCURRENCY", 2):
+        results = await search_product_listings_batch(["Sony WH-1000XM5", "Bose QC45", "AirPods Max"])
+
+    assert [result.query for result in results] == ["Sony WH-1000XM5", "Bose QC45", "AirPods Max"]
+    assert results[0].products[0].title == "Test Product"
+    assert results[1].products == [] and results[1].error == "Error fetching data from API"
+    assert results[2].error is None
+    assert max_running == 2
+
+
+# Test that include_listings starts the listing lookups from the product events and attaches them to the response
+@pytest.mark.asyncio
+async def test_stream_initial_search_query_with_listings():
+    final_state = {
+        "steps": ["llm_generation"],
+        "generation": {"products": [{"product_name": "Sony WH-1000XM5", "reason_for_recommendation": "ANC"},
+                                    {"product_name": "Bose QC45", "reason_for_recommendation": "Comfort"}],
+                       "reasoning_summary": "Summary"},
+    }
+    events = [
+        {"event": "on_custom_event", "name": "product", "metadata": {}, "parent_ids": ["root"],
+         "data": {"product_name": "Sony WH-1000XM5", "reason_for_recommendation": "ANC"}},
+        {"event": "on_custom_event", "name": "product", "metadata": {}, "parent_ids": ["root"],
+         "data": {"product_name": "Bose QC45", "reason_for_recommendation": "Comfort"}},
+        {"event": "on_chain_end", "name": "LangGraph", "metadata": {}, "parent_ids": [],
+         "data": {"output": final_state}},
+    ]
+    started = []
+
+    async def astream_events(*args, **kwargs):
+        for event in events:
+            yield event
+            await asyncio.sleep(0)
+        # Both lookups are running before the graph finishes
+        assert started == ["Sony WH-1000XM5", "Bose QC45"]
+
+    async def listings(search_term):
+        started.append(search_term)
+        return [{"title": search_term, "price": "$299.99", "product_url": "#", "merchant_name": "Best Buy"}]
+
+    with patch("backend.services.search.agent_workflow") as mock_workflow, \
+            patch("backend.services.search.conversation_memory", None), \
+            patch("backend.services.search.search_product_listings", side_effect=listings):
+        mock_workflow.astream_events = astream_events
+        chunks = [chunk async for chunk in stream_initial_search_query(
+            "gpt-4o-mini", "noise cancelling headphones", "headphones", 1, 1, include_listings=True)]
+
+    assert [chunk.split("\n")[0] for chunk in chunks] == [
+        "event: product", "event: product", "event: listings", "event: listings", "event: result",
+    ]
+    result = json.loads(chunks[-1].split("data: ", 1)[1])
+    assert [listing["query"] for listing in result["product_listings"]] == ["Sony WH-1000XM5", "Bose QC45"]
+    assert result["product_listings"][1]["products"][0]["merchant_name"] == "Best Buy"
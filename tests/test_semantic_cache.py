@@ -0,0 +1,70 @@
+import pytest
+
+from backend.agent.semantic_cache import SemanticCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# Fixtures
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cache(clock):
+    return SemanticCache(similarity_threshold=0.9, max_entries=2, ttl_seconds=60, clock=clock)
+
+
+def test_lookup_hit_for_similar_prompt(cache):
+    cache.store("headphones", [1.0, 0.0, 0.0], "cached result")
+
+    assert cache.lookup("headphones", [0.95, 0.05, 0.0]) == "cached result"
+    assert cache.stats()["hits"] == 1
+
+
+def test_lookup_miss_below_threshold(cache):
+    cache.store("headphones", [1.0, 0.0, 0.0], "cached result")
+
+    assert cache.lookup("headphones", [0.5, 0.5, 0.0]) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_lookup_returns_nearest_prompt(cache):
+    cache.store("headphones", [1.0, 0.0, 0.0], "first")
+    cache.store("headphones", [0.0, 1.0, 0.0], "second")
+
+    assert cache.lookup("headphones", [0.1, 1.0, 0.0]) == "second"
+
+
+def test_namespaces_are_isolated(cache):
+    cache.store("headphones", [1.0, 0.0, 0.0], "headphones result")
+
+    assert cache.lookup("sneakers", [1.0, 0.0, 0.0]) is None
+
+
+def test_entries_expire(cache, clock):
+    cache.store("headphones", [1.0, 0.0, 0.0], "cached result")
+    clock.now = 61
+
+    assert cache.lookup("headphones", [1.0, 0.0, 0.0]) is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    cache.store("headphones", [1.0, 0.0, 0.0], "first")
+    cache.store("headphones", [0.0, 1.0, 0.0], "second")
+    assert cache.lookup("headphones", [1.0, 0.0, 0.0]) == "first"
+
+    cache.store("headphones", [0.0, 0.0, 1.0], "third")
+
+    assert cache.lookup("headphones", [0.0, 1.0, 0.0]) is None
+    assert cache.lookup("headphones", [1.0, 0.0, 0.0]) == "first"
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,112 @@
+import pytest
+from typing import TypedDict
+from unittest.mock import patch
+from langchain_core.embeddings import FakeEmbeddings
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import END, StateGraph
+
+from backend.agent.embedding_cache import CachedEmbeddings, EmbeddingCache
+from backend.agent.memory import Conversation, ConversationMemory, ConversationTurn
+from backend.agent.usage import TokenUsageTracker, token_cost, usage_config
+
+
+class State(TypedDict):
+    prompt: str
+    answer: str
+
+
+def test_token_cost_matches_model_snapshots():
+    assert token_cost("gpt-4o-mini-2024-07-18", 1_000_000, 1_000_000) == pytest.approx(0.75)
+    assert token_cost("gpt-4o-2024-08-06", 1_000_000, 0) == pytest.approx(2.5)
+    assert token_cost("unknown-model", 1000, 1000) == 0.0
+
+
+def test_tracker_aggregates_per_node_and_model():
+    tracker = TokenUsageTracker()
+    tracker.record("vector_search_evaluate", "gpt-4o-mini", 1000, 10)
+    tracker.record("vector_search_evaluate", "gpt-4o-mini", 500, 5)
+    tracker.record("generate", "gpt-4o-mini", 2000, 400)
+
+    generation, grading = tracker.records()
+    assert (grading.node, grading.calls, grading.prompt_tokens, grading.completion_tokens) == \
+        ("vector_search_evaluate", 2, 1500, 15)
+    assert generation.cost_usd == pytest.approx(token_cost("gpt-4o-mini", 2000, 400))
+
+
+@pytest.mark.asyncio
+async def test_tracker_records_llm_and_embedding_usage_of_graph_nodes():
+    llm = GenericFakeChatModel(messages=iter([
+        AIMessage(content="Sony WH-1000XM5", usage_metadata={"input_tokens": 120, "output_tokens": 8,
+                                                             "total_tokens": 128}),
+    ]))
+    embeddings = CachedEmbeddings(FakeEmbeddings(size=4), model="text-embedding-3-small", cache=EmbeddingCache())
+
+    async def vector_search(state: State):
+        await embeddings.aembed_query(state["prompt"])
+        await embeddings.aembed_query(state["prompt"])  # Served from the cache
+        return state
+
+    async def generate(state: State):
+        return {"answer": (await llm.ainvoke(state["prompt"])).content}
+
+    workflow = StateGraph(State)
+    workflow.add_node("vector_search", vector_search)
+    workflow.add_node("generate", generate)
+    workflow.set_entry_point("vector_search")
+    workflow.add_edge("vector_search", "generate")
+    workflow.add_edge("generate", END)
+
+    tracker = TokenUsageTracker()
+    with patch("backend.agent.usage._encoding", return_value=None):
+        await workflow.compile().ainvoke({"prompt": "noise cancelling headphones"}, config={"callbacks": [tracker]})
+
+    records = {record.node: record for record in tracker.records()}
+    assert set(records) == {"vector_search", "generate"}
+    assert (records["generate"].calls, records["generate"].prompt_tokens, records["generate"].completion_tokens) == \
+        (1, 120, 8)
+    assert (records["vector_search"].model, records["vector_search"].calls,
+            records["vector_search"].prompt_tokens) == ("text-embedding-3-small", 1, 7)
+
+
+@pytest.mark.asyncio
+async def test_cached_embeddings_outside_a_run_are_not_reported():
+    embeddings = CachedEmbeddings(FakeEmbeddings(size=4), model="text-embedding-3-small", cache=EmbeddingCache())
+
+    assert len(await embeddings.aembed_query("headphones")) == 4
+    assert len(embeddings.embed_query("speakers")) == 4
+
+
+@pytest.mark.asyncio
+async def test_usage_config_attributes_calls_outside_the_graph():
+    llm = GenericFakeChatModel(messages=iter([
+        AIMessage(content="noise cancelling headphones under $200",
+                  usage_metadata={"input_tokens": 80, "output_tokens": 9, "total_tokens": 89}),
+    ]))
+    memory = ConversationMemory(llm=llm)
+    embeddings = CachedEmbeddings(FakeEmbeddings(size=4), model="text-embedding-3-small", cache=EmbeddingCache())
+    tracker = TokenUsageTracker()
+
+    conversation = Conversation(turns=[ConversationTurn("noise cancelling headphones", "Recommended: Sony.")])
+    query = await memory.condense(conversation, "anything under $200?", config=usage_config(tracker, "condense_query"))
+    with patch("backend.agent.usage._encoding", return_value=None):
+        await RunnableLambda(embeddings.aembed_query).ainvoke(query, config=usage_config(tracker, "semantic_cache"))
+
+    records = {record.node: record for record in tracker.records()}
+    assert (records["condense_query"].prompt_tokens, records["condense_query"].completion_tokens) == (80, 9)
+    assert (records["semantic_cache"].model, records["semantic_cache"].prompt_tokens) == ("text-embedding-3-small", 10)
+
+
+@pytest.mark.asyncio
+async def test_embedding_tokens_are_counted_before_reaching_the_inline_tracker():
+    embeddings = CachedEmbeddings(FakeEmbeddings(size=4), model="text-embedding-3-small", cache=EmbeddingCache())
+    tracker = TokenUsageTracker()
+
+    with patch("backend.agent.embedding_cache.count_tokens", return_value=5) as counted, \
+            patch("backend.agent.usage.count_tokens") as counted_inline:
+        await RunnableLambda(embeddings.aembed_query).ainvoke("headphones", config=usage_config(tracker, "search"))
+
+    counted.assert_called_once_with("text-embedding-3-small", ["headphones"])
+    counted_inline.assert_not_called()
+    assert tracker.records()[0].prompt_tokens == 5
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from backend.database.write_behind import ChatTurnWriter, persist_chat_turn
+
+
+def chat_turn(chat_session_id: int) -> dict:
+    return dict(chat_session_id=chat_session_id, prompt="headphones", generation="{}", references=[],
+                tools_used=["vector_search"])
+
+
+@pytest.mark.asyncio
+async def test_writer_flushes_full_batches():
+    flush = AsyncMock()
+    writer = ChatTurnWriter(batch_size=2, flush_interval_seconds=60, flush=flush)
+    await writer.start()
+
+    for chat_session_id in range(4):
+        assert writer.submit(**chat_turn(chat_session_id))
+    await writer.stop()
+
+    assert [len(call.args[0]) for call in flush.await_args_list] == [2, 2]
+    assert writer.flushed == 4
+
+
+@pytest.mark.asyncio
+async def test_writer_flushes_partial_batch_after_interval():
+    flush = AsyncMock()
+    writer = ChatTurnWriter(batch_size=10, flush_interval_seconds=0.01, flush=flush)
+    await writer.start()
+
+    writer.submit(**chat_turn(1))
+    await asyncio.sleep(0.05)
+
+    flush.assert_awaited_once()
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_writer_retries_failed_batches():
+    flush = AsyncMock(side_effect=[ValueError("Failed to connect to database"), None])
+    writer = ChatTurnWriter(batch_size=2, flush=flush, write_one=AsyncMock(), retry_backoff_seconds=0)
+    await writer.start()
+
+    writer.submit(**chat_turn(1))
+    writer.submit(**chat_turn(2))
+    await writer.stop()
+
+    assert flush.await_count == 2
+    assert writer.flushed == 2
+    writer.write_one.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_writer_only_drops_the_bad_turn_of_a_failed_batch():
+    async def write_one(**turn):
+        if turn["chat_session_id"] == 2:
+            raise ValueError("value too long for type character varying(50)")
+
+    flush = AsyncMock(side_effect=ValueError("value too long for type character varying(50)"))
+    writer = ChatTurnWriter(batch_size=3, flush=flush, write_one=AsyncMock(side_effect=write_one), retries=1,
+                            retry_backoff_seconds=0)
+    await writer.start()
+
+    for chat_session_id in (1, 2, 3):
+        writer.submit(**chat_turn(chat_session_id))
+    await writer.stop()
+
+    assert flush.await_count == 2
+    assert [call.kwargs["chat_session_id"] for call in writer.write_one.await_args_list] == [1, 2, 3]
+    assert writer.flushed == 2
+    assert writer.failed == 1
+
+
+@pytest.mark.asyncio
+async def test_submit_rejected_when_not_running():
+    writer = ChatTurnWriter(max_queue_size=1, flush=AsyncMock())
+    assert not writer.submit(**chat_turn(1))
+
+    await writer.start()
+    writer._worker.cancel()
+    await asyncio.sleep(0)
+    assert not writer.submit(**chat_turn(1))
+
+
+@pytest.mark.asyncio
+async def test_persist_chat_turn_writes_directly_without_writer():
+    with patch("backend.database.write_behind.record_chat_turn", new_callable=AsyncMock) as mock_record:
+        await persist_chat_turn(**chat_turn(1))
+
+    mock_record.assert_awaited_once_with(**chat_turn(1))